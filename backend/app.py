@@ -1,9 +1,19 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, request, jsonify, send_file, send_from_directory, Response
 from flask_cors import CORS, cross_origin
 import os
+import json
+import time
 import tempfile
+import threading
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
 from core.animator import TalkingHeadAnimator
+from core.jobs import JobManager, QueueFullError
+from core.workspace import WorkspaceManager
+from core.metrics import metrics
+from core.video_writer import HLS_PLAYLIST
+from core.downloads import DigestIndex, is_content_addressed
+from core.streaming import STREAMING_STYLES, MIN_SAMPLE_RATE, MJPEG_BOUNDARY, StreamingAnimator, LiveSession, jpeg_frames, mjpeg_parts
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
 
@@ -18,6 +28,37 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
 
 animator = TalkingHeadAnimator()
 
+# Renders run in the background so /upload returns immediately
+job_manager = JobManager(max_workers=2, max_queued=16)
+
+# Previews get their own worker so a quick preview never waits behind full renders
+preview_job_manager = JobManager(max_workers=1, max_queued=4)
+
+# Seconds between heartbeats on an idle /jobs/<job_id>/events stream
+SSE_HEARTBEAT_SECONDS = 15
+
+# Each job keeps its uploads, intermediates and output in its own directory
+workspace_manager = WorkspaceManager(os.path.join(UPLOAD_FOLDER, 'jobs'))
+
+# Content digests of finished videos: their ETags and the names they are renamed to
+video_digests = DigestIndex()
+
+# Cache-Control for videos whose name carries their content digest
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Live sessions by id: audio is posted to /live/<id>/audio, frames come out of /live/<id>/video
+live_sessions = {}
+live_sessions_lock = threading.Lock()
+
+# Live sessions nobody has started streaming within this many seconds are closed
+LIVE_SESSION_TIMEOUT = 10 * 60
+
+def manager_for(job_id):
+    """The job manager that holds job_id (the full render queue if neither does)"""
+    if preview_job_manager.get(job_id) is not None:
+        return preview_job_manager
+    return job_manager
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -28,7 +69,7 @@ def index():
 @app.route('/<path:path>')
 def serve_static(path):
     # Don't serve API routes as static files
-    if path.startswith(('upload', 'download', 'health', 'test-upload')):
+    if path.startswith(('upload', 'download', 'health', 'test-upload', 'jobs', 'metrics', 'live')):
         return "Not Found", 404
     return app.send_static_file(path)
 
@@ -36,6 +77,17 @@ def serve_static(path):
 def health():
     return jsonify({'status': 'ok'})
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Pipeline counters and timers in Prometheus text format (?format=json for JSON)"""
+    for queue, manager in (('full', job_manager), ('preview', preview_job_manager)):
+        for status, count in manager.status_counts().items():
+            metrics.set_gauge('animator_jobs', count, status=status, queue=queue)
+    
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.snapshot())
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/test-upload', methods=['POST'])
 def test_upload():
     """Test endpoint to debug file uploads"""
@@ -92,12 +144,15 @@ def upload_files():
         if not allowed_file(image.filename) or not allowed_file(audio.filename):
             return jsonify({'error': f'Invalid file type. Image: {image.filename}, Audio: {audio.filename}'}), 400
         
-        # Create upload folder if it doesn't exist
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        # Clear out old workspaces before adding a new one
+        workspace_manager.reap(in_use=job_manager.active_ids() | preview_job_manager.active_ids() |
+                               set(live_sessions))
         
-        # Save uploaded files
-        image_path = os.path.join(UPLOAD_FOLDER, secure_filename(image.filename))
-        audio_path = os.path.join(UPLOAD_FOLDER, secure_filename(audio.filename))
+        # Save uploaded files into the job's own workspace
+        job_id = job_manager.new_job_id()
+        workspace = workspace_manager.create(job_id)
+        image_path = os.path.join(workspace, 'image_' + secure_filename(image.filename))
+        audio_path = os.path.join(workspace, 'audio_' + secure_filename(audio.filename))
         
         image.save(image_path)
         audio.save(audio_path)
@@ -118,33 +173,321 @@ def upload_files():
                 except ValueError:
                     print("Invalid mouth coordinates, using auto-detection")
         
-        output_path = animator.create_animation(image_path, audio_path, style, mouth_anchor)
+        # A preview is a quick low resolution render of the start of the clip
+        preview = request.form.get('preview', '').lower() in ('1', 'true', 'yes', 'on')
+        
+        if preview:
+            output_path = os.path.join(workspace, f'preview_{job_id}.mp4')
+            manager = preview_job_manager
+            hls_dir = None
+        else:
+            output_path = os.path.join(workspace, f'talking_head_{job_id}.mp4')
+            manager = job_manager
+            # Full renders are also streamed as HLS so playback can start before they finish
+            hls_dir = os.path.join(workspace, 'hls')
+        manager.submit(render_job, image_path, audio_path, style, mouth_anchor,
+                       job_id=job_id, output_path=output_path, preview=preview, hls_dir=hls_dir)
+        print(f"Queued {'preview ' if preview else ''}job {job_id}")
         
         return jsonify({
             'success': True,
-            'video_url': f'/download/{os.path.basename(output_path)}'
-        })
+            'job_id': job_id,
+            'preview': preview,
+            'status_url': f'/jobs/{job_id}',
+            'progress_url': f'/jobs/{job_id}/progress',
+            'events_url': f'/jobs/{job_id}/events'
+        }), 202
         
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         print(f"Error processing upload: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def render_job(image_path, audio_path, style, mouth_anchor, progress_callback=None, **options):
+    """Render a job's video, then name it after its content so its download URL can be cached forever"""
+    video_path = animator.create_animation(image_path, audio_path, style, mouth_anchor, progress_callback, **options)
+    return video_digests.rename_to_content(video_path)
+
+def job_summary(job_id, job):
+    """Full job record as returned by /jobs/<job_id>"""
+    summary = {
+        'job_id': job_id,
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'eta_seconds': job['eta_seconds'],
+        'frames_done': job['frames_done'],
+        'frames_total': job['frames_total'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if job['status'] == 'done':
+        summary['video_url'] = f"/download/{job_id}/{os.path.basename(job['result'])}"
+        summary['playback_url'] = summary['video_url'] + '?inline=1'
+    summary['stream_url'] = stream_url(job_id, job)
+    return summary
+
+def progress_summary(job_id, job):
+    """Progress fields as returned by /jobs/<job_id>/progress"""
+    return {
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'eta_seconds': job['eta_seconds'],
+        'frames_done': job['frames_done'],
+        'frames_total': job['frames_total'],
+        'stream_url': stream_url(job_id, job)
+    }
+
+def stream_url(job_id, job):
+    """URL of the job's HLS playlist once its first segment is out (None before, or if the job failed)"""
+    if job['status'] == 'failed':
+        return None
+    if not os.path.exists(os.path.join(workspace_manager.path_for(job_id), 'hls', HLS_PLAYLIST)):
+        return None
+    return f'/jobs/{job_id}/hls/{HLS_PLAYLIST}'
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = manager_for(job_id).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job_summary(job_id, job))
+
+@app.route('/jobs/<job_id>/progress', methods=['GET'])
+def job_progress(job_id):
+    """Lightweight progress poll for the frontend's progress bar"""
+    job = manager_for(job_id).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(progress_summary(job_id, job))
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a job's progress as Server-Sent Events until it finishes
+    
+    Sends a 'progress' event on every update, a 'heartbeat' event after
+    SSE_HEARTBEAT_SECONDS without one (with how long the job has been idle,
+    so stuck renders are visible) and a final 'done' or 'failed' event
+    carrying the full job record
+    """
+    manager = manager_for(job_id)
+    if manager.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def stream():
+        version = None
+        while True:
+            job = manager.wait_for_change(job_id, version, timeout=SSE_HEARTBEAT_SECONDS)
+            if job is None:
+                yield sse_message('failed', {'job_id': job_id, 'status': 'failed', 'error': 'Job not found'})
+                return
+            if job['version'] == version:
+                yield sse_message('heartbeat', {'idle_seconds': round(time.time() - job['updated_at'], 1)})
+                continue
+            
+            version = job['version']
+            if job['status'] in ('done', 'failed'):
+                yield sse_message(job['status'], job_summary(job_id, job))
+                return
+            yield sse_message('progress', progress_summary(job_id, job))
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Content types of the files an HLS render writes
+HLS_MIMETYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4'
+}
+
+@app.route('/jobs/<job_id>/hls/<filename>', methods=['GET'])
+def job_stream(job_id, filename):
+    """The HLS playlist and fragmented-MP4 segments of a render, available while it runs"""
+    mimetype = HLS_MIMETYPES.get(os.path.splitext(filename)[1])
+    if mimetype is None:
+        return jsonify({'error': 'File not found'}), 404
+    
+    try:
+        hls_dir = os.path.join(workspace_manager.path_for(job_id), 'hls')
+        response = send_from_directory(hls_dir, filename, mimetype=mimetype)
+    except Exception as e:
+        return jsonify({'error': 'File not found'}), 404
+    
+    # The playlist grows until the render ends; segments never change once listed
+    if filename == HLS_PLAYLIST:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/live', methods=['POST'])
+def create_live_session():
+    """Start a live animation of the uploaded character
+    
+    The audio is then streamed as raw PCM to audio_url (a chunked POST that
+    stays open while the audio is live) and the animation is read back as
+    MJPEG from video_url, e.g. in an <img> element
+    """
+    if 'image' not in request.files:
+        return jsonify({'error': 'Missing image file', 'files_received': list(request.files.keys())}), 400
+    
+    image = request.files['image']
+    if not allowed_file(image.filename):
+        return jsonify({'error': f'Invalid file type. Image: {image.filename}'}), 400
+    
+    style = request.form.get('style', 'nutcracker')
+    if style not in STREAMING_STYLES:
+        return jsonify({'error': f"Style '{style}' can't be streamed; use one of {', '.join(STREAMING_STYLES)}"}), 400
+    
+    try:
+        sample_rate = int(request.form.get('sample_rate', 16000))
+        channels = int(request.form.get('channels', 1))
+        fps = int(request.form.get('fps', 24))
+        latency = float(request.form.get('latency', 0.1))
+    except ValueError:
+        return jsonify({'error': 'sample_rate, channels, fps and latency must be numbers'}), 400
+    if sample_rate < MIN_SAMPLE_RATE:
+        return jsonify({'error': f'sample_rate must be at least {MIN_SAMPLE_RATE}'}), 400
+    if channels <= 0 or fps <= 0 or not latency > 0:
+        return jsonify({'error': 'channels, fps and latency must be positive'}), 400
+    
+    mouth_anchor = None
+    mouth_x = request.form.get('mouth_x')
+    mouth_y = request.form.get('mouth_y')
+    if mouth_x and mouth_y:
+        try:
+            mouth_anchor = (int(mouth_x), int(mouth_y))
+        except ValueError:
+            print("Invalid mouth coordinates, using auto-detection")
+    
+    reap_live_sessions()
+    
+    session_id = job_manager.new_job_id()
+    workspace = workspace_manager.create(session_id)
+    image_path = os.path.join(workspace, 'image_' + secure_filename(image.filename))
+    image.save(image_path)
+    
+    try:
+        streamer = StreamingAnimator(animator, image_path, style, mouth_anchor, fps=fps, latency=latency)
+    except Exception as e:
+        print(f"Error starting live session: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    session = LiveSession(streamer, session_id, sample_rate=sample_rate, channels=channels,
+                          viewer_timeout=LIVE_SESSION_TIMEOUT)
+    with live_sessions_lock:
+        live_sessions[session_id] = session
+    print(f"Started live {style} session {session_id}")
+    
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'style': style,
+        'latency': streamer.latency,
+        'audio_url': f'/live/{session_id}/audio',
+        'video_url': f'/live/{session_id}/video'
+    }), 201
+
+@app.route('/live/<session_id>/audio', methods=['POST'])
+def live_audio(session_id):
+    """Feed a live session raw little-endian PCM until the request body ends"""
+    reap_live_sessions()
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Live session not found'}), 404
+    
+    # The body lasts as long as the audio does, so it's read without MAX_CONTENT_LENGTH
+    try:
+        session.feed(get_input_stream(request.environ, max_content_length=None))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'success': True, 'session_id': session_id})
+
+@app.route('/live/<session_id>/video', methods=['GET'])
+def live_video(session_id):
+    """The live session's frames as an MJPEG (multipart/x-mixed-replace) stream"""
+    reap_live_sessions()
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Live session not found'}), 404
+    if session.viewing:
+        return jsonify({'error': 'This live session already has a viewer'}), 409
+    
+    try:
+        quality = int(request.args.get('quality', 80))
+    except ValueError:
+        return jsonify({'error': 'quality must be a number'}), 400
+    
+    def stream():
+        try:
+            yield from mjpeg_parts(jpeg_frames(session.frames(), quality))
+        finally:
+            with live_sessions_lock:
+                live_sessions.pop(session_id, None)
+            session.close()
+    
+    return Response(stream(), mimetype=f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def reap_live_sessions():
+    """Close live sessions that were never streamed"""
+    with live_sessions_lock:
+        stale = [session_id for session_id, session in live_sessions.items()
+                 if not session.viewing and time.time() - session.created_at > LIVE_SESSION_TIMEOUT]
+        for session_id in stale:
+            live_sessions.pop(session_id).close()
+
 @app.route('/download/<filename>', methods=['GET'])
 def download_video(filename):
     try:
-        return send_file(
-            os.path.join(OUTPUT_FOLDER, filename),
-            as_attachment=True,
-            download_name=filename
-        )
+        return send_video(os.path.join(OUTPUT_FOLDER, filename), filename)
+    except Exception as e:
+        return jsonify({'error': 'File not found'}), 404
+
+@app.route('/download/<job_id>/<filename>', methods=['GET'])
+def download_job_video(job_id, filename):
+    try:
+        return send_video(os.path.join(workspace_manager.path_for(job_id), secure_filename(filename)), filename)
     except Exception as e:
         return jsonify({'error': 'File not found'}), 404
 
+def send_video(path, filename):
+    """Send a video as a download, or for playback with ?inline=1
+    
+    The strong ETag is the file's content digest, so If-None-Match requests
+    for an unchanged file get a 304 and Range requests (with If-Range) get
+    206 partial content. A name that carries the digest can never point at
+    other bytes and is cached as immutable; any other name is revalidated
+    """
+    inline = request.args.get('inline', '').lower() in ('1', 'true', 'yes')
+    digest = video_digests.digest(path)
+    
+    response = send_file(
+        path,
+        as_attachment=not inline,
+        download_name=filename,
+        etag=digest,
+        conditional=True
+    )
+    if is_content_addressed(filename, digest):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 if __name__ == '__main__':
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    workspace_manager.reap()
     print("\n" + "="*50)
     print("South Park Animator is starting...")
     print("Open your browser to: http://localhost:5000")
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks
+Times audio analysis, keyframe generation, frame compositing and the full
+create_animation pipeline on deterministic synthetic characters and clips,
+and records frames/sec and peak memory as JSON so runs can be compared
+
+Usage: python benchmarks/run_benchmarks.py [--quick] [--only PATTERN] [--output results.json]
+       python benchmarks/run_benchmarks.py --compare baseline.json latest.json
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.animator import TalkingHeadAnimator
+
+FPS = 24
+SAMPLE_RATE = 44100
+STYLES = ['standard', 'canadian', 'nutcracker']
+
+# Character sizes (width, height); the default test character is 'medium'
+RESOLUTIONS = {
+    'small': (240, 360),
+    'medium': (400, 600),
+    'large': (800, 1200),
+}
+CLIP_SECONDS = [2, 10, 30]
+
+# --quick runs the smallest character and the shortest clip only
+QUICK_RESOLUTIONS = ['small']
+QUICK_CLIP_SECONDS = [2]
+
+# Frames composited per compositing case and pastes per paste_with_alpha case
+COMPOSITE_FRAMES = 96
+PASTE_CALLS = 500
+
+# Mouth states cycled through by the compositing cases (canadian uses animator.mouth_positions)
+ROTATION_KEYFRAMES = [{'angle': angle, 'bottom_y': angle // 3} for angle in (0, 5, 10, 15)]
+JAW_OFFSETS = [0, 4, 8, 12, 16]
+VISEMES = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'X']
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def build_cases(resolutions=None, clip_seconds=None):
+    """List every benchmark case as a dict; names are stable so runs can be compared"""
+    resolutions = resolutions or list(RESOLUTIONS)
+    clip_seconds = clip_seconds or CLIP_SECONDS
+    cases = []
+
+    for seconds in clip_seconds:
+        cases.append({'kind': 'analyze_audio_amplitude', 'style': None, 'resolution': None, 'clip_seconds': seconds})
+        cases.append({'kind': 'generate_simple_phonemes', 'style': None, 'resolution': None, 'clip_seconds': seconds})
+        for style in STYLES:
+            cases.append({'kind': 'keyframes', 'style': style, 'resolution': None, 'clip_seconds': seconds})
+
+    for resolution in resolutions:
+        for kind, style in [('composite_sprite_frame', 'standard'),
+                            ('composite_frame_with_movement', 'canadian'),
+                            ('composite_frame_with_rotation', 'canadian'),
+                            ('composite_frame_with_jaw_slide', 'nutcracker'),
+                            ('paste_with_alpha', 'canadian')]:
+            cases.append({'kind': kind, 'style': style, 'resolution': resolution, 'clip_seconds': None})
+
+    for resolution in resolutions:
+        for seconds in clip_seconds:
+            for style in STYLES:
+                cases.append({'kind': 'create_animation', 'style': style, 'resolution': resolution,
+                              'clip_seconds': seconds})
+
+    for case in cases:
+        parts = [case['kind'], case['style'], case['resolution'],
+                 f"{case['clip_seconds']}s" if case['clip_seconds'] else None]
+        case['name'] = '/'.join(part for part in parts if part)
+
+    return cases
+
+def make_character(path, width, height):
+    """Draw the test character (head, eyes, mouth, body on transparency) at any size"""
+    # Same layout as test_samples/create_test_image.py, in fractions of a 400x600 canvas
+    def box(x0, y0, x1, y1):
+        return [x0 * width / 400, y0 * height / 600, x1 * width / 400, y1 * height / 600]
+
+    img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle(box(150, 100, 250, 200), fill=(255, 200, 150), outline=(0, 0, 0))
+    draw.ellipse(box(170, 130, 190, 150), fill=(255, 255, 255), outline=(0, 0, 0))
+    draw.ellipse(box(210, 130, 230, 150), fill=(255, 255, 255), outline=(0, 0, 0))
+    draw.ellipse(box(175, 135, 185, 145), fill=(0, 0, 0))
+    draw.ellipse(box(215, 135, 225, 145), fill=(0, 0, 0))
+    draw.rectangle(box(150, 200, 250, 250), fill=(255, 200, 150), outline=(0, 0, 0))
+    draw.arc(box(180, 210, 220, 230), 0, 180, fill=(0, 0, 0), width=max(1, width // 130))
+    draw.rectangle(box(100, 250, 300, 500), fill=(200, 50, 50), outline=(0, 0, 0))
+    img.save(path)
+    return path
+
+def mouth_anchor_for(resolution):
+    """Mouth position of the synthetic character"""
+    width, height = RESOLUTIONS[resolution]
+    return (width // 2, int(height * 220 / 600))
+
+def make_audio(path, seconds, seed=0):
+    """Write a speech-like mono WAV: syllables of varying pitch and loudness with pauses"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    audio = np.zeros_like(t)
+
+    syllable = int(SAMPLE_RATE * 0.25)
+    for start in range(0, len(t), syllable):
+        end = min(start + syllable, len(t))
+        if rng.random() < 0.2:
+            continue  # Pause between words
+        freq = rng.integers(100, 400)
+        amplitude = rng.uniform(0.2, 1.0)
+        envelope = np.sin(np.linspace(0, np.pi, end - start))
+        audio[start:end] = amplitude * envelope * np.sin(2 * np.pi * freq * t[start:end])
+
+    samples = np.int16(audio / max(np.max(np.abs(audio)), 1e-9) * 32767)
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(samples.tobytes())
+    return path
+
+def fixture_paths(fixtures_dir, case):
+    """Paths of the synthetic image and audio a case uses, creating them on first use"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    paths = {}
+    if case['resolution']:
+        width, height = RESOLUTIONS[case['resolution']]
+        paths['image'] = os.path.join(fixtures_dir, f"character_{case['resolution']}.png")
+        if not os.path.exists(paths['image']):
+            make_character(paths['image'], width, height)
+    if case['clip_seconds']:
+        paths['audio'] = os.path.join(fixtures_dir, f"speech_{case['clip_seconds']}s.wav")
+        if not os.path.exists(paths['audio']):
+            make_audio(paths['audio'], case['clip_seconds'])
+    return paths
+
+def prepared_character(animator, case, image_path):
+    """Character data for case's style, laid out on its render canvas like VideoRenderer.render does"""
+    mouth_anchor = mouth_anchor_for(case['resolution']) if case['style'] != 'canadian' else None
+    character_data = animator.prepare_character_uncached(image_path, case['style'], mouth_anchor)
+    animator.video_renderer.configure_canvas(character_data, case['style'])
+    return character_data
+
+def run_case(case, fixtures_dir, work_dir, workers=None):
+    """Run one case in this process and return (frames, seconds)
+
+    frames counts video frames produced, or covered by the analysed audio,
+    so every case reports a comparable frames/sec
+    """
+    paths = fixture_paths(fixtures_dir, case)
+    animator = TalkingHeadAnimator(render_workers=workers, cache_dir=os.path.join(work_dir, 'cache'))
+    processor = animator.image_processor
+    kind = case['kind']
+
+    if kind == 'analyze_audio_amplitude':
+        start = time.perf_counter()
+        animator.analyze_audio_amplitude(paths['audio'])
+        return case['clip_seconds'] * FPS, time.perf_counter() - start
+
+    if kind == 'generate_simple_phonemes':
+        start = time.perf_counter()
+        animator.phoneme_detector.generate_simple_phonemes(paths['audio'])
+        return case['clip_seconds'] * FPS, time.perf_counter() - start
+
+    if kind == 'keyframes':
+        if case['style'] == 'nutcracker':
+            audio_data = animator.analyze_audio_amplitude(paths['audio'])
+        else:
+            audio_data = animator.analyze_audio(paths['audio'], case['style'])
+        start = time.perf_counter()
+        animator.generate_keyframes(audio_data, case['style'])
+        return case['clip_seconds'] * FPS, time.perf_counter() - start
+
+    if kind == 'create_animation':
+        animator.video_renderer._log_first_frame = lambda frame: None  # Don't overwrite temp/debug_frame_0.png
+        rendered = {}
+
+        def progress(stage, done=None, total=None):
+            if stage == 'frames':
+                rendered['frames'] = total
+
+        start = time.perf_counter()
+        animator.create_animation(paths['image'], paths['audio'], style=case['style'],
+                                  mouth_anchor=mouth_anchor_for(case['resolution']),
+                                  progress_callback=progress,
+                                  output_path=os.path.join(work_dir, 'benchmark.mp4'))
+        return rendered['frames'], time.perf_counter() - start
+
+    # Compositing cases work on a prepared character and time the calls only
+    character_data = prepared_character(animator, case, paths['image'])
+
+    if kind == 'paste_with_alpha':
+        canvas = np.full((character_data['video_height'], character_data['video_width'], 4), 255, dtype=np.uint8)
+        part = processor.get_scaled_part(character_data, 'top_half')
+        start = time.perf_counter()
+        for i in range(PASTE_CALLS):
+            processor.paste_with_alpha(canvas, part, i % 16, i % 16)
+        return PASTE_CALLS, time.perf_counter() - start
+
+    if kind == 'composite_sprite_frame':
+        composite = lambda i: processor.composite_sprite_frame(character_data, VISEMES[i % len(VISEMES)])
+    elif kind == 'composite_frame_with_movement':
+        composite = lambda i: processor.composite_frame_with_movement(
+            character_data, animator.mouth_positions[i % len(animator.mouth_positions)])
+    elif kind == 'composite_frame_with_rotation':
+        composite = lambda i: processor.composite_frame_with_rotation(
+            character_data, ROTATION_KEYFRAMES[i % len(ROTATION_KEYFRAMES)])
+    elif kind == 'composite_frame_with_jaw_slide':
+        composite = lambda i: processor.composite_frame_with_jaw_slide(
+            character_data, JAW_OFFSETS[i % len(JAW_OFFSETS)])
+    else:
+        raise Exception(f"Unknown benchmark kind: {kind}")
+
+    start = time.perf_counter()
+    for i in range(COMPOSITE_FRAMES):
+        composite(i)
+    return COMPOSITE_FRAMES, time.perf_counter() - start
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def measure_case(case, fixtures_dir, work_dir, workers=None, verbose=False):
+    """Run one case in this process and return its result record"""
+    # The pipeline prints a lot; keep benchmark output to the results
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        frames, seconds = run_case(case, fixtures_dir, work_dir, workers)
+
+    result = dict(case)
+    if case['resolution']:
+        result['width'], result['height'] = RESOLUTIONS[case['resolution']]
+    result.update({
+        'frames': frames,
+        'seconds': round(seconds, 4),
+        'fps': round(frames / seconds, 2) if seconds > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        # ffmpeg encoder and other subprocesses
+        'peak_child_rss_mb': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    })
+    return result
+
+def measure_case_isolated(case, fixtures_dir, work_dir, workers=None):
+    """Run one case in a fresh interpreter so its peak RSS is its own"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(case),
+           '--fixtures-dir', fixtures_dir, '--work-dir', work_dir]
+    if workers:
+        cmd += ['--workers', str(workers)]
+
+    completed = subprocess.run(cmd, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return dict(case, error=(completed.stderr.strip().splitlines() or ['failed'])[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run_benchmarks(cases, workers=None, isolate=True):
+    """Run cases one after another and return the results document"""
+    scratch_dir = tempfile.mkdtemp(prefix='benchmarks_')
+    fixtures_dir = os.path.join(scratch_dir, 'fixtures')
+    results = []
+
+    try:
+        for case in cases:
+            # A fresh work directory per case keeps the caches cold
+            work_dir = tempfile.mkdtemp(dir=scratch_dir)
+            fixture_paths(fixtures_dir, case)  # Build inputs outside the measured process
+            if isolate:
+                result = measure_case_isolated(case, fixtures_dir, work_dir, workers)
+            else:
+                result = measure_case(case, fixtures_dir, work_dir, workers)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+            if 'error' in result:
+                print(f"  {case['name']:<52} FAILED: {result['error']}")
+            else:
+                print(f"  {case['name']:<52} {result['fps']:>10.1f} fps {result['peak_rss_mb']:>8.1f} MB")
+            results.append(result)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': workers,
+        'isolated': isolate,
+        'cases': results,
+    }
+
+def git_commit():
+    """Current commit of the repository, if it can be determined"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline, latest):
+    """Rows of (name, baseline fps, latest fps, fps change %, baseline MB, latest MB) for cases in both runs"""
+    baseline_cases = {case['name']: case for case in baseline['cases'] if 'error' not in case}
+    rows = []
+    for case in latest['cases']:
+        old = baseline_cases.get(case['name'])
+        if old is None or 'error' in case:
+            continue
+        change = (case['fps'] / old['fps'] - 1) * 100 if old['fps'] else None
+        rows.append((case['name'], old['fps'], case['fps'], change, old['peak_rss_mb'], case['peak_rss_mb']))
+    return rows
+
+def print_comparison(baseline_path, latest_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(latest_path) as f:
+        latest = json.load(f)
+
+    print(f"Baseline: {baseline_path} ({baseline.get('git_commit')}, {baseline['created']})")
+    print(f"Latest:   {latest_path} ({latest.get('git_commit')}, {latest['created']})\n")
+    print(f"  {'case':<52} {'fps before':>10} {'fps after':>10} {'change':>8} {'MB before':>10} {'MB after':>9}")
+    for name, old_fps, new_fps, change, old_mb, new_mb in compare_results(baseline, latest):
+        change_text = f"{change:+.1f}%" if change is not None else 'n/a'
+        print(f"  {name:<52} {old_fps:>10.1f} {new_fps:>10.1f} {change_text:>8} {old_mb:>10.1f} {new_mb:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the animation pipeline')
+    parser.add_argument('--quick', action='store_true',
+                       help='Only the smallest character and shortest clip')
+    parser.add_argument('--only', action='append',
+                       help='Run cases whose name matches this glob, e.g. "create_animation/*" (repeatable)')
+    parser.add_argument('--list', action='store_true', help='List the case names and exit')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/benchmark_<time>.json)')
+    parser.add_argument('--workers', type=int, help='Frame compositing threads (default: number of CPU cores)')
+    parser.add_argument('--in-process', action='store_true',
+                       help="Run every case in this process (faster, but peak RSS is the running maximum)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'LATEST'),
+                       help='Compare two results files instead of running')
+    # Internal: run one case in a child process and print its result as JSON
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--fixtures-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_case:
+        result = measure_case(json.loads(args.run_case), args.fixtures_dir, args.work_dir, args.workers)
+        print(json.dumps(result))
+        return 0
+
+    if args.compare:
+        print_comparison(*args.compare)
+        return 0
+
+    if args.quick:
+        cases = build_cases(QUICK_RESOLUTIONS, QUICK_CLIP_SECONDS)
+    else:
+        cases = build_cases()
+    if args.only:
+        cases = [case for case in cases if any(fnmatch.fnmatch(case['name'], pattern) for pattern in args.only)]
+
+    if args.list:
+        for case in cases:
+            print(case['name'])
+        return 0
+    if not cases:
+        print("Error: No benchmark cases match")
+        return 1
+
+    print(f"Running {len(cases)} benchmark cases...")
+    results = run_benchmarks(cases, workers=args.workers, isolate=not args.in_process)
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_path = os.path.join(RESULTS_DIR, f'benchmark_{stamp}.json')
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\nResults saved to {output_path}")
+    return 0 if all('error' not in case for case in results['cases']) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,160 @@
 #!/usr/bin/env python3
 """
 Command-line interface for testing South Park animation styles
-Usage: python cli_test.py --style [standard|canadian] --image path/to/image.png --audio path/to/audio.wav
+Usage: python cli_test.py --style [standard|canadian|nutcracker] --image path/to/image.png --audio path/to/audio.wav
+       python cli_test.py batch --style canadian --image path/to/image.png --manifest clips.txt --output-dir out/
+       arecord -f S16_LE -r 16000 -c 1 | python cli_test.py live --image path/to/image.png --pcm - | ffplay -f mjpeg -
 """
 
 import argparse
+import json
 import os
 import sys
+from contextlib import redirect_stdout
 from core.animator import TalkingHeadAnimator
+from core.streaming import STREAMING_STYLES, PCMSource, GrowingWavSource, StreamingAnimator, jpeg_frames
+
+def load_manifest(manifest_path):
+    """Read audio paths from a manifest: a JSON list, or a text file with one path per line
+    
+    Relative paths are resolved against the manifest's directory; blank lines
+    and lines starting with # are ignored in text manifests
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    
+    with open(manifest_path, 'r') as f:
+        if manifest_path.lower().endswith('.json'):
+            entries = json.load(f)
+            if not isinstance(entries, list):
+                raise Exception("JSON manifest must be a list of audio paths")
+        else:
+            entries = [line.strip() for line in f]
+            entries = [line for line in entries if line and not line.startswith('#')]
+    
+    return [os.path.join(base_dir, entry) for entry in entries]
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog='cli_test.py batch',
+                                     description='Render many audio clips for one character')
+    parser.add_argument('--style', choices=['standard', 'canadian', 'nutcracker'], default='canadian',
+                       help='Animation style')
+    parser.add_argument('--image', required=True, help='Path to character image')
+    parser.add_argument('--manifest', required=True,
+                       help='Audio clips to render: text file with one path per line, or a JSON list')
+    parser.add_argument('--output-dir', help='Directory for the videos and batch_report.json (default: output/batch)')
+    parser.add_argument('--mouth-x', type=int, help='X coordinate for mouth anchor')
+    parser.add_argument('--mouth-y', type=int, help='Y coordinate for mouth anchor')
+    parser.add_argument('--jobs', type=int, help='Clips rendered at the same time (default: number of CPU cores)')
+    
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.image):
+        print(f"Error: Image file not found: {args.image}")
+        return 1
+    
+    try:
+        audio_paths = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"Error: Could not read manifest {args.manifest}: {e}")
+        return 1
+    
+    missing = [path for path in audio_paths if not os.path.exists(path)]
+    if missing:
+        print(f"Error: Audio files not found: {', '.join(missing)}")
+        return 1
+    if not audio_paths:
+        print("Error: Manifest lists no audio files")
+        return 1
+    
+    mouth_anchor = None
+    if args.mouth_x is not None and args.mouth_y is not None:
+        mouth_anchor = (args.mouth_x, args.mouth_y)
+    
+    animator = TalkingHeadAnimator()
+    report = animator.create_batch(args.image, audio_paths, style=args.style, mouth_anchor=mouth_anchor,
+                                   output_dir=args.output_dir, workers=args.jobs)
+    
+    print(f"\n{report['succeeded']} of {len(report['clips'])} clips rendered in {report['seconds']:.1f}s")
+    for clip in report['clips']:
+        if clip['status'] != 'done':
+            print(f"❌ {clip['audio']}: {clip['error']}")
+    
+    return 0 if report['failed'] == 0 else 1
+
+def live_main(argv):
+    parser = argparse.ArgumentParser(prog='cli_test.py live',
+                                     description='Animate a character live from streaming audio, writing MJPEG')
+    parser.add_argument('--style', choices=STREAMING_STYLES, default='nutcracker', help='Animation style')
+    parser.add_argument('--image', required=True, help='Path to character image')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pcm', help='Raw signed 16-bit PCM to read, e.g. a named pipe (- for stdin)')
+    source.add_argument('--wav', help='WAV file that is still being written, read as it grows')
+    parser.add_argument('--sample-rate', type=int, default=16000, help='Sample rate of --pcm audio')
+    parser.add_argument('--channels', type=int, default=1, help='Channels of --pcm audio')
+    parser.add_argument('--output', default='-',
+                        help='File or pipe for the concatenated JPEG frames (default: stdout)')
+    parser.add_argument('--fps', type=int, default=24, help='Frame rate')
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='Seconds of audio lookahead before a frame is drawn')
+    parser.add_argument('--max-lag', type=float, default=0.5,
+                        help='Frames later than this many seconds past due are dropped')
+    parser.add_argument('--quality', type=int, default=80, help='JPEG quality')
+    parser.add_argument('--mouth-x', type=int, help='X coordinate for mouth anchor')
+    parser.add_argument('--mouth-y', type=int, help='Y coordinate for mouth anchor')
+    
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.image):
+        print(f"Error: Image file not found: {args.image}", file=sys.stderr)
+        return 1
+    
+    mouth_anchor = None
+    if args.mouth_x is not None and args.mouth_y is not None:
+        mouth_anchor = (args.mouth_x, args.mouth_y)
+    
+    if args.wav:
+        source = GrowingWavSource(args.wav)
+    elif args.pcm == '-':
+        source = PCMSource(sys.stdin.buffer, args.sample_rate, args.channels)
+    else:
+        source = PCMSource(open(args.pcm, 'rb'), args.sample_rate, args.channels)
+    
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    
+    # Frames may be going to stdout, so all log output goes to stderr
+    with redirect_stdout(sys.stderr):
+        streamer = StreamingAnimator(TalkingHeadAnimator(), args.image, args.style, mouth_anchor,
+                                     fps=args.fps, latency=args.latency, max_lag=args.max_lag)
+        try:
+            for jpeg in jpeg_frames(streamer.frames(source), args.quality):
+                output.write(jpeg)
+                output.flush()
+        except (BrokenPipeError, KeyboardInterrupt):
+            pass  # The player was closed or the stream was stopped
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+    
+    print(f"Streamed {streamer.stats['frames']} frames ({streamer.stats['frames_dropped']} dropped) "
+          f"for {streamer.stats['audio_seconds']:.1f}s of audio", file=sys.stderr)
+    return 0
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        return batch_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'live':
+        return live_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(description='South Park Talking Head Animator')
-    parser.add_argument('--style', choices=['standard', 'canadian'], default='canadian',
-                       help='Animation style: standard (sprite-based) or canadian (flappy-head)')
+    parser.add_argument('--style', choices=['standard', 'canadian', 'nutcracker'], default='canadian',
+                       help='Animation style: standard (sprite-based), canadian (flappy-head) or nutcracker (sliding jaw)')
     parser.add_argument('--image', required=True, help='Path to character image')
     parser.add_argument('--audio', required=True, help='Path to audio file')
     parser.add_argument('--mouth-x', type=int, help='X coordinate for mouth anchor (standard style only)')
     parser.add_argument('--mouth-y', type=int, help='Y coordinate for mouth anchor (standard style only)')
+    parser.add_argument('--workers', type=int, help='Frame compositing threads (default: number of CPU cores)')
+    parser.add_argument('--preview', action='store_true',
+                       help='Quick low resolution render of the first few seconds')
     
     args = parser.parse_args()
     
@@ -42,12 +180,13 @@ def main():
     print(f"Audio: {args.audio}")
     
     try:
-        animator = TalkingHeadAnimator()
+        animator = TalkingHeadAnimator(render_workers=args.workers)
         output_path = animator.create_animation(
             image_path=args.image,
             audio_path=args.audio,
             style=args.style,
-            mouth_anchor=mouth_anchor
+            mouth_anchor=mouth_anchor,
+            preview=args.preview
         )
         
         print(f"\n✅ Animation completed successfully!")
@@ -4,16 +4,35 @@ import numpy as np
 from PIL import Image
 import subprocess
 import json
+import shutil
 import tempfile
-from .phoneme_detector import PhonemeDetector
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .phoneme_detector import PhonemeDetector, RhubarbError
 from .image_processor import ImageProcessor
 from .video_renderer import VideoRenderer
+from .disk_cache import AnalysisCache, RigCache
+from .pipeline import Pipeline
+from .keyframes import CanadianKeyframer, NutcrackerKeyframer
+from .metrics import metrics, log_event
 
 class TalkingHeadAnimator:
-    def __init__(self):
+    # Window and hop of the nutcracker amplitude envelope, in seconds
+    AMPLITUDE_SETTINGS = {'window': 0.05, 'hop': 0.02}
+    
+    # Preview renders: the first seconds of audio, the character and canvas
+    # scaled down, fewer frames and the fastest encoder settings
+    PREVIEW_SETTINGS = {'seconds': 3.0, 'scale': 0.5, 'fps': 12, 'preset': 'ultrafast', 'crf': 30}
+    
+    def __init__(self, render_workers=None, cache_dir=None):
         self.phoneme_detector = PhonemeDetector()
         self.image_processor = ImageProcessor()
-        self.video_renderer = VideoRenderer()
+        self.video_renderer = VideoRenderer(workers=render_workers)
+        
+        # Audio analysis results and prepared character rigs are reused
+        # whenever the same audio or character is rendered again
+        self.analysis_cache = AnalysisCache(os.path.join(cache_dir, 'audio_analysis') if cache_dir else None)
+        self.rig_cache = RigCache(os.path.join(cache_dir, 'rigs') if cache_dir else None)
         
         # Simplified to 4 mouth positions like in the image
         # Position 1: Closed
@@ -35,58 +54,279 @@ class TalkingHeadAnimator:
             # Above 0.6 = wide opening
         }
     
-    def create_animation(self, image_path, audio_path, style='canadian', mouth_anchor=None):
-        """Main pipeline to create talking head animation"""
+    def create_animation(self, image_path, audio_path, style='canadian', mouth_anchor=None, progress_callback=None,
+                         output_path=None, preview=False, hls_dir=None):
+        """Main pipeline to create talking head animation
+        
+        progress_callback(stage, done=None, total=None) is called as the pipeline
+        enters each stage: 'audio', 'character', 'keyframes', 'frames' (with
+        frames rendered/total) and 'encode'. With preview=True a quick low
+        resolution render of the start of the clip is made (see PREVIEW_SETTINGS).
+        With hls_dir the video is also streamed there as HLS while it renders
+        """
+        
+        if progress_callback is None:
+            progress_callback = lambda stage, done=None, total=None: None
+        
+        print(f"Creating {'preview' if preview else 'animation'} with style: {style}")
+        
+        render_options = {'fps': 24}
+        preview_dir = None
+        if preview:
+            settings = self.PREVIEW_SETTINGS
+            preview_dir = tempfile.mkdtemp(prefix='preview_')
+            try:
+                image_path = self.image_processor.downscale_image(image_path, settings['scale'],
+                                                                  os.path.join(preview_dir, 'character.png'))
+                audio_path = self.phoneme_detector.trim_audio(audio_path, settings['seconds'],
+                                                              os.path.join(preview_dir, 'audio.wav'))
+            except Exception:
+                shutil.rmtree(preview_dir, ignore_errors=True)
+                raise
+            if mouth_anchor is not None:
+                mouth_anchor = (int(mouth_anchor[0] * settings['scale']), int(mouth_anchor[1] * settings['scale']))
+            render_options = {'fps': settings['fps'], 'canvas_scale': settings['scale'],
+                              'preset': settings['preset'], 'crf': settings['crf']}
+        if hls_dir is not None:
+            render_options['hls_dir'] = hls_dir
+        
+        # Audio analysis and character preparation don't depend on each other,
+        # so they run concurrently; keyframes wait for the audio, rendering for both
+        pipeline = Pipeline()
+        pipeline.add_stage('audio', lambda: self.analyze_audio(audio_path, style, progress_callback))
+        pipeline.add_stage('character', lambda: self.prepare_character(image_path, style, mouth_anchor,
+                                                                       progress_callback))
+        pipeline.add_stage('keyframes', lambda audio_data: self.generate_keyframes(audio_data, style,
+                                                                                   progress_callback,
+                                                                                   fps=render_options['fps']),
+                           depends_on=['audio'])
+        pipeline.add_stage('render', lambda character_data, keyframes: self.video_renderer.render(
+            character_data,
+            keyframes,
+            audio_path,
+            style=style,
+            progress_callback=progress_callback,
+            output_path=output_path,
+            **render_options
+        ), depends_on=['character', 'keyframes'])
+        
+        start = time.perf_counter()
+        try:
+            results = pipeline.run()
+        except Exception as e:
+            self._record_animation(style, 'failed', time.perf_counter() - start, pipeline.timings,
+                                   preview=preview, error=str(e))
+            raise
+        finally:
+            if preview_dir:
+                shutil.rmtree(preview_dir, ignore_errors=True)
+        
+        self._record_animation(style, 'done', time.perf_counter() - start, pipeline.timings,
+                               preview=preview, output=results['render'])
+        print(f"Stage timings:\n{pipeline.format_timings()}")
+        return results['render']
+    
+    def _record_animation(self, style, status, seconds, stage_timings, preview=False, **fields):
+        """Count the animation, time each stage that ran and log the result as one structured event"""
+        mode = 'preview' if preview else 'full'
+        metrics.increment('animator_animations_total', style=style, status=status, mode=mode)
+        metrics.observe('animator_animation_seconds', seconds, style=style, mode=mode)
+        for stage, stage_seconds in stage_timings.items():
+            metrics.observe('animator_stage_seconds', stage_seconds, style=style, stage=stage, mode=mode)
+        log_event('animation', style=style, status=status, mode=mode, seconds=round(seconds, 3),
+                  stages={stage: round(stage_seconds, 3) for stage, stage_seconds in stage_timings.items()},
+                  **fields)
+    
+    def create_batch(self, image_path, audio_paths, style='canadian', mouth_anchor=None, output_dir=None,
+                     workers=None, report_path=None):
+        """Render one video per audio clip for a single character
+        
+        The character is prepared once and the clips are rendered on a pool
+        of workers clips at a time. Failed clips are recorded in the report
+        instead of stopping the batch. Returns the report, which is also
+        written as JSON to report_path (batch_report.json in output_dir by default).
+        """
+        
+        if output_dir is None:
+            output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'output', 'batch')
+        os.makedirs(output_dir, exist_ok=True)
+        if report_path is None:
+            report_path = os.path.join(output_dir, 'batch_report.json')
+        
+        cpu_count = os.cpu_count() or 1
+        if workers is None:
+            workers = cpu_count
+        workers = max(1, min(workers, len(audio_paths)))
+        # Split the cores between clips so concurrent renders don't oversubscribe them
+        render_workers = max(1, cpu_count // workers)
+        
+        print(f"Batch: {len(audio_paths)} clips, style {style}, {workers} clips at a time")
+        batch_start = time.perf_counter()
+        
+        # Prepare the character once for every clip
+        character_data = self.prepare_character(image_path, style, mouth_anchor)
+        
+        output_paths = self._batch_output_paths(audio_paths, output_dir)
+        
+        def render_clip(audio_path, output_path):
+            clip_start = time.perf_counter()
+            entry = {'audio': audio_path, 'output': output_path}
+            try:
+                audio_data = self.analyze_audio(audio_path, style)
+                keyframes = self.generate_keyframes(audio_data, style)
+                # render() adds render settings to character_data, so each clip gets its own dict
+                self.video_renderer.render(dict(character_data), keyframes, audio_path, fps=24, style=style,
+                                           workers=render_workers, output_path=output_path)
+                entry['status'] = 'done'
+            except Exception as e:
+                print(f"Batch clip failed: {audio_path}: {e}")
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+            entry['seconds'] = round(time.perf_counter() - clip_start, 3)
+            return entry
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as pool:
+            clips = list(pool.map(render_clip, audio_paths, output_paths))
+        
+        succeeded = sum(1 for clip in clips if clip['status'] == 'done')
+        report = {
+            'image': image_path,
+            'style': style,
+            'mouth_anchor': mouth_anchor,
+            'workers': workers,
+            'clips': clips,
+            'succeeded': succeeded,
+            'failed': len(clips) - succeeded,
+            'seconds': round(time.perf_counter() - batch_start, 3),
+        }
         
-        print(f"Creating animation with style: {style}")
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
         
-        # Step 1: Extract phonemes/energy from audio
+        print(f"Batch finished: {succeeded}/{len(clips)} clips in {report['seconds']:.1f}s, report: {report_path}")
+        return report
+    
+    def _batch_output_paths(self, audio_paths, output_dir):
+        """One output file per clip, named after the audio file (numbered if names repeat)"""
+        output_paths = []
+        used = set()
+        for audio_path in audio_paths:
+            stem = os.path.splitext(os.path.basename(audio_path))[0] or 'clip'
+            name = f'{stem}.mp4'
+            counter = 2
+            while name in used:
+                name = f'{stem}_{counter}.mp4'
+                counter += 1
+            used.add(name)
+            output_paths.append(os.path.join(output_dir, name))
+        return output_paths
+    
+    def analyze_audio(self, audio_path, style, progress_callback=None):
+        """Step 1: Extract phonemes/energy from audio"""
         print("Analyzing audio...")
+        if progress_callback:
+            progress_callback('audio')
         if style == 'canadian':
             # For Canadian style, we'll use energy-based detection instead of phonemes
-            audio_data = self.analyze_audio_energy(audio_path)
+            return self.analyze_audio_energy(audio_path)
         elif style == 'nutcracker':
             # For Nutcracker style, use amplitude-based analysis
-            audio_data = self.analyze_audio_amplitude(audio_path)
+            # (falls back to mouth cues if the WAV can't be read, so key on both)
+            return self.cached_analysis(
+                'amplitude', audio_path,
+                [self.AMPLITUDE_SETTINGS, self.phoneme_detector.cache_settings()],
+                self.analyze_audio_amplitude)
         else:
             # Standard style still uses phonemes
-            audio_data = self.phoneme_detector.extract_phonemes(audio_path)
-        
-        # Step 2: Process character image based on style
+            return self.extract_mouth_cues(audio_path)
+    
+    def prepare_character(self, image_path, style, mouth_anchor=None, progress_callback=None):
+        """Step 2: Process character image based on style, reusing the cached rig for a repeat character"""
         print("Processing character image...")
+        if progress_callback:
+            progress_callback('character')
+        
+        key = self.rig_cache.key_for(image_path, style, mouth_anchor, self.image_processor.rig_settings())
+        character_data = self.rig_cache.get(key)
+        metrics.increment('animator_cache_requests_total', cache='rig', kind=style,
+                          result='hit' if character_data is not None else 'miss')
+        if character_data is not None:
+            print(f"Using cached {style} rig")
+            if style == 'standard':
+                # Normally done by prepare_character_for_sprites
+                self.image_processor.mouth_sprite_manager.prewarm_scaled_sprites(character_data['sprite_size'])
+            return character_data
+        
+        character_data = self.prepare_character_uncached(image_path, style, mouth_anchor)
+        try:
+            self.rig_cache.put(key, character_data)
+        except OSError as e:
+            print(f"Could not cache {style} rig: {e}")
+        return character_data
+    
+    def prepare_character_uncached(self, image_path, style, mouth_anchor=None):
+        """Decode the character image and build its character_data from scratch"""
         if style == 'standard':
-            character_data = self.image_processor.prepare_character_for_sprites(image_path, mouth_anchor)
+            return self.image_processor.prepare_character_for_sprites(image_path, mouth_anchor)
         elif style == 'nutcracker':
-            character_data = self.image_processor.split_character_nutcracker(image_path, mouth_anchor)
+            return self.image_processor.split_character_nutcracker(image_path, mouth_anchor)
         else:  # canadian style
-            character_data = self.image_processor.split_character(image_path)
-        
-        # Step 3: Generate keyframes based on style
+            return self.image_processor.split_character(image_path)
+    
+    def generate_keyframes(self, audio_data, style, progress_callback=None, fps=24):
+        """Step 3: Generate keyframes based on style"""
         print("Generating animation keyframes...")
+        if progress_callback:
+            progress_callback('keyframes')
         if style == 'standard':
-            keyframes = self.generate_sprite_keyframes(audio_data, fps=24)
+            return self.generate_sprite_keyframes(audio_data, fps=fps)
         elif style == 'nutcracker':
-            keyframes = self.generate_nutcracker_keyframes(audio_data, fps=24)
+            return self.generate_nutcracker_keyframes(audio_data, fps=fps)
         else:  # canadian style
-            keyframes = self.generate_canadian_keyframes(audio_data, fps=24)
-        
-        # Step 4: Render video
-        print("Rendering video...")
-        output_path = self.video_renderer.render(
-            character_data,
-            keyframes,
-            audio_path,
-            fps=24,
-            style=style
-        )
+            return self.generate_canadian_keyframes(audio_data, fps=fps)
+    
+    def keyframer(self, style):
+        """Incremental keyframe generator for the canadian or nutcracker style"""
+        if style == 'nutcracker':
+            return NutcrackerKeyframer()
+        return CanadianKeyframer(self.mouth_positions, self.energy_thresholds)
+    
+    def cached_analysis(self, kind, audio_path, settings, analyze):
+        """Return analyze(audio_path), reusing the cached result for the same audio content and settings"""
+        key = self.analysis_cache.key_for(kind, audio_path, settings)
+        result = self.analysis_cache.get(key)
+        metrics.increment('animator_cache_requests_total', cache='analysis', kind=kind,
+                          result='hit' if result is not None else 'miss')
+        if result is not None:
+            print(f"Using cached {kind} analysis")
+            return result
+        
+        result = analyze(audio_path)
+        try:
+            self.analysis_cache.put(key, result)
+        except OSError as e:
+            print(f"Could not cache {kind} analysis: {e}")
+        return result
+    
+    def extract_mouth_cues(self, audio_path):
+        """Mouth cues from the phoneme detector, cached by audio content and detector settings
         
-        return output_path
+        Fallback cues from a failed Rhubarb run are not cached, so the next
+        request for the same audio tries Rhubarb again
+        """
+        detector = self.phoneme_detector
+        try:
+            return self.cached_analysis('mouth_cues', audio_path, detector.cache_settings(),
+                                        lambda path: detector.extract_phonemes(path, fallback=False))
+        except RhubarbError as e:
+            print(f"Rhubarb failed: {e}, using fallback")
+            return detector.fallback_phonemes(audio_path)
     
     def analyze_audio_energy(self, audio_path):
         """Analyze audio energy levels for Canadian-style animation"""
         # This is a simplified version - you might want to use librosa or another audio library
         # For now, we'll use the phoneme detector but interpret it differently
-        phoneme_data = self.phoneme_detector.extract_phonemes(audio_path)
+        phoneme_data = self.extract_mouth_cues(audio_path)
         
         # Convert phonemes to energy levels (simplified)
         energy_data = []
@@ -117,7 +357,6 @@ class TalkingHeadAnimator:
     def analyze_audio_amplitude(self, audio_path):
         """Analyze audio amplitude levels for Nutcracker-style animation"""
         import wave
-        import struct
         
         # Open the audio file
         try:
@@ -135,163 +374,59 @@ class TalkingHeadAnimator:
             print("Wave file reading failed, using phoneme detector as fallback")
             return self.analyze_audio_energy(audio_path)
         
-        # Convert byte data to amplitude values
+        # Convert byte data to amplitude values in the -1 to 1 range
         if sample_width == 1:
-            fmt = f"{n_frames * channels}B"
-            data = struct.unpack(fmt, frames)
-            data = [float(val - 128) / 128.0 for val in data]  # Convert to -1 to 1 range
+            samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
         elif sample_width == 2:
-            fmt = f"{n_frames * channels}h"
-            data = struct.unpack(fmt, frames)
-            data = [float(val) / 32768.0 for val in data]  # Convert to -1 to 1 range
+            samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+        elif sample_width == 4:
+            samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648.0
         else:
             print(f"Unsupported sample width: {sample_width}")
             return self.analyze_audio_energy(audio_path)
         
+        # Interleaved samples -> one row per audio frame, one column per channel
+        n_frames = len(samples) // channels
+        samples = samples[:n_frames * channels].reshape(n_frames, channels)
+        
+        # Mean power across channels per audio frame, accumulated so every
+        # window's sum is a single subtraction
+        power = np.einsum('ij,ij->i', samples, samples, dtype=np.float64) / channels
+        cumulative_power = np.concatenate(([0.0], np.cumsum(power)))
+        del samples, power
+        
         # Calculate RMS energy using sliding window
-        window_size = int(framerate * 0.05)  # 50ms window
-        hop_size = int(framerate * 0.02)    # 20ms hop
+        window_size = int(framerate * self.AMPLITUDE_SETTINGS['window'])  # 50ms window
+        hop_size = int(framerate * self.AMPLITUDE_SETTINGS['hop'])    # 20ms hop
         
-        amplitude_data = []
+        if window_size == 0 or hop_size == 0 or n_frames <= window_size:
+            return []
         
-        for i in range(0, len(data) - window_size, hop_size):
-            # Get window of samples
-            window = data[i:i + window_size]
-            
-            # Calculate RMS (Root Mean Square) energy
-            rms = np.sqrt(np.mean(np.square(window)))
-            
-            # Convert to time
-            time = i / float(framerate * channels)
-            
-            amplitude_data.append({
-                'start': time,
-                'duration': window_size / float(framerate * channels),
-                'amplitude': rms,
-                'energy': rms  # Keep energy field for compatibility
-            })
+        starts = np.arange(0, n_frames - window_size, hop_size)
+        window_power = (cumulative_power[starts + window_size] - cumulative_power[starts]) / window_size
+        rms = np.sqrt(np.maximum(window_power, 0.0))  # Clamp cumsum rounding noise
         
         # Normalize amplitudes to 0-1 range
-        if amplitude_data:
-            max_amp = max(entry['amplitude'] for entry in amplitude_data)
-            if max_amp > 0:
-                for entry in amplitude_data:
-                    entry['amplitude'] = entry['amplitude'] / max_amp
-                    entry['energy'] = entry['amplitude']  # Keep synchronized
+        max_amp = rms.max() if len(rms) else 0.0
+        if max_amp > 0:
+            rms = rms / max_amp
+        
+        window_duration = window_size / float(framerate)
+        
+        amplitude_data = []
+        for start, amplitude in zip((starts / float(framerate)).tolist(), rms.tolist()):
+            amplitude_data.append({
+                'start': start,
+                'duration': window_duration,
+                'amplitude': amplitude,
+                'energy': amplitude  # Keep energy field for compatibility
+            })
         
         return amplitude_data
     
     def generate_canadian_keyframes(self, audio_data, fps=24):
         """Generate keyframes for Canadian-style animation with 4 mouth positions"""
-        keyframes = []
-        
-        print("\n=== Canadian Animation Keyframes ===")
-        print("Time (s) | Energy | Position | Description | Used")
-        print("-" * 60)
-        
-        # Frame rate control - only use every Nth detection
-        viseme_skip_rate = 3  # Use every 3rd detection (adjust this to control speed)
-        min_duration = 0.15   # Minimum duration between mouth changes (in seconds)
-        
-        last_used_time = -1
-        last_position_index = 0  # Track last mouth position
-        
-        # Simple cycling pattern - we'll cycle through positions based on energy
-        for i, entry in enumerate(audio_data):
-            time = entry['start']
-            energy = entry['energy']
-            
-            # Determine mouth position based on energy level
-            if energy < self.energy_thresholds['silence']:
-                position_index = 0  # Closed
-                description = "Closed"
-            elif energy < self.energy_thresholds['quiet']:
-                position_index = 1  # Small opening
-                description = "Small"
-            elif energy < self.energy_thresholds['normal']:
-                position_index = 2  # Medium opening
-                description = "Medium"
-            else:
-                position_index = 3  # Wide opening
-                description = "Wide"
-            
-            # Special handling for silence - always use silence frames, never skip
-            is_silence = energy < self.energy_thresholds['silence']
-            
-            # Skip this frame if it's too soon after the last one AND it's not silence
-            skip_frame = False
-            if not is_silence and ((i % viseme_skip_rate != 0) or (time - last_used_time < min_duration)):
-                skip_frame = True
-            
-            # Also force a closing frame if we detect a significant pause in audio
-            if i > 0:
-                prev_time = audio_data[i-1]['start'] + audio_data[i-1].get('duration', 0.1)
-                gap_duration = time - prev_time
-                if gap_duration > 0.3 and last_position_index > 0:  # Gap > 300ms and mouth was open
-                    # Add a closing frame at the start of the gap
-                    close_movement = self.mouth_positions[0].copy()  # Closed position
-                    keyframes.append({
-                        'time': prev_time + 0.05,  # Close shortly after previous sound ends
-                        'movement': close_movement,
-                        'position': 1,
-                        'energy': 0,
-                        'reason': 'gap_close'
-                    })
-                    print(f"{prev_time + 0.05:7.2f} | {0.0:6.2f} | {1:8} | {'Gap Close':11} | USED")
-            
-            # Print debug info for all detections
-            used_status = "USED" if not skip_frame else "SKIP"
-            if is_silence and skip_frame:
-                used_status = "SILENCE_USED"  # Override for silence
-                skip_frame = False  # Never skip silence
-            
-            print(f"{time:7.2f} | {energy:6.2f} | {position_index + 1:8} | {description:11} | {used_status}")
-            
-            # Skip this frame if we determined to skip it
-            if skip_frame:
-                continue
-                
-            last_used_time = time
-            last_position_index = position_index
-            
-            # Get the movement values for this position
-            movement = self.mouth_positions[position_index].copy()
-            
-            # Only apply exaggeration if not silence (keep silence completely still)
-            if not is_silence:
-                # Canadian style exaggeration (reduced multipliers)
-                movement['top_y'] = int(movement['top_y'] * 1.2)
-                movement['bottom_y'] = int(movement['bottom_y'] * 1.2)
-                
-                # Add the characteristic up/down movement (scaled down by 2x)
-                movement['top_y'] -= 5      # Head moves up (reduced from 10)
-                movement['bottom_y'] += 3   # Jaw moves down (reduced from 5)
-                
-                # Apply tilt to make it more dynamic
-                if 'tilt' in movement:
-                    movement['tilt'] = movement['tilt'] * 1.1  # Reduced tilt multiplier
-            
-            keyframes.append({
-                'time': time,
-                'movement': movement,
-                'position': position_index + 1,  # 1-4 for display
-                'energy': energy
-            })
-            
-            # Add closing frame between sounds (but less frequently) - only for non-silence
-            if position_index > 0 and not is_silence:  # If mouth was open and not silence
-                # Calculate when to close
-                duration = entry.get('duration', 0.1)
-                close_time = time + min(duration * 0.7, 0.4)  # Increased close duration
-                
-                close_movement = self.mouth_positions[0].copy()  # Closed position
-                
-                keyframes.append({
-                    'time': close_time,
-                    'movement': close_movement,
-                    'position': 1,
-                    'energy': 0
-                })
+        keyframes = self.keyframer('canadian').feed(audio_data)
         
         print(f"\nGenerated {len(keyframes)} keyframes from {len(audio_data)} audio segments")
         return keyframes
@@ -331,78 +466,7 @@ class TalkingHeadAnimator:
     
     def generate_nutcracker_keyframes(self, audio_data, fps=24):
         """Generate keyframes for Nutcracker-style jaw animation with vertical sliding"""
-        keyframes = []
-        
-        print("\n=== Nutcracker Animation Keyframes ===")
-        print("Time (s) | Amplitude | Jaw Offset | Description")
-        print("-" * 50)
-        
-        # Configuration for jaw movement (vertical pixels)
-        max_jaw_offset = 30  # Maximum jaw drop in pixels
-        overshoot_offset = 35  # Overshoot for bounce effect
-        attack_time = 0.1  # Time to open jaw (100ms)
-        decay_time = 0.2   # Time to close jaw (200ms)
-        
-        # Thresholds for jaw movement
-        silence_threshold = 0.1
-        quiet_threshold = 0.3
-        normal_threshold = 0.6
-        
-        last_offset = 0
-        last_time = -1
-        
-        for i, entry in enumerate(audio_data):
-            time = entry['start']
-            amplitude = entry.get('amplitude', entry.get('energy', 0))
-            
-            # Map amplitude to jaw vertical offset
-            if amplitude < silence_threshold:
-                target_offset = 0  # Closed
-                description = "Closed"
-            elif amplitude < quiet_threshold:
-                target_offset = 10  # 10 pixels down
-                description = "Small"
-            elif amplitude < normal_threshold:
-                target_offset = 20  # 20 pixels down
-                description = "Medium"
-            else:
-                target_offset = max_jaw_offset  # 30 pixels down
-                description = "Wide"
-            
-            # Add overshoot for sudden loud sounds
-            if amplitude > 0.8 and last_offset < 15:
-                # Create overshoot keyframe
-                overshoot_time = time + attack_time * 0.5
-                keyframes.append({
-                    'time': overshoot_time,
-                    'jaw_offset_y': overshoot_offset,
-                    'amplitude': amplitude,
-                    'description': 'Overshoot'
-                })
-                print(f"{overshoot_time:7.2f} | {amplitude:9.2f} | {overshoot_offset:10} | {description} (overshoot)")
-            
-            # Main keyframe
-            keyframes.append({
-                'time': time,
-                'jaw_offset_y': target_offset,
-                'amplitude': amplitude,
-                'description': description
-            })
-            
-            print(f"{time:7.2f} | {amplitude:9.2f} | {target_offset:10} | {description}")
-            
-            # Add closing keyframe for non-silence
-            if target_offset > 0:
-                close_time = time + entry.get('duration', 0.1) * 0.7
-                keyframes.append({
-                    'time': close_time,
-                    'jaw_offset_y': 0,
-                    'amplitude': 0,
-                    'description': 'Close'
-                })
-            
-            last_offset = target_offset
-            last_time = time
+        keyframes = self.keyframer('nutcracker').feed(audio_data)
         
         print(f"\nGenerated {len(keyframes)} keyframes from {len(audio_data)} audio segments")
         return keyframes
\ No newline at end of file
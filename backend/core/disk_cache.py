@@ -0,0 +1,178 @@
+"""
+On-disk caches for expensive, repeatable pipeline steps (audio analysis, character rigs)
+Entries are content addressed (keyed by a hash of their inputs) and evicted
+least-recently-used first once the cache directory grows past its size limit
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+CACHE_ROOT = os.path.join(os.path.dirname(__file__), '..', '..', 'cache')
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Directory of content-addressed files with size-based LRU eviction"""
+
+    def __init__(self, cache_dir, max_bytes, suffix):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, *parts):
+        """Hash any JSON-serializable key parts into a cache key"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def lookup(self, key):
+        """Path of a cached entry, or None; a hit refreshes the entry's LRU position"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # mtime is the LRU clock
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, key, write_entry):
+        """Create an entry by calling write_entry(file) on a temp file, then publish it atomically"""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write_entry(f)
+            os.replace(temp_path, self.path_for(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        self.evict()
+        return self.path_for(key)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class AnalysisCache(DiskCache):
+    """JSON audio analysis results (mouth cues, amplitude envelopes) keyed by audio content and settings"""
+
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024):
+        if cache_dir is None:
+            cache_dir = os.path.join(CACHE_ROOT, 'audio_analysis')
+        super().__init__(cache_dir, max_bytes, '.json')
+
+    def key_for(self, kind, audio_path, settings):
+        return self.make_key(kind, file_digest(audio_path), settings)
+
+    def get(self, key):
+        """Cached analysis result, or None on a miss"""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # Evicted or unreadable, treat as a miss
+
+    def put(self, key, result):
+        self.store(key, lambda f: f.write(json.dumps(result).encode('utf-8')))
+
+
+class RigCache(DiskCache):
+    """Prepared character_data dicts stored as .npz files: arrays as-is plus a JSON description of everything else"""
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024):
+        if cache_dir is None:
+            cache_dir = os.path.join(CACHE_ROOT, 'rigs')
+        super().__init__(cache_dir, max_bytes, '.npz')
+
+    def key_for(self, image_path, style, mouth_anchor, settings):
+        return self.make_key('rig', file_digest(image_path), style, mouth_anchor, settings)
+
+    def get(self, key):
+        """Cached character_data, or None on a miss"""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files if name != '__meta__'}
+                meta = json.loads(data['__meta__'].tobytes().decode('utf-8'))
+            return self._decode(meta, arrays)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable rig cache entry {path}: {e}")
+            return None
+
+    def put(self, key, character_data):
+        arrays = {}
+        meta = self._encode(character_data, arrays)
+        arrays['__meta__'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+        self.store(key, lambda f: np.savez_compressed(f, **arrays))
+
+    def _encode(self, value, arrays):
+        """JSON-safe description of value; arrays are moved into the arrays dict"""
+        if isinstance(value, np.ndarray):
+            name = f'array_{len(arrays)}'
+            arrays[name] = value
+            return {'__array__': name}
+        if isinstance(value, tuple):
+            return {'__tuple__': [self._encode(item, arrays) for item in value]}
+        if isinstance(value, list):
+            return [self._encode(item, arrays) for item in value]
+        if isinstance(value, dict):
+            return {'__dict__': {key: self._encode(item, arrays) for key, item in value.items()}}
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def _decode(self, value, arrays):
+        if isinstance(value, list):
+            return [self._decode(item, arrays) for item in value]
+        if isinstance(value, dict):
+            if '__array__' in value:
+                return arrays[value['__array__']]
+            if '__tuple__' in value:
+                return tuple(self._decode(item, arrays) for item in value['__tuple__'])
+            return {key: self._decode(item, arrays) for key, item in value['__dict__'].items()}
+        return value
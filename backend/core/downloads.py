@@ -0,0 +1,75 @@
+"""
+Content-Addressed Downloads
+Content digests of rendered videos (used as strong ETags) and file names
+that embed them, so a download URL always means the same bytes and can be
+cached forever
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from .disk_cache import file_digest
+
+# Hex digits of the content digest put into a file name (64 bits)
+DIGEST_LENGTH = 16
+
+
+class DigestIndex:
+    """SHA-256 digests of files, recomputed only when a file's size or modification time changes"""
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        # path -> (size, mtime_ns, digest), least recently used first, so reaped videos age out
+        self.max_entries = max_entries
+        self._digests = OrderedDict()
+
+    def digest(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._digests.pop(path, None)
+            raise
+
+        with self._lock:
+            cached = self._digests.get(path)
+            if cached is not None:
+                self._digests.move_to_end(path)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        digest = file_digest(path)
+        self._remember(path, (stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def rename_to_content(self, path):
+        """Rename a finished file after its content digest and return the new path"""
+        digest = self.digest(path)
+        new_path = os.path.join(os.path.dirname(path), content_addressed_name(os.path.basename(path), digest))
+        os.replace(path, new_path)
+
+        # A rename keeps the size and modification time, so the digest carries over
+        with self._lock:
+            entry = self._digests.pop(path, None)
+        if entry is not None:
+            self._remember(new_path, entry)
+        return new_path
+
+    def _remember(self, path, entry):
+        with self._lock:
+            self._digests[path] = entry
+            self._digests.move_to_end(path)
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+
+
+def content_addressed_name(filename, digest):
+    """filename with the start of digest added before its extension"""
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}_{digest[:DIGEST_LENGTH]}{ext}'
+
+
+def is_content_addressed(filename, digest):
+    """Whether filename carries digest, i.e. the name can never refer to other content"""
+    return os.path.splitext(filename)[0].endswith('_' + digest[:DIGEST_LENGTH])
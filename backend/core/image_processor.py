@@ -2,12 +2,35 @@ import cv2
 import numpy as np
 from PIL import Image
 from .mouth_sprite_manager import MouthSpriteManager
+from .metrics import trace
 
 class ImageProcessor:
+    # Character parts that are resized to the render scale by prepare_rig
+    RIG_PARTS = ('top_half', 'bottom_half', 'base_face', 'jaw_image')
+    
+    # Bump whenever a change alters the character_data prepared from the same
+    # image, so cached rigs from older versions are not reused
+    RIG_VERSION = 1
+    
     def __init__(self):
         self.split_ratio = 0.75  # 75% top, 25% bottom - splits at mouth level for better flappy head effect
         self.mouth_sprite_manager = MouthSpriteManager()
         
+    def rig_settings(self):
+        """Everything besides the image, style and mouth anchor that determines the prepared character_data"""
+        return {'version': self.RIG_VERSION, 'split_ratio': self.split_ratio}
+    
+    def downscale_image(self, image_path, scale_factor, output_path):
+        """Write a copy of the image scaled by scale_factor to output_path (PNG, alpha kept)"""
+        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise Exception(f"Could not load image: {image_path}")
+        
+        height, width = img.shape[:2]
+        size = (max(1, int(width * scale_factor)), max(1, int(height * scale_factor)))
+        cv2.imwrite(output_path, cv2.resize(img, size, interpolation=cv2.INTER_AREA))
+        return output_path
+    
     def split_character(self, image_path):
         """Split character image into top and bottom halves"""
         
@@ -262,6 +285,9 @@ class ImageProcessor:
         sprite_size = self.mouth_sprite_manager.detect_mouth_region_size(img, mouth_anchor)
         print(f"Suggested sprite size: {sprite_size}")
         
+        # Resize all the mouth sprites now so rendering only looks them up
+        self.mouth_sprite_manager.prewarm_scaled_sprites(sprite_size)
+        
         # Create mask for mouth region (for optional mouth removal)
         mouth_mask = self.create_mouth_removal_mask(img, mouth_anchor, sprite_size)
         
@@ -341,7 +367,7 @@ class ImageProcessor:
         if angle == 0:
             return image, None
         
-        print(f"Rotating image by {angle}° around pivot {pivot}")
+        trace(f"Rotating image by {angle}° around pivot {pivot}")
         
         # Get rotation matrix around the pivot point
         M = cv2.getRotationMatrix2D(pivot, angle, 1.0)
@@ -373,9 +399,9 @@ class ImageProcessor:
         # Create white background canvas
         frame = np.full((canvas_height, canvas_width, 4), [255, 255, 255, 255], dtype=np.uint8)
         
-        # Scale the character parts
-        top_half_scaled = self.scale_image(character_data['top_half'], scale_factor)
-        bottom_half_scaled = self.scale_image(character_data['bottom_half'], scale_factor)
+        # Character parts at render scale (prepared once per job)
+        top_half_scaled = self.get_scaled_part(character_data, 'top_half')
+        bottom_half_scaled = self.get_scaled_part(character_data, 'bottom_half')
         
         # Calculate base positions (centered in canvas)
         char_width_scaled = int(character_data['width'] * scale_factor)
@@ -446,9 +472,9 @@ class ImageProcessor:
             print(f"Scale factor: {scale_factor}")
             print(f"Movement offsets: {movement}")
         
-        # Scale the character parts
-        top_half_scaled = self.scale_image(character_data['top_half'], scale_factor)
-        bottom_half_scaled = self.scale_image(character_data['bottom_half'], scale_factor)
+        # Character parts at render scale (prepared once per job)
+        top_half_scaled = self.get_scaled_part(character_data, 'top_half')
+        bottom_half_scaled = self.get_scaled_part(character_data, 'bottom_half')
         
         # Calculate base positions (centered in canvas)
         char_width_scaled = int(character_data['width'] * scale_factor)
@@ -495,6 +521,32 @@ class ImageProcessor:
         
         return frame
     
+    def prepare_rig(self, character_data):
+        """Resize the movable character parts once at the render scale factor"""
+        scale_factor = character_data['scale_factor']
+        
+        for part in self.RIG_PARTS:
+            if part in character_data:
+                scaled = self.scale_image(character_data[part], scale_factor)
+                if scaled is character_data[part]:
+                    scaled = scaled.view()  # Keep the source part writable
+                scaled.flags.writeable = False  # Shared by every frame (and worker thread)
+                character_data[f'{part}_scaled'] = scaled
+        
+        character_data['rig_scale_factor'] = scale_factor
+        print(f"Prepared character rig at scale {scale_factor}")
+        
+        return character_data
+    
+    def get_scaled_part(self, character_data, part):
+        """Get a character part at the render scale, from the prepared rig when available"""
+        scale_factor = character_data['scale_factor']
+        
+        if character_data.get('rig_scale_factor') == scale_factor:
+            return character_data[f'{part}_scaled']
+        
+        return self.scale_image(character_data[part], scale_factor)
+    
     def scale_image(self, image, scale_factor):
         """Scale image by given factor"""
         if scale_factor == 1.0:
@@ -533,32 +585,59 @@ class ImageProcessor:
         image_region = image[img_start_y:img_end_y, img_start_x:img_end_x]
         
         if image_region.shape[2] == 4:  # Has alpha channel
-            # Extract alpha channels as float
-            src_alpha = image_region[:, :, 3:4] / 255.0
-            dst_alpha = canvas_region[:, :, 3:4] / 255.0
-            
-            # Compute output alpha using "over" operator
-            out_alpha = src_alpha + dst_alpha * (1 - src_alpha)
-            
-            # Avoid division by zero - where out_alpha is 0, the result should be transparent
-            out_alpha_safe = np.where(out_alpha > 0, out_alpha, 1)
-            
-            # Blend RGB channels using proper alpha compositing
-            blended_rgb = np.where(
-                out_alpha > 0,
-                (image_region[:, :, :3] * src_alpha + 
-                 canvas_region[:, :, :3] * dst_alpha * (1 - src_alpha)) / out_alpha_safe,
-                0  # Fully transparent pixels become black
-            )
-            
-            # Update canvas with blended result
-            canvas[start_y:end_y, start_x:end_x, :3] = blended_rgb.astype(np.uint8)
-            canvas[start_y:end_y, start_x:end_x, 3] = (out_alpha[:, :, 0] * 255).astype(np.uint8)
+            if canvas_region[:, :, 3].min() == 255:
+                # Opaque destination (e.g. the white canvas): integer fast path
+                self._blend_over_opaque(canvas_region, image_region)
+            else:
+                self._blend_over_float(canvas_region, image_region)
         else:
             # No alpha in source, treat as opaque
             canvas[start_y:end_y, start_x:end_x, :3] = image_region
             canvas[start_y:end_y, start_x:end_x, 3] = 255  # Set alpha to opaque
     
+    def _blend_over_opaque(self, canvas_region, image_region):
+        """Blend RGBA onto an opaque region in place with uint16 fixed-point arithmetic"""
+        src_alpha = image_region[:, :, 3:4]
+        
+        # Premultiplied source plus destination weighted by (255 - alpha);
+        # the sum is at most 255 * 255 so it fits in uint16
+        blended = np.multiply(image_region[:, :, :3], src_alpha, dtype=np.uint16)
+        scratch = np.multiply(canvas_region[:, :, :3], 255 - src_alpha, dtype=np.uint16)
+        blended += scratch
+        
+        # Rounded division by 255: (x + 128 + ((x + 128) >> 8)) >> 8
+        blended += 128
+        np.right_shift(blended, 8, out=scratch)
+        blended += scratch
+        blended >>= 8
+        
+        # Destination stays opaque, so only the colour channels change
+        np.copyto(canvas_region[:, :, :3], blended, casting='unsafe')
+    
+    def _blend_over_float(self, canvas_region, image_region):
+        """Blend RGBA onto a (partially) transparent region with the float "over" operator"""
+        # Extract alpha channels as float
+        src_alpha = image_region[:, :, 3:4] / 255.0
+        dst_alpha = canvas_region[:, :, 3:4] / 255.0
+        
+        # Compute output alpha using "over" operator
+        out_alpha = src_alpha + dst_alpha * (1 - src_alpha)
+        
+        # Avoid division by zero - where out_alpha is 0, the result should be transparent
+        out_alpha_safe = np.where(out_alpha > 0, out_alpha, 1)
+        
+        # Blend RGB channels using proper alpha compositing
+        blended_rgb = np.where(
+            out_alpha > 0,
+            (image_region[:, :, :3] * src_alpha + 
+             canvas_region[:, :, :3] * dst_alpha * (1 - src_alpha)) / out_alpha_safe,
+            0  # Fully transparent pixels become black
+        )
+        
+        # Update canvas with blended result
+        canvas_region[:, :, :3] = blended_rgb.astype(np.uint8)
+        canvas_region[:, :, 3] = (out_alpha[:, :, 0] * 255).astype(np.uint8)
+    
     def fill_mouth_cavity(self, canvas, top_x, top_y, bottom_x, bottom_y, top_shape, bottom_shape):
         """Fill black cavity between separated mouth parts"""
         # Calculate the gap between top and bottom parts
@@ -600,9 +679,9 @@ class ImageProcessor:
         # Create white background canvas
         frame = np.full((canvas_height, canvas_width, 4), [255, 255, 255, 255], dtype=np.uint8)
         
-        # Scale the base face
-        base_face_scaled = self.scale_image(character_data['base_face'], scale_factor)
-        jaw_scaled = self.scale_image(character_data['jaw_image'], scale_factor)
+        # Base face and jaw at render scale (prepared once per job)
+        base_face_scaled = self.get_scaled_part(character_data, 'base_face')
+        jaw_scaled = self.get_scaled_part(character_data, 'jaw_image')
         
         # Calculate positions
         char_width_scaled = int(character_data['width'] * scale_factor)
@@ -0,0 +1,192 @@
+"""
+Background Job Queue for Animation Renders
+Runs create_animation on a bounded worker pool and tracks each job's
+status and per-stage progress so the web app can answer status polls
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import metrics, log_event
+
+# Share of the overall progress bar covered by each pipeline stage, in pipeline order
+STAGE_WEIGHTS = [
+    ('audio', 0.10),
+    ('character', 0.05),
+    ('keyframes', 0.05),
+    ('frames', 0.75),
+    ('encode', 0.05),
+]
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobManager:
+    """Bounded pool of render workers with pollable job state"""
+
+    def __init__(self, max_workers=1, max_queued=16, keep_finished=100):
+        self.max_workers = max_workers
+        self.max_queued = max_queued  # Jobs waiting for a worker, beyond those running
+        self.keep_finished = keep_finished  # Finished jobs remembered for status polls
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Notified on every job update
+
+    def new_job_id(self):
+        """Reserve an id before submitting, e.g. to create the job's workspace first"""
+        return uuid.uuid4().hex
+
+    def submit(self, fn, *args, job_id=None, **kwargs):
+        """Queue fn(*args, progress_callback=..., **kwargs) and return the job's id"""
+        with self._lock:
+            active = len(self._active_ids())
+            if active >= self.max_workers + self.max_queued:
+                raise QueueFullError(f"Render queue is full ({active} jobs pending)")
+
+            if job_id is None:
+                job_id = self.new_job_id()
+            now = time.time()
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'stage': None,
+                'progress': 0.0,
+                'eta_seconds': None,
+                'frames_done': 0,
+                'frames_total': None,
+                'result': None,
+                'error': None,
+                'created_at': now,
+                'updated_at': now,
+                'version': 0,  # Bumped on every update, see wait_for_change
+            }
+            self._forget_old_jobs()
+
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def active_ids(self):
+        """Ids of jobs that are queued or running"""
+        with self._lock:
+            return self._active_ids()
+
+    def _active_ids(self):
+        return {job_id for job_id, job in self._jobs.items() if job['status'] in ('queued', 'running')}
+
+    def status_counts(self):
+        """Number of remembered jobs in each status"""
+        with self._lock:
+            counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+    def get(self, job_id):
+        """Snapshot of a job's state, or None for unknown ids"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait_for_change(self, job_id, version, timeout=None):
+        """Block until the job's version differs from version (or timeout) and return its snapshot
+
+        Returns the unchanged snapshot on timeout, and None for unknown ids.
+        """
+        def changed():
+            job = self._jobs.get(job_id)
+            return job is None or job['version'] != version
+
+        with self._changed:
+            self._changed.wait_for(changed, timeout=timeout)
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, job_id, fn, args, kwargs):
+        started_at = time.time()
+        self._update(job_id, status='running', started_at=started_at)
+        try:
+            result = fn(*args, progress_callback=self._progress_reporter(job_id), **kwargs)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            import traceback
+            traceback.print_exc()
+            self._update(job_id, status='failed', error=str(e))
+            self._record_job(job_id, 'failed', started_at, error=str(e))
+        else:
+            self._update(job_id, status='done', stage='done', progress=1.0, eta_seconds=0.0, result=result)
+            self._record_job(job_id, 'done', started_at)
+
+    def _record_job(self, job_id, status, started_at, **fields):
+        """Time the finished job's wait in the queue and its run, and log it"""
+        job = self.get(job_id)
+        if job is None:
+            return
+        queued_seconds = started_at - job['created_at']
+        run_seconds = time.time() - started_at
+
+        metrics.increment('animator_jobs_total', status=status)
+        metrics.observe('animator_job_queue_seconds', queued_seconds)
+        metrics.observe('animator_job_run_seconds', run_seconds, status=status)
+        log_event('job', job_id=job_id, status=status, queued_seconds=round(queued_seconds, 3),
+                  run_seconds=round(run_seconds, 3), frames=job['frames_total'], **fields)
+
+    def _progress_reporter(self, job_id):
+        """Callback for create_animation: progress_callback(stage, done=None, total=None)"""
+        def report(stage, done=None, total=None):
+            changes = {'stage': stage}
+            if stage == 'frames':
+                changes['frames_done'] = done
+                changes['frames_total'] = total
+            self._update(job_id, progress=overall_progress(stage, done, total), **changes)
+        return report
+
+    def _update(self, job_id, progress=None, **changes):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                now = time.time()
+                job.update(changes)
+                if progress is not None:
+                    # Stages can run concurrently, so never let progress move backwards
+                    job['progress'] = max(job['progress'], progress)
+                    if job['status'] == 'running':
+                        job['eta_seconds'] = estimate_remaining(job['progress'], now - job['started_at'])
+                job['updated_at'] = now
+                job['version'] += 1
+                self._changed.notify_all()
+
+    def _forget_old_jobs(self):
+        """Drop the oldest finished jobs beyond keep_finished (caller holds the lock)"""
+        finished = [job for job in self._jobs.values() if job['status'] in ('done', 'failed')]
+        excess = len(finished) - self.keep_finished
+        if excess > 0:
+            finished.sort(key=lambda job: job['updated_at'])
+            for job in finished[:excess]:
+                del self._jobs[job['id']]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def overall_progress(stage, done=None, total=None):
+    """Map a stage (and optional done/total within it) onto a 0-1 progress value"""
+    completed = 0.0
+    for name, weight in STAGE_WEIGHTS:
+        if name == stage:
+            fraction = done / total if done is not None and total else 0.0
+            return min(1.0, completed + weight * min(1.0, fraction))
+        completed += weight
+    return completed
+
+
+def estimate_remaining(progress, elapsed, min_progress=0.05):
+    """Seconds left if the rest of the job goes at the rate so far, or None until there is enough to go on"""
+    if progress < min_progress:
+        return None
+    return round(max(0.0, elapsed * (1.0 - progress) / progress), 1)
@@ -0,0 +1,221 @@
+"""
+Incremental Keyframe Generation
+Turns audio segments into canadian or nutcracker keyframes a batch at a
+time, so the same rules serve whole-file renders and live audio streams
+"""
+
+from .metrics import trace
+
+
+class CanadianKeyframer:
+    """Canadian-style keyframes with 4 mouth positions, generated from energy segments"""
+
+    # Frame rate control - only use every Nth detection
+    viseme_skip_rate = 3  # Use every 3rd detection (adjust this to control speed)
+    min_duration = 0.15   # Minimum duration between mouth changes (in seconds)
+
+    def __init__(self, mouth_positions, energy_thresholds):
+        self.mouth_positions = mouth_positions
+        self.energy_thresholds = energy_thresholds
+
+        self.segments_seen = 0
+        self.last_used_time = -1
+        self.last_position_index = 0  # Track last mouth position
+        self.prev_entry = None
+
+        # Per-segment table, only with tracing on (ANIMATOR_TRACE=1)
+        trace("\n=== Canadian Animation Keyframes ===")
+        trace("Time (s) | Energy | Position | Description | Used")
+        trace("-" * 60)
+
+    def feed(self, segments):
+        """Keyframes for the next segments, continuing from the ones already fed"""
+        keyframes = []
+
+        # Simple cycling pattern - we'll cycle through positions based on energy
+        for entry in segments:
+            i = self.segments_seen
+            self.segments_seen += 1
+            prev_entry, self.prev_entry = self.prev_entry, entry
+
+            time = entry['start']
+            energy = entry['energy']
+
+            # Determine mouth position based on energy level
+            if energy < self.energy_thresholds['silence']:
+                position_index = 0  # Closed
+                description = "Closed"
+            elif energy < self.energy_thresholds['quiet']:
+                position_index = 1  # Small opening
+                description = "Small"
+            elif energy < self.energy_thresholds['normal']:
+                position_index = 2  # Medium opening
+                description = "Medium"
+            else:
+                position_index = 3  # Wide opening
+                description = "Wide"
+
+            # Special handling for silence - always use silence frames, never skip
+            is_silence = energy < self.energy_thresholds['silence']
+
+            # Skip this frame if it's too soon after the last one AND it's not silence
+            skip_frame = False
+            if not is_silence and ((i % self.viseme_skip_rate != 0) or
+                                   (time - self.last_used_time < self.min_duration)):
+                skip_frame = True
+
+            # Also force a closing frame if we detect a significant pause in audio
+            if prev_entry is not None:
+                prev_time = prev_entry['start'] + prev_entry.get('duration', 0.1)
+                gap_duration = time - prev_time
+                if gap_duration > 0.3 and self.last_position_index > 0:  # Gap > 300ms and mouth was open
+                    # Add a closing frame at the start of the gap
+                    close_movement = self.mouth_positions[0].copy()  # Closed position
+                    keyframes.append({
+                        'time': prev_time + 0.05,  # Close shortly after previous sound ends
+                        'movement': close_movement,
+                        'position': 1,
+                        'energy': 0,
+                        'reason': 'gap_close'
+                    })
+                    trace(f"{prev_time + 0.05:7.2f} | {0.0:6.2f} | {1:8} | {'Gap Close':11} | USED")
+
+            # Print debug info for all detections
+            used_status = "USED" if not skip_frame else "SKIP"
+            if is_silence and skip_frame:
+                used_status = "SILENCE_USED"  # Override for silence
+                skip_frame = False  # Never skip silence
+
+            trace(f"{time:7.2f} | {energy:6.2f} | {position_index + 1:8} | {description:11} | {used_status}")
+
+            # Skip this frame if we determined to skip it
+            if skip_frame:
+                continue
+
+            self.last_used_time = time
+            self.last_position_index = position_index
+
+            # Get the movement values for this position
+            movement = self.mouth_positions[position_index].copy()
+
+            # Only apply exaggeration if not silence (keep silence completely still)
+            if not is_silence:
+                # Canadian style exaggeration (reduced multipliers)
+                movement['top_y'] = int(movement['top_y'] * 1.2)
+                movement['bottom_y'] = int(movement['bottom_y'] * 1.2)
+
+                # Add the characteristic up/down movement (scaled down by 2x)
+                movement['top_y'] -= 5      # Head moves up (reduced from 10)
+                movement['bottom_y'] += 3   # Jaw moves down (reduced from 5)
+
+                # Apply tilt to make it more dynamic
+                if 'tilt' in movement:
+                    movement['tilt'] = movement['tilt'] * 1.1  # Reduced tilt multiplier
+
+            keyframes.append({
+                'time': time,
+                'movement': movement,
+                'position': position_index + 1,  # 1-4 for display
+                'energy': energy
+            })
+
+            # Add closing frame between sounds (but less frequently) - only for non-silence
+            if position_index > 0 and not is_silence:  # If mouth was open and not silence
+                # Calculate when to close
+                duration = entry.get('duration', 0.1)
+                close_time = time + min(duration * 0.7, 0.4)  # Increased close duration
+
+                close_movement = self.mouth_positions[0].copy()  # Closed position
+
+                keyframes.append({
+                    'time': close_time,
+                    'movement': close_movement,
+                    'position': 1,
+                    'energy': 0
+                })
+
+        return keyframes
+
+
+class NutcrackerKeyframer:
+    """Nutcracker-style jaw keyframes with vertical sliding, generated from amplitude segments"""
+
+    # Configuration for jaw movement (vertical pixels)
+    max_jaw_offset = 30  # Maximum jaw drop in pixels
+    overshoot_offset = 35  # Overshoot for bounce effect
+    attack_time = 0.1  # Time to open jaw (100ms)
+    decay_time = 0.2   # Time to close jaw (200ms)
+
+    # Thresholds for jaw movement
+    silence_threshold = 0.1
+    quiet_threshold = 0.3
+    normal_threshold = 0.6
+
+    def __init__(self):
+        self.last_offset = 0
+        self.last_time = -1
+
+        # Per-segment table, only with tracing on (ANIMATOR_TRACE=1)
+        trace("\n=== Nutcracker Animation Keyframes ===")
+        trace("Time (s) | Amplitude | Jaw Offset | Description")
+        trace("-" * 50)
+
+    def feed(self, segments):
+        """Keyframes for the next segments, continuing from the ones already fed"""
+        keyframes = []
+
+        for entry in segments:
+            time = entry['start']
+            amplitude = entry.get('amplitude', entry.get('energy', 0))
+
+            # Map amplitude to jaw vertical offset
+            if amplitude < self.silence_threshold:
+                target_offset = 0  # Closed
+                description = "Closed"
+            elif amplitude < self.quiet_threshold:
+                target_offset = 10  # 10 pixels down
+                description = "Small"
+            elif amplitude < self.normal_threshold:
+                target_offset = 20  # 20 pixels down
+                description = "Medium"
+            else:
+                target_offset = self.max_jaw_offset  # 30 pixels down
+                description = "Wide"
+
+            # Add overshoot for sudden loud sounds
+            if amplitude > 0.8 and self.last_offset < 15:
+                # Create overshoot keyframe
+                overshoot_time = time + self.attack_time * 0.5
+                keyframes.append({
+                    'time': overshoot_time,
+                    'jaw_offset_y': self.overshoot_offset,
+                    'amplitude': amplitude,
+                    'description': 'Overshoot'
+                })
+                trace(f"{overshoot_time:7.2f} | {amplitude:9.2f} | {self.overshoot_offset:10} | "
+                      f"{description} (overshoot)")
+
+            # Main keyframe
+            keyframes.append({
+                'time': time,
+                'jaw_offset_y': target_offset,
+                'amplitude': amplitude,
+                'description': description
+            })
+
+            trace(f"{time:7.2f} | {amplitude:9.2f} | {target_offset:10} | {description}")
+
+            # Add closing keyframe for non-silence
+            if target_offset > 0:
+                close_time = time + entry.get('duration', 0.1) * 0.7
+                keyframes.append({
+                    'time': close_time,
+                    'jaw_offset_y': 0,
+                    'amplitude': 0,
+                    'description': 'Close'
+                })
+
+            self.last_offset = target_offset
+            self.last_time = time
+
+        return keyframes
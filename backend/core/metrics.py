@@ -0,0 +1,140 @@
+"""
+Pipeline Metrics and Structured Logging
+Process-wide counters, gauges and timers for the render pipeline, JSON
+event logs for finished stages, renders and jobs, and the switch for the
+high-volume per-segment, per-keyframe and per-frame trace output
+"""
+
+import json
+import os
+import threading
+import time
+
+# Per-segment, per-keyframe and per-frame output is off unless ANIMATOR_TRACE=1
+_trace = os.environ.get('ANIMATOR_TRACE', '').lower() in ('1', 'true', 'yes')
+
+
+def trace_enabled():
+    return _trace
+
+
+def set_trace(enabled):
+    """Turn the high-volume trace output on or off for the whole process"""
+    global _trace
+    _trace = bool(enabled)
+
+
+def trace(message):
+    """Print message only when tracing is enabled"""
+    if _trace:
+        print(message)
+
+
+def log_event(event, **fields):
+    """Print one structured log line: a JSON object with the event name, a timestamp and fields"""
+    record = {'ts': round(time.time(), 3), 'event': event}
+    record.update(fields)
+    print(json.dumps(record, default=str), flush=True)
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and timers, each keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # (name, labels) -> value
+        self._timers = {}  # (name, labels) -> {'count', 'sum', 'max'} in seconds
+
+    def increment(self, name, value=1, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, self._labels(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration for the timer name"""
+        key = (name, self._labels(labels))
+        with self._lock:
+            timer = self._timers.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            timer['count'] += 1
+            timer['sum'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+
+    def value(self, name, **labels):
+        """Current value of a counter or gauge (0 if never set)"""
+        key = (name, self._labels(labels))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def snapshot(self):
+        """All metrics as JSON-friendly lists"""
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self._counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self._gauges.items())],
+                'timers': [dict({'name': name, 'labels': dict(labels)}, **timer)
+                           for (name, labels), timer in sorted(self._timers.items())],
+            }
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format
+
+        Timers are exposed as summaries (<name>_count, <name>_sum) plus a
+        <name>_max gauge, which is what slow-job alerts usually key on.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for counter in snapshot['counters']:
+            declare(counter['name'], 'counter')
+            lines.append(f"{counter['name']}{self._format_labels(counter['labels'])} {counter['value']}")
+        for gauge in snapshot['gauges']:
+            declare(gauge['name'], 'gauge')
+            lines.append(f"{gauge['name']}{self._format_labels(gauge['labels'])} {gauge['value']}")
+        timer_names = sorted({timer['name'] for timer in snapshot['timers']})
+        for name in timer_names:
+            timers = [timer for timer in snapshot['timers'] if timer['name'] == name]
+            declare(name, 'summary')
+            for timer in timers:
+                labels = self._format_labels(timer['labels'])
+                lines.append(f"{name}_count{labels} {timer['count']}")
+                lines.append(f"{name}_sum{labels} {timer['sum']:.6f}")
+            declare(f"{name}_max", 'gauge')
+            for timer in timers:
+                lines.append(f"{name}_max{self._format_labels(timer['labels'])} {timer['max']:.6f}")
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+
+    def _labels(self, labels):
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def _format_labels(self, labels):
+        if not labels:
+            return ''
+        pairs = []
+        for key, value in labels.items():
+            value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{key}="{value}"')
+        return '{' + ','.join(pairs) + '}'
+
+
+# Shared by the animator, renderer, job manager and the /metrics endpoint
+metrics = MetricsRegistry()
@@ -4,70 +4,117 @@ Handles loading, caching, and management of mouth sprite images
 """
 
 import os
+import threading
+from collections import OrderedDict
 from PIL import Image
 import numpy as np
 import cv2
 
-class MouthSpriteManager:
-    def __init__(self, sprites_dir=None):
-        if sprites_dir is None:
-            sprites_dir = os.path.join(os.path.dirname(__file__), '..', 'assets', 'mouth_sprites')
-        
+SPRITE_MAPPING = {
+    'A': 'southparkClosed(M_B_P)',
+    'B': 'southparkSmall(E_I)',
+    'C': 'southparkMedium(E_EH)',
+    'D': 'southparkWide(A_AH)',
+    'E': 'southparkRound(O_OO)',
+    'F': 'southparkTeeth(F_V)',
+    'G': 'southparkSpecial(L_TH_R)',
+    'H': 'southparkWide(A_AH)',  # Use wide for other vowels
+    'X': 'southparkClosed(M_B_P)'  # Use closed for silence
+}
+
+# One sprite store per sprites directory, shared by every manager in the process
+_sprite_stores = {}
+_sprite_stores_lock = threading.Lock()
+
+def get_sprite_store(sprites_dir):
+    """Get the process-wide sprite store for a directory, loading it on first use"""
+    key = os.path.realpath(sprites_dir)
+    with _sprite_stores_lock:
+        store = _sprite_stores.get(key)
+        if store is None:
+            store = SpriteStore(sprites_dir)
+            _sprite_stores[key] = store
+        return store
+
+class SpriteStore:
+    """Read-only RGBA arrays for every viseme, decoded once per process
+    
+    Arrays are marked read-only so they can be shared safely between threads,
+    and since they are never written, forked workers keep sharing their pages
+    """
+    
+    def __init__(self, sprites_dir, max_resized=256):
         self.sprites_dir = sprites_dir
-        self.sprite_cache = {}
-        self.sprite_mapping = {
-            'A': 'southparkClosed(M_B_P)',
-            'B': 'southparkSmall(E_I)',
-            'C': 'southparkMedium(E_EH)',
-            'D': 'southparkWide(A_AH)',
-            'E': 'southparkRound(O_OO)',
-            'F': 'southparkTeeth(F_V)',
-            'G': 'southparkSpecial(L_TH_R)',
-            'H': 'southparkWide(A_AH)',  # Use wide for other vowels
-            'X': 'southparkClosed(M_B_P)'  # Use closed for silence
-        }
+        self.sprites = {}
+        
+        # Resized copies keyed by (viseme, width, height, interpolation), least recently used first
+        self.max_resized = max_resized
+        self._resized = OrderedDict()
+        self._resized_lock = threading.Lock()
         
-        # Pre-load all sprites
         self._load_all_sprites()
     
+    def resized(self, viseme_code, width, height, interpolation):
+        """Get a sprite resized to width x height, resizing it only on the first request"""
+        key = (viseme_code, width, height, interpolation)
+        with self._resized_lock:
+            scaled = self._resized.get(key)
+            if scaled is not None:
+                self._resized.move_to_end(key)
+                return scaled
+        
+        scaled = cv2.resize(self.sprites[viseme_code]['array'], (width, height), interpolation=interpolation)
+        scaled.flags.writeable = False
+        
+        with self._resized_lock:
+            self._resized[key] = scaled
+            self._resized.move_to_end(key)
+            while len(self._resized) > self.max_resized:
+                self._resized.popitem(last=False)
+        return scaled
+    
     def _load_all_sprites(self):
-        """Pre-load all mouth sprites into cache"""
+        """Pre-load all mouth sprites, decoding each file once even if several visemes use it"""
         print(f"Loading mouth sprites from: {self.sprites_dir}")
         
         if not os.path.exists(self.sprites_dir):
             raise Exception(f"Sprites directory not found: {self.sprites_dir}")
         
-        for viseme_code, sprite_name in self.sprite_mapping.items():
+        loaded = {}  # sprite name -> entry
+        for viseme_code, sprite_name in SPRITE_MAPPING.items():
             sprite_path = os.path.join(self.sprites_dir, f"{sprite_name}.png")
             
-            if os.path.exists(sprite_path):
+            if sprite_name in loaded:
+                self.sprites[viseme_code] = loaded[sprite_name]
+            elif os.path.exists(sprite_path):
                 try:
-                    # Load with PIL (maintains alpha channel)
-                    pil_image = Image.open(sprite_path).convert('RGBA')
-                    
-                    # Convert to numpy array for OpenCV compatibility
-                    sprite_array = np.array(pil_image)
+                    # Load with PIL (maintains alpha channel) and keep only the array
+                    with Image.open(sprite_path) as image:
+                        sprite_array = np.array(image.convert('RGBA'))
                     
-                    # Store both PIL and array versions
-                    self.sprite_cache[viseme_code] = {
-                        'pil': pil_image,
-                        'array': sprite_array,
-                        'path': sprite_path,
-                        'name': sprite_name
-                    }
+                    loaded[sprite_name] = self._entry(sprite_array, sprite_path, sprite_name)
+                    self.sprites[viseme_code] = loaded[sprite_name]
                     
                     print(f"Loaded sprite {viseme_code}: {sprite_name}")
                     
                 except Exception as e:
                     print(f"Error loading sprite {sprite_path}: {e}")
                     # Create a fallback sprite
-                    self.sprite_cache[viseme_code] = self._create_fallback_sprite(viseme_code)
+                    self.sprites[viseme_code] = self._create_fallback_sprite(viseme_code)
             else:
                 print(f"Sprite file not found: {sprite_path}")
                 # Create a fallback sprite
-                self.sprite_cache[viseme_code] = self._create_fallback_sprite(viseme_code)
+                self.sprites[viseme_code] = self._create_fallback_sprite(viseme_code)
         
-        print(f"Loaded {len(self.sprite_cache)} mouth sprites")
+        print(f"Loaded {len(self.sprites)} mouth sprites")
+    
+    def _entry(self, sprite_array, path, name):
+        sprite_array.flags.writeable = False
+        return {
+            'array': sprite_array,
+            'path': path,
+            'name': name
+        }
     
     def _create_fallback_sprite(self, viseme_code):
         """Create a simple fallback sprite if file loading fails"""
@@ -94,46 +141,58 @@ class MouthSpriteManager:
         draw = ImageDraw.Draw(fallback)
         draw.rectangle([10, 15, 50, 25], fill=color)
         
-        return {
-            'pil': fallback,
-            'array': np.array(fallback),
-            'path': f'fallback_{viseme_code}',
-            'name': f'fallback_{viseme_code}'
-        }
+        return self._entry(np.array(fallback), f'fallback_{viseme_code}', f'fallback_{viseme_code}')
+
+class MouthSpriteManager:
+    def __init__(self, sprites_dir=None):
+        if sprites_dir is None:
+            sprites_dir = os.path.join(os.path.dirname(__file__), '..', 'assets', 'mouth_sprites')
+        
+        self.sprites_dir = sprites_dir
+        self.sprite_mapping = SPRITE_MAPPING
+        
+        # Sprites are loaded once per process and shared by every manager
+        self.sprite_store = get_sprite_store(sprites_dir)
+        self.sprite_cache = self.sprite_store.sprites
     
     def get_sprite_for_viseme(self, viseme_code):
         """Get sprite data for a given viseme code"""
         return self.sprite_cache.get(viseme_code, self.sprite_cache.get('X'))
     
     def get_sprite_array(self, viseme_code):
-        """Get numpy array version of sprite"""
+        """Get numpy array version of sprite (read-only, copy it before modifying)"""
         sprite_data = self.get_sprite_for_viseme(viseme_code)
         return sprite_data['array']
     
     def get_sprite_pil(self, viseme_code):
         """Get PIL Image version of sprite"""
-        sprite_data = self.get_sprite_for_viseme(viseme_code)
-        return sprite_data['pil']
+        return Image.fromarray(self.get_sprite_array(viseme_code), 'RGBA')
     
-    def scale_sprite(self, viseme_code, scale_factor=1.0, target_size=None):
-        """Get scaled version of sprite"""
-        if scale_factor == 1.0 and target_size is None:
-            return self.get_sprite_array(viseme_code)
+    def scale_sprite(self, viseme_code, scale_factor=1.0, target_size=None, interpolation=cv2.INTER_NEAREST):
+        """Get scaled version of sprite (read-only, resized copies are cached)"""
+        if viseme_code not in self.sprite_cache:
+            viseme_code = 'X'  # Same fallback as get_sprite_for_viseme
         
         sprite_array = self.get_sprite_array(viseme_code)
+        original_height, original_width = sprite_array.shape[:2]
         
         if target_size is not None:
             # Scale to specific size
             width, height = target_size
-            scaled = cv2.resize(sprite_array, (width, height), interpolation=cv2.INTER_NEAREST)
         else:
             # Scale by factor
-            original_height, original_width = sprite_array.shape[:2]
-            new_width = int(original_width * scale_factor)
-            new_height = int(original_height * scale_factor)
-            scaled = cv2.resize(sprite_array, (new_width, new_height), interpolation=cv2.INTER_NEAREST)
+            width = int(original_width * scale_factor)
+            height = int(original_height * scale_factor)
         
-        return scaled
+        if (width, height) == (original_width, original_height):
+            return sprite_array
+        
+        return self.sprite_store.resized(viseme_code, width, height, interpolation)
+    
+    def prewarm_scaled_sprites(self, target_size, interpolation=cv2.INTER_NEAREST):
+        """Resize every viseme's sprite to target_size ahead of rendering"""
+        for viseme_code in self.sprite_cache:
+            self.scale_sprite(viseme_code, target_size=target_size, interpolation=interpolation)
     
     def get_available_visemes(self):
         """Get list of available viseme codes"""
@@ -2,15 +2,43 @@ import os
 import subprocess
 import json
 import tempfile
+import wave
+import numpy as np
 from pydub import AudioSegment
 
+class RhubarbError(Exception):
+    """Rhubarb is installed but failed on an audio file"""
+
 class PhonemeDetector:
+    # Bump whenever a change alters the cues produced for the same audio,
+    # so cached results from older versions are not reused
+    VERSION = 2
+    
     def __init__(self):
         # Path to Rhubarb executable (will need to be downloaded)
         self.rhubarb_path = os.path.join(os.path.dirname(__file__), '..', '..', 'models', 'rhubarb')
         
-    def extract_phonemes(self, audio_path):
-        """Extract phonemes from audio using Rhubarb Lip Sync"""
+        # Seed for the fallback generator's viseme variety and timing jitter,
+        # so the same audio always produces the same cues
+        self.random_seed = 0
+        
+    def cache_settings(self):
+        """Everything besides the audio itself that determines the cues extract_phonemes returns"""
+        settings = {'version': self.VERSION, 'random_seed': self.random_seed}
+        if os.path.exists(self.rhubarb_path):
+            # Identify the Rhubarb build so replacing the binary invalidates its cues
+            stat = os.stat(self.rhubarb_path)
+            settings['rhubarb'] = [stat.st_size, stat.st_mtime]
+        else:
+            settings['rhubarb'] = None
+        return settings
+    
+    def extract_phonemes(self, audio_path, fallback=True):
+        """Extract phonemes from audio using Rhubarb Lip Sync
+        
+        If Rhubarb fails, the cues come from generate_simple_phonemes instead,
+        or RhubarbError is raised when fallback is False
+        """
         
         # Convert to WAV if needed
         wav_path = self.ensure_wav_format(audio_path)
@@ -53,6 +81,8 @@ class PhonemeDetector:
                 return mouth_cues
                 
         except Exception as e:
+            if not fallback:
+                raise RhubarbError(str(e)) from e
             print(f"Rhubarb failed: {e}, using fallback")
             return self.generate_simple_phonemes(wav_path)
         finally:
@@ -61,6 +91,15 @@ class PhonemeDetector:
             if wav_path != audio_path and os.path.exists(wav_path):
                 os.unlink(wav_path)
     
+    def fallback_phonemes(self, audio_path):
+        """generate_simple_phonemes for audio in any format, without trying Rhubarb"""
+        wav_path = self.ensure_wav_format(audio_path)
+        try:
+            return self.generate_simple_phonemes(wav_path)
+        finally:
+            if wav_path != audio_path and os.path.exists(wav_path):
+                os.unlink(wav_path)
+    
     def ensure_wav_format(self, audio_path):
         """Convert audio to WAV format if needed"""
         if audio_path.lower().endswith('.wav'):
@@ -95,81 +134,135 @@ class PhonemeDetector:
             except Exception as e2:
                 raise Exception(f"Failed to convert audio file. Make sure ffmpeg is installed: {e2}")
     
+    def trim_audio(self, audio_path, seconds, output_path):
+        """Write the first seconds of audio_path to output_path as a WAV file"""
+        try:
+            with wave.open(audio_path, 'rb') as source:
+                params = source.getparams()
+                frames = source.readframes(int(seconds * source.getframerate()))
+            with wave.open(output_path, 'wb') as target:
+                target.setparams(params)
+                target.writeframes(frames)
+        except (wave.Error, EOFError):
+            # Not a PCM WAV file, let pydub (ffmpeg) decode it
+            audio = AudioSegment.from_file(audio_path)
+            audio[:int(seconds * 1000)].export(output_path, format='wav')
+        return output_path
+    
     def generate_simple_phonemes(self, audio_path):
         """Generate enhanced phoneme data with proper viseme codes for lip-sync"""
-        import random
-        
         audio = AudioSegment.from_wav(audio_path)
         duration = len(audio) / 1000.0  # Duration in seconds
-        
-        # Create enhanced phoneme pattern with Rhubarb viseme codes
-        phonemes = []
-        time = 0
         interval = 0.08  # 80ms intervals for more responsive animation
         
-        # Viseme codes that create variety in mouth shapes
-        viseme_options = {
-            'silence': ['X'],  # Silence - closed mouth
-            'soft': ['A', 'B'],  # Closed/small mouth sounds
-            'medium': ['C', 'E', 'G'],  # Medium opening sounds  
-            'loud': ['D', 'F', 'H']  # Wide opening sounds
-        }
+        # Viseme codes that create variety in mouth shapes, one row per
+        # loudness category: silence, soft, medium, loud
+        viseme_options = [
+            ['X'],  # Silence - closed mouth
+            ['A', 'B'],  # Closed/small mouth sounds
+            ['C', 'E', 'G'],  # Medium opening sounds
+            ['D', 'F', 'H']  # Wide opening sounds
+        ]
         
-        prev_viseme = 'X'  # Start with silence
+        # Window start times, accumulated the same way as stepping through the clip
+        times = np.concatenate(([0.0], np.cumsum(np.full(int(duration / interval) + 1, interval))))
+        times = times[times < duration]
         
-        while time < duration:
-            # Get audio level at this point
-            start_ms = int(time * 1000)
-            end_ms = min(int((time + interval) * 1000), len(audio))
-            
-            if end_ms > start_ms:
-                segment = audio[start_ms:end_ms]
-                loudness = segment.dBFS
-                
-                # Map loudness to viseme category with more variety
-                if loudness < -35:  # Quiet/silence
-                    category = 'silence'
-                elif loudness < -25:  # Soft speech
-                    category = 'soft'
-                elif loudness < -15:  # Medium speech
-                    category = 'medium'
-                else:  # Loud speech
-                    category = 'loud'
-                
-                # Choose a viseme from the category, avoiding repetition
-                available_visemes = viseme_options[category]
-                if len(available_visemes) > 1 and prev_viseme in available_visemes:
-                    # Try to pick a different viseme for variety
-                    candidates = [v for v in available_visemes if v != prev_viseme]
-                    if candidates:
-                        available_visemes = candidates
-                
-                viseme = random.choice(available_visemes)
-                prev_viseme = viseme
-                
-                # Add some random timing variation for more natural speech
-                varied_time = time + random.uniform(-0.02, 0.02)
-                varied_time = max(0, varied_time)  # Ensure time is not negative
-                
-                phonemes.append({
-                    'start': varied_time,
-                    'value': viseme,
-                    'duration': interval + random.uniform(-0.02, 0.02)
-                })
-            
-            time += interval
+        # Window boundaries in milliseconds
+        start_ms = (times * 1000).astype(np.int64)
+        end_ms = np.minimum(((times + interval) * 1000).astype(np.int64), len(audio))
+        valid = end_ms > start_ms
+        times, start_ms, end_ms = times[valid], start_ms[valid], end_ms[valid]
+        
+        if len(times) == 0:
+            print("Generated 0 viseme cues (audio too short)")
+            return []
+        
+        # Read the samples once and measure every window's RMS in vectorized batches
+        samples = np.frombuffer(audio.raw_data, dtype=audio.array_type)
+        start_frame = (start_ms * audio.frame_rate / 1000.0).astype(np.int64)
+        end_frame = (end_ms * audio.frame_rate / 1000.0).astype(np.int64)
+        rms = self._window_rms(samples, audio.channels, start_frame, end_frame)
+        
+        # Loudness in dBFS, same definition as AudioSegment.dBFS (-inf for digital silence)
+        with np.errstate(divide='ignore'):
+            loudness = 20 * np.log10(rms / audio.max_possible_amplitude)
+        
+        # Map loudness to viseme category with more variety
+        # Below -35 dBFS is quiet/silence, then soft (-25), medium (-15) and loud speech
+        category = np.digitize(loudness, [-35, -25, -15])
+        category_size = np.array([len(options) for options in viseme_options])[category]
+        
+        # Choose a viseme from each category, avoiding repetition: the first
+        # window of a run of equal categories picks any option, later windows
+        # step to one of the other options of the category
+        rng = np.random.default_rng(self.random_seed)
+        draws = rng.random(len(category))
+        run_start = np.ones(len(category), dtype=bool)
+        run_start[1:] = category[1:] != category[:-1]
+        steps = np.where(run_start,
+                         np.floor(draws * category_size),
+                         1 + np.floor(draws * (category_size - 1))).astype(np.int64)
+        
+        cumulative_steps = np.cumsum(steps)
+        run_index = np.cumsum(run_start) - 1
+        run_base = (cumulative_steps - steps)[run_start]
+        option_index = (cumulative_steps - run_base[run_index]) % category_size
+        
+        viseme_table = np.array([options + [''] * (3 - len(options)) for options in viseme_options])
+        visemes = viseme_table[category, option_index]
+        
+        # Add some random timing variation for more natural speech
+        varied_times = np.maximum(times + rng.uniform(-0.02, 0.02, len(times)), 0)  # Ensure time is not negative
+        durations = interval + rng.uniform(-0.02, 0.02, len(times))
         
         # Sort by start time to ensure proper order
-        phonemes.sort(key=lambda x: x['start'])
+        order = np.argsort(varied_times, kind='stable')
+        phonemes = [
+            {'start': start, 'value': viseme, 'duration': cue_duration}
+            for start, viseme, cue_duration in zip(varied_times[order].tolist(),
+                                                  visemes[order].tolist(),
+                                                  durations[order].tolist())
+        ]
         
         print(f"Generated {len(phonemes)} viseme cues with variety:")
-        viseme_counts = {}
-        for p in phonemes:
-            viseme_counts[p['value']] = viseme_counts.get(p['value'], 0) + 1
-        print(f"Viseme distribution: {viseme_counts}")
+        codes, counts = np.unique(visemes, return_counts=True)
+        print(f"Viseme distribution: {dict(zip(codes.tolist(), counts.tolist()))}")
         
         return phonemes
     
+    def _window_rms(self, samples, channels, start_frame, end_frame, batch_size=256):
+        """RMS over all channels of each [start_frame, end_frame) window of interleaved samples"""
+        rms = np.zeros(len(start_frame))
+        
+        # Work in interleaved sample positions: a window of audio frames
+        # covers every channel of those frames
+        start_sample = start_frame * channels
+        end_sample = end_frame * channels
+        
+        # Windows are processed in batches so the float copy of the samples
+        # never covers more than one batch's span of audio
+        for first in range(0, len(start_sample), batch_size):
+            batch = slice(first, first + batch_size)
+            span_start = start_sample[batch].min()
+            span_end = end_sample[batch].max()
+            
+            # Squared samples, plus a trailing zero so window ends can index past the span
+            span = np.zeros(span_end - span_start + 1, dtype=np.float32)
+            span[:-1] = samples[span_start:span_end]
+            np.square(span, out=span)
+            
+            # Interleaved [start, end) bounds: even reduceat results are the window sums
+            bounds = np.empty(2 * len(start_sample[batch]), dtype=np.int64)
+            bounds[0::2] = start_sample[batch] - span_start
+            bounds[1::2] = end_sample[batch] - span_start
+            window_power = np.add.reduceat(span, bounds)[0::2].astype(np.float64)
+            
+            window_samples = np.maximum(end_sample[batch] - start_sample[batch], 1)
+            rms[batch] = np.sqrt(window_power / window_samples)
+        
+        return rms
+    
     def get_rhubarb_viseme_mapping(self):
         """Get mapping from Rhubarb viseme codes to sprite names"""
         return {
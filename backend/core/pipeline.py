@@ -0,0 +1,70 @@
+"""
+Stage Graph for the Animation Pipeline
+Runs named stages as soon as the stages they depend on have finished, so
+independent work (audio analysis, character preparation) overlaps, and
+records how long each stage took
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Pipeline:
+    """Small dependency graph of stages executed on a thread pool"""
+
+    def __init__(self):
+        self.stages = {}  # name -> (fn, depends_on), in the order they were added
+        self.timings = {}  # name -> seconds, filled in by run()
+
+    def add_stage(self, name, fn, depends_on=()):
+        """Add a stage; fn is called with the results of depends_on, in that order"""
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise Exception(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = (fn, tuple(depends_on))
+        return self
+
+    def run(self, max_workers=None):
+        """Run every stage and return a dict of their results
+
+        If a stage raises, no new stages are started and the first error is
+        re-raised once the stages already running have finished.
+        """
+        results = {}
+        remaining = dict(self.stages)
+        running = {}
+        self.timings = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.stages) or 1,
+                                thread_name_prefix='pipeline') as pool:
+            while remaining or running:
+                # Start every stage whose dependencies are all done
+                for name, (fn, depends_on) in list(remaining.items()):
+                    if all(dependency in results for dependency in depends_on):
+                        args = [results[dependency] for dependency in depends_on]
+                        running[pool.submit(self._timed, name, fn, args)] = name
+                        del remaining[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        # Let the stages already started finish, then fail
+                        wait(running)
+                        raise
+
+        return results
+
+    def _timed(self, name, fn, args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def format_timings(self):
+        """One line per stage with its wall time, in the order stages were added"""
+        return '\n'.join(f"  {name:<10} {self.timings[name]:7.2f}s"
+                         for name in self.stages if name in self.timings)
@@ -0,0 +1,87 @@
+"""
+Dirty-Rectangle Compositor for South Park Standard Lip-Sync Animation
+Keeps one canvas with the character already placed on it and only rewrites
+the mouth sprite's rectangle when the viseme changes
+"""
+
+import numpy as np
+
+
+class SpriteCompositor:
+    """Persistent-canvas renderer producing the same frames as VideoRenderer.render_sprite_frame"""
+
+    def __init__(self, image_processor, character_data):
+        self.image_processor = image_processor
+        self.mouth_sprite_manager = image_processor.mouth_sprite_manager
+
+        base_image = character_data['base_image']
+        padding = character_data['padding']
+        self.char_x = padding['left']
+        self.char_y = padding['top']
+        self.char_height, self.char_width = base_image.shape[:2]
+        self.mouth_anchor = character_data['mouth_anchor']
+        self.sprite_size = character_data['sprite_size']
+
+        # White background with the character region replaced by the raw base
+        # image, exactly what render_sprite_frame produces before the mouth
+        self.canvas = np.full((character_data['video_height'], character_data['video_width'], 4),
+                              255, dtype=np.uint8)
+        self.canvas[self.char_y:self.char_y + self.char_height,
+                    self.char_x:self.char_x + self.char_width] = base_image
+        self.clean_canvas = self.canvas.copy()
+
+        self.patches = {}  # viseme code -> (canvas rect, composited mouth patch)
+        self.current_viseme = None
+
+    def frame(self, viseme_code):
+        """Get the frame for a viseme
+
+        The returned array is the compositor's canvas: it is only valid until
+        the next call, so write it out (or copy it) before asking for another frame.
+        """
+        if viseme_code == self.current_viseme:
+            return self.canvas
+
+        # Restore the previous mouth rectangle, then draw the new one
+        if self.current_viseme is not None:
+            old_rect, _ = self.patches[self.current_viseme]
+            if old_rect is not None:
+                self.canvas[old_rect] = self.clean_canvas[old_rect]
+
+        rect, patch = self._patch_for(viseme_code)
+        if rect is not None:
+            self.canvas[rect] = patch
+
+        self.current_viseme = viseme_code
+        return self.canvas
+
+    def _patch_for(self, viseme_code):
+        """Composite a viseme's mouth onto its rectangle of the clean canvas, once per viseme"""
+        cached = self.patches.get(viseme_code)
+        if cached is not None:
+            return cached
+
+        sprite_array = self.mouth_sprite_manager.scale_sprite(viseme_code, target_size=self.sprite_size)
+
+        # Same placement as composite_sprite_frame: centered on the anchor and
+        # clipped to the character image
+        sprite_height, sprite_width = sprite_array.shape[:2]
+        sprite_x = self.mouth_anchor[0] - sprite_width // 2
+        sprite_y = self.mouth_anchor[1] - sprite_height // 2
+
+        left = max(0, sprite_x)
+        top = max(0, sprite_y)
+        right = min(self.char_width, sprite_x + sprite_width)
+        bottom = min(self.char_height, sprite_y + sprite_height)
+
+        if left >= right or top >= bottom:
+            self.patches[viseme_code] = (None, None)  # Mouth is entirely off the character
+            return self.patches[viseme_code]
+
+        rect = (slice(self.char_y + top, self.char_y + bottom),
+                slice(self.char_x + left, self.char_x + right))
+        patch = self.clean_canvas[rect].copy()
+        self.image_processor.paste_with_alpha(patch, sprite_array, sprite_x - left, sprite_y - top)
+
+        self.patches[viseme_code] = (rect, patch)
+        return self.patches[viseme_code]
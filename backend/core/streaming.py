@@ -0,0 +1,437 @@
+"""
+Live Streaming Animation
+Animates a character from audio that is still arriving (raw PCM from a pipe,
+socket or HTTP upload, or a WAV file that is still being written) and emits
+composited frames with a bounded delay between audio in and frame out.
+Only the amplitude-driven styles can stream: the standard style needs
+Rhubarb's whole-file phoneme analysis
+"""
+
+import os
+import select
+import struct
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from .timeline import KeyframeTimeline
+from .metrics import metrics, log_event
+
+STREAMING_STYLES = ('nutcracker', 'canadian')
+
+# Lowest audio sample rate that still gives StreamingEnvelope a whole sample per 0.02s hop
+MIN_SAMPLE_RATE = 50
+
+# Boundary of the multipart/x-mixed-replace MJPEG stream
+MJPEG_BOUNDARY = 'frame'
+
+
+def decode_pcm(data, sample_width, channels):
+    """Little-endian PCM bytes -> mono float32 samples in the -1 to 1 range"""
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise Exception(f"Unsupported sample width: {sample_width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+class PCMSource:
+    """Raw little-endian PCM read from a binary stream (stdin, a socket file, a pipe)
+
+    Each chunk is whatever audio has arrived, up to max_chunk_seconds, so
+    audio that piled up while frames were drawn comes back in one chunk
+    (streams without read1 are read chunk_seconds at a time).
+    """
+
+    def __init__(self, stream, sample_rate=16000, channels=1, sample_width=2, chunk_seconds=0.02,
+                 max_chunk_seconds=0.5):
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.chunk_seconds = chunk_seconds
+        self.max_chunk_seconds = max_chunk_seconds
+
+    def __iter__(self):
+        """Yield mono float32 chunks as they arrive, until the stream ends"""
+        frame_bytes = self.channels * self.sample_width
+        if hasattr(self.stream, 'read1'):
+            # read1 returns whatever has arrived instead of waiting for a full chunk
+            read = self.stream.read1
+            chunk_bytes = max(1, int(self.sample_rate * self.max_chunk_seconds)) * frame_bytes
+        else:
+            read = self.stream.read
+            chunk_bytes = max(1, int(self.sample_rate * self.chunk_seconds)) * frame_bytes
+        pending = b''
+        while True:
+            data = read(chunk_bytes)
+            if not data:
+                break
+            pending += data
+
+            # Only decode whole audio frames; keep a split frame for the next read
+            usable = len(pending) - len(pending) % frame_bytes
+            if usable:
+                yield decode_pcm(pending[:usable], self.sample_width, self.channels)
+                pending = pending[usable:]
+
+
+class GrowingWavSource:
+    """PCM tailed from a WAV file that another process is still writing
+
+    The header's data size is ignored (recorders usually patch it in at the
+    end); the stream ends once the file has stopped growing for idle_timeout
+    seconds. Each chunk is whatever has been appended, up to
+    max_chunk_seconds.
+    """
+
+    def __init__(self, path, max_chunk_seconds=0.5, poll_interval=0.01, idle_timeout=2.0):
+        self.path = path
+        self.max_chunk_seconds = max_chunk_seconds
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.sample_rate = None
+        self.channels = None
+        self.sample_width = None
+
+    def __iter__(self):
+        """Yield mono float32 chunks as they are appended to the file"""
+        with self._open() as wav_file:
+            data_offset = self._read_header(wav_file)
+            wav_file.seek(data_offset)
+
+            frame_bytes = self.channels * self.sample_width
+            chunk_bytes = max(1, int(self.sample_rate * self.max_chunk_seconds)) * frame_bytes
+            pending = b''
+            idle_since = time.monotonic()
+            while True:
+                data = wav_file.read(chunk_bytes)
+                if not data:
+                    if time.monotonic() - idle_since > self.idle_timeout:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                idle_since = time.monotonic()
+                pending += data
+
+                usable = len(pending) - len(pending) % frame_bytes
+                if usable:
+                    yield decode_pcm(pending[:usable], self.sample_width, self.channels)
+                    pending = pending[usable:]
+
+    def _open(self):
+        """Open the file, waiting up to idle_timeout for the writer to create it"""
+        deadline = time.monotonic() + self.idle_timeout
+        while True:
+            try:
+                return open(self.path, 'rb')
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(self.poll_interval)
+
+    def _read_header(self, wav_file):
+        """Read the fmt chunk and return the offset of the sample data"""
+        def read_exactly(size):
+            # The writer may not have flushed the whole header yet
+            data = b''
+            idle_since = time.monotonic()
+            while len(data) < size:
+                more = wav_file.read(size - len(data))
+                if more:
+                    data += more
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > self.idle_timeout:
+                    raise Exception(f"Incomplete WAV header in {self.path}")
+                else:
+                    time.sleep(self.poll_interval)
+            return data
+
+        riff, _, wave_id = struct.unpack('<4sI4s', read_exactly(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise Exception(f"{self.path} is not a WAV file")
+
+        while True:
+            chunk_id, chunk_size = struct.unpack('<4sI', read_exactly(8))
+            if chunk_id == b'data':
+                if self.sample_rate is None:
+                    raise Exception(f"WAV file {self.path} has no fmt chunk before its data")
+                return wav_file.tell()
+            body = read_exactly(chunk_size + chunk_size % 2)  # Chunks are word aligned
+            if chunk_id == b'fmt ':
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if audio_format not in (1, 0xFFFE):  # PCM or WAVE_FORMAT_EXTENSIBLE
+                    raise Exception(f"Unsupported WAV format {audio_format} in {self.path}")
+                self.channels = channels
+                self.sample_rate = sample_rate
+                self.sample_width = bits // 8
+
+
+class StreamingEnvelope:
+    """RMS amplitude envelope computed chunk by chunk
+
+    Uses the same window and hop as the offline analysis. A whole file is
+    normalized by its loudest window, which a live stream doesn't know yet,
+    so amplitudes here are relative to a running peak that decays slowly
+    (peak_decay per second) and never drops below noise_floor.
+    """
+
+    def __init__(self, sample_rate, window=0.05, hop=0.02, peak_decay=0.5, noise_floor=0.01):
+        self.sample_rate = sample_rate
+        self.window_size = int(sample_rate * window)
+        self.hop_size = int(sample_rate * hop)
+        if self.window_size == 0 or self.hop_size == 0:
+            raise Exception(f"Sample rate {sample_rate} is too low for a {window}s window")
+        self.window_duration = self.window_size / float(sample_rate)
+        self.hop_decay = peak_decay ** (self.hop_size / float(sample_rate))
+        self.noise_floor = noise_floor
+        self.peak = 0.0
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0  # Sample index of _buffer[0]
+        self._next_window = 0   # Sample index where the next window starts
+
+    def feed(self, samples):
+        """Segments ({'start', 'duration', 'amplitude', 'energy'}) for every window completed by samples"""
+        self._buffer = np.concatenate((self._buffer, samples))
+        buffer_end = self._buffer_start + len(self._buffer)
+
+        segments = []
+        while self._next_window + self.window_size <= buffer_end:
+            offset = self._next_window - self._buffer_start
+            window = self._buffer[offset:offset + self.window_size].astype(np.float64)
+            rms = float(np.sqrt(np.dot(window, window) / self.window_size))
+
+            self.peak = max(rms, self.peak * self.hop_decay)
+            amplitude = rms / max(self.peak, self.noise_floor)
+            segments.append({
+                'start': self._next_window / float(self.sample_rate),
+                'duration': self.window_duration,
+                'amplitude': amplitude,
+                'energy': amplitude  # Keep energy field for compatibility
+            })
+            self._next_window += self.hop_size
+
+        # Drop samples no future window will read
+        consumed = self._next_window - self._buffer_start
+        if consumed > 0:
+            self._buffer = self._buffer[consumed:]
+            self._buffer_start = self._next_window
+        return segments
+
+
+class StreamingAnimator:
+    """Composites frames for a live audio source as soon as their keyframes are settled
+
+    A frame at time t is drawn once audio up to t + latency has arrived, so
+    the keyframes around it (including closing and overshoot keyframes set
+    slightly ahead of their segment) are known. Frames are due on a real-time
+    schedule that follows the audio as it arrives (audio arriving late
+    pushes the schedule later); any frame more than max_lag seconds past due is dropped
+    rather than drawn late, so a backlog of audio waiting to be animated
+    never builds up.
+    """
+
+    def __init__(self, animator, image_path, style='nutcracker', mouth_anchor=None, fps=24, latency=0.1,
+                 max_lag=0.5):
+        if style not in STREAMING_STYLES:
+            raise Exception(f"Style '{style}' can't be streamed; use one of {', '.join(STREAMING_STYLES)}")
+
+        self.animator = animator
+        self.style = style
+        self.fps = fps
+
+        # Frames are only final once a whole analysis window past them has arrived
+        self.latency = max(latency, animator.AMPLITUDE_SETTINGS['window'])
+        self.max_lag = max_lag
+
+        self.character_data = animator.prepare_character(image_path, style, mouth_anchor)
+        animator.video_renderer.configure_canvas(self.character_data, style)
+        self.stats = {'frames': 0, 'frames_composited': 0, 'frames_dropped': 0, 'audio_seconds': 0.0,
+                      'max_delay': 0.0}
+
+    def frames(self, source):
+        """Yield (frame_time, RGBA frame) for the audio chunks of source as they arrive"""
+        envelope = None
+        keyframer = self.animator.keyframer(self.style)
+        keyframes = []
+        next_frame = 0
+        received_samples = 0
+        audio_clock = None  # Wall-clock time at which audio time 0 was due
+        self._last_state = self._last_frame = None
+        started = time.perf_counter()
+
+        for chunk in source:
+            if envelope is None:
+                envelope = StreamingEnvelope(source.sample_rate, **self.animator.AMPLITUDE_SETTINGS)
+            received_samples += len(chunk)
+            received = received_samples / float(source.sample_rate)
+            # Audio that arrives later than the schedule (a slow or stalled
+            # source) moves the schedule; audio read from a backlog doesn't
+            arrival_clock = time.monotonic() - received
+            if audio_clock is None or arrival_clock > audio_clock:
+                audio_clock = arrival_clock
+            keyframes.extend(keyframer.feed(envelope.feed(chunk)))
+
+            last_due = int((received - self.latency) * self.fps)
+            if last_due < next_frame:
+                continue
+
+            keyframes = self._prune(keyframes, next_frame / self.fps)
+            timeline = KeyframeTimeline(keyframes, self.style, self.fps)
+            for frame_num in range(next_frame, last_due + 1):
+                frame = self._frame(timeline, frame_num, audio_clock)
+                if frame is not None:
+                    yield frame_num / self.fps, frame
+            next_frame = last_due + 1
+
+        # The stream has ended: the remaining audio needs no further lookahead
+        if envelope is not None:
+            received = received_samples / float(source.sample_rate)
+            timeline = KeyframeTimeline(self._prune(keyframes, next_frame / self.fps), self.style, self.fps)
+            for frame_num in range(next_frame, int(received * self.fps)):
+                yield frame_num / self.fps, self._frame(timeline, frame_num, audio_clock, may_drop=False)
+            self.stats['audio_seconds'] = round(received, 3)
+        self._record(time.perf_counter() - started)
+
+    def _frame(self, timeline, frame_num, audio_clock, may_drop=True):
+        """Composite frame_num, reusing the previous frame for an unchanged state (None if dropped)"""
+        frame_time = frame_num / self.fps
+        if may_drop and time.monotonic() - (audio_clock + frame_time + self.latency) > self.max_lag:
+            self.stats['frames_dropped'] += 1
+            return None
+
+        state = timeline.state_at(frame_num)
+        if state != self._last_state:
+            self._last_state, self._last_frame = state, self._composite(state)
+            self.stats['frames_composited'] += 1
+
+        self.stats['frames'] += 1
+        if may_drop:  # The last frames wait for the source to end, which isn't a delay
+            delay = time.monotonic() - (audio_clock + frame_time)
+            self.stats['max_delay'] = max(self.stats['max_delay'], round(delay, 3))
+        return self._last_frame
+
+    def _prune(self, keyframes, time):
+        """Forget keyframes that can no longer affect frames at or after time"""
+        # The timeline needs the last keyframe before time; keyframes may be
+        # slightly out of order (overshoots), so keep a short margin
+        keep_from = 0
+        while keep_from + 2 < len(keyframes) and keyframes[keep_from + 2]['time'] < time - 0.5:
+            keep_from += 1
+        return keyframes[keep_from:]
+
+    def _composite(self, state):
+        if self.style == 'nutcracker':
+            return self.animator.image_processor.composite_frame_with_jaw_slide(self.character_data, state)
+        return self.animator.image_processor.composite_frame_with_movement(self.character_data, state)
+
+    def _record(self, seconds):
+        metrics.increment('animator_stream_frames_total', self.stats['frames'], style=self.style)
+        metrics.increment('animator_stream_frames_dropped_total', self.stats['frames_dropped'], style=self.style)
+        metrics.observe('animator_stream_frame_delay_seconds', max(self.stats['max_delay'], 0.0), style=self.style)
+        log_event('stream', style=self.style, seconds=round(seconds, 3), latency=self.latency, **self.stats)
+
+
+def encode_jpeg(frame, quality=80):
+    """JPEG bytes for an RGBA frame"""
+    ok, data = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise Exception("JPEG encoding failed")
+    return data.tobytes()
+
+
+def jpeg_frames(frames, quality=80):
+    """JPEG bytes for each (frame_time, frame), encoding a repeated frame only once"""
+    last_frame = last_jpeg = None
+    for _, frame in frames:
+        if frame is not last_frame:
+            last_frame, last_jpeg = frame, encode_jpeg(frame, quality)
+        yield last_jpeg
+
+
+def mjpeg_parts(jpegs):
+    """multipart/x-mixed-replace parts for a stream of JPEG images"""
+    for jpeg in jpegs:
+        yield (f'--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n'
+               .encode() + jpeg + b'\r\n')
+
+
+class LiveSession:
+    """A live animation fed over HTTP: audio is written into a pipe that the frame generator reads"""
+
+    def __init__(self, streaming_animator, session_id=None, sample_rate=16000, channels=1, sample_width=2,
+                 viewer_timeout=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.streaming_animator = streaming_animator
+        self.created_at = time.time()
+        # Seconds from creation a feed waits on a full pipe for a viewer (None waits forever)
+        self.viewer_timeout = viewer_timeout
+
+        read_fd, write_fd = os.pipe()
+        self._reader = os.fdopen(read_fd, 'rb')
+        self._writer = os.fdopen(write_fd, 'wb', buffering=0)
+        self.source = PCMSource(self._reader, sample_rate, channels, sample_width)
+
+        self._lock = threading.Lock()
+        self.feeding = False
+        self.viewing = False
+
+    def feed(self, stream, chunk_size=4096):
+        """Copy audio from stream into the session until the stream ends, then close the audio input
+        
+        chunk_size should be at most the pipe's atomic write size (4096 on
+        Linux), so a pipe with room for a chunk can take it without blocking
+        """
+        with self._lock:
+            if self.feeding:
+                raise Exception("This live session already has an audio input")
+            self.feeding = True
+
+        try:
+            while True:
+                data = stream.read(chunk_size)
+                if not data:
+                    break
+                if not self.viewing and self.viewer_timeout is not None:
+                    # Nothing drains the pipe until a viewer attaches, so don't wait for one forever
+                    remaining = self.created_at + self.viewer_timeout - time.time()
+                    _, writable, _ = select.select([], [self._writer], [], max(remaining, 0))
+                    if not writable:
+                        self.close()
+                        raise Exception("No viewer opened this live session's video in time")
+                self._writer.write(data)
+        except BrokenPipeError:
+            pass  # The viewer went away
+        finally:
+            self._writer.close()
+
+    def frames(self):
+        """Composited frames for the session's audio (one viewer per session)"""
+        with self._lock:
+            if self.viewing:
+                raise Exception("This live session already has a viewer")
+            self.viewing = True
+
+        try:
+            yield from self.streaming_animator.frames(self.source)
+        finally:
+            self._reader.close()
+
+    def close(self):
+        """Release the pipe (a blocked feed sees a broken pipe, a blocked viewer sees the end of the audio)"""
+        for end in (self._writer, self._reader):
+            try:
+                end.close()
+            except OSError:
+                pass
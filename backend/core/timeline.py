@@ -0,0 +1,120 @@
+"""
+Keyframe Timeline for South Park Animation Rendering
+Compiles the output of the generate_*_keyframes functions once so the
+renderer can look up the state of any frame without scanning the keyframe list
+"""
+
+from bisect import bisect_right
+from itertools import accumulate
+
+
+class KeyframeTimeline:
+    """Indexed keyframes shared by the standard, canadian and nutcracker styles"""
+
+    def __init__(self, keyframes, style='canadian', fps=24):
+        self.keyframes = keyframes
+        self.style = style
+        self.fps = fps
+        self.frame_states = None
+
+        if style == 'standard':
+            self._build_viseme_frames()
+        else:
+            # Running maximum of keyframe times: bisecting it finds the first
+            # keyframe later than a given time, even if the list is not sorted
+            self._time_index = list(accumulate((kf['time'] for kf in keyframes), max))
+
+    def _build_viseme_frames(self):
+        """Expand sprite keyframes into one viseme code per frame"""
+        end_frame = max((kf['frame'] + kf['duration_frames'] for kf in self.keyframes), default=0)
+        self._viseme_frames = ['X'] * max(0, end_frame)  # Default to silence
+
+        # Paint in reverse so that, like a front-to-back scan, the first
+        # keyframe covering a frame wins
+        for kf in reversed(self.keyframes):
+            start = max(0, kf['frame'])
+            end = kf['frame'] + kf['duration_frames']
+            if end > start:
+                self._viseme_frames[start:end] = [kf['viseme']] * (end - start)
+
+    def compile(self, total_frames):
+        """Precompute the state of every frame for O(1) lookups during rendering"""
+        self.frame_states = [self._state_at_frame(frame_num) for frame_num in range(total_frames)]
+        return self
+
+    def runs(self, total_frames):
+        """Group consecutive frames with the same state into (start_frame, length, state) runs"""
+        runs = []
+        for frame_num in range(total_frames):
+            state = self.state_at(frame_num)
+            if runs and runs[-1][2] == state:
+                start, length, _ = runs[-1]
+                runs[-1] = (start, length + 1, state)
+            else:
+                runs.append((frame_num, 1, state))
+        return runs
+
+    def state_at(self, frame_num):
+        """Get the animation state at a frame: viseme code, movement dict or jaw offset"""
+        if self.frame_states is not None and 0 <= frame_num < len(self.frame_states):
+            return self.frame_states[frame_num]
+        return self._state_at_frame(frame_num)
+
+    def _state_at_frame(self, frame_num):
+        if self.style == 'standard':
+            return self.viseme_at(frame_num)
+
+        current_time = frame_num / self.fps
+        if self.style == 'nutcracker':
+            return self.jaw_offset_at(current_time)
+        return self.movement_at(current_time)
+
+    def viseme_at(self, frame_num):
+        """Get the viseme code active at a frame (sprite-based animation)"""
+        if 0 <= frame_num < len(self._viseme_frames):
+            return self._viseme_frames[frame_num]
+        return 'X'
+
+    def _surrounding(self, time):
+        """Get the keyframes before and after a time, as a front-to-back scan would find them"""
+        index = bisect_right(self._time_index, time)
+        prev_kf = self.keyframes[index - 1] if index > 0 else None
+        next_kf = self.keyframes[index] if index < len(self.keyframes) else None
+        return prev_kf, next_kf
+
+    def movement_at(self, time):
+        """Get discrete movement at given time (no smooth interpolation for South Park style)"""
+        prev_kf, _ = self._surrounding(time)
+        if prev_kf is None:
+            return {'top_y': 0, 'top_x': 0, 'bottom_y': 0}
+        return prev_kf['movement']
+
+    def jaw_offset_at(self, time):
+        """Interpolate jaw vertical offset for nutcracker animation with smooth transitions"""
+        prev_kf, next_kf = self._surrounding(time)
+
+        # If we only have previous keyframe, use its offset
+        if prev_kf and not next_kf:
+            return prev_kf['jaw_offset_y']
+
+        # If we only have next keyframe (or no keyframes at all), return closed
+        if not prev_kf:
+            return 0
+
+        # Time is between two keyframes, interpolate smoothly
+        time_range = next_kf['time'] - prev_kf['time']
+        if time_range <= 0:
+            return prev_kf['jaw_offset_y']
+
+        t = (time - prev_kf['time']) / time_range
+
+        # Use easing function for smooth transitions
+        # Ease-in-out cubic
+        if t < 0.5:
+            t = 2 * t * t
+        else:
+            t = 1 - 2 * (1 - t) * (1 - t)
+
+        # Interpolate offset
+        offset_diff = next_kf['jaw_offset_y'] - prev_kf['jaw_offset_y']
+        return prev_kf['jaw_offset_y'] + offset_diff * t
@@ -3,14 +3,37 @@ import numpy as np
 import os
 import subprocess
 import tempfile
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .image_processor import ImageProcessor
+from .timeline import KeyframeTimeline
+from .sprite_compositor import SpriteCompositor
+from .video_writer import FFmpegPipeWriter, FFmpegHLSWriter, OpenCVWriter, ffmpeg_available
+from .metrics import metrics, log_event, trace, trace_enabled
 
 class VideoRenderer:
-    def __init__(self):
+    def __init__(self, workers=None):
         self.image_processor = ImageProcessor()
         
-    def render(self, character_data, keyframes, audio_path, fps=24, style='canadian'):
-        """Render the final video with audio"""
+        # Worker threads used to composite canadian/nutcracker frames in parallel
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        
+    def render(self, character_data, keyframes, audio_path, fps=24, style='canadian', workers=None,
+               progress_callback=None, output_path=None, canvas_scale=1.0, preset='fast', crf=23, hls_dir=None):
+        """Render the final video with audio to output_path (a unique file in output/ by default)
+        
+        canvas_scale shrinks the padding around a downscaled character; preset
+        and crf are the x264 settings of the streaming encoder. With hls_dir,
+        an HLS playlist and segments are written there while frames render,
+        so playback can start before the MP4 is finished (needs ffmpeg)
+        """
+        
+        if workers is None:
+            workers = self.workers
+        if progress_callback is None:
+            progress_callback = lambda stage, done=None, total=None: None
         
         print(f"\n=== Starting video render ===")
         print(f"Animation style: {style}")
@@ -18,11 +41,104 @@ class VideoRenderer:
         print(f"Keyframes count: {len(keyframes)}")
         print(f"Audio path: {audio_path}")
         
-        # Create temporary video file
+        self.configure_canvas(character_data, style, canvas_scale)
+        video_width = character_data['video_width']
+        video_height = character_data['video_height']
+        
+        # Calculate total duration based on animation style
+        if style == 'standard':
+            # For sprite animation, duration is based on keyframe data
+            duration = max(kf.get('start_time', 0) + kf.get('duration', 0.2) for kf in keyframes) if keyframes else 1.0
+        elif style == 'nutcracker':
+            # For nutcracker animation, use time-based keyframes
+            duration = keyframes[-1]['time'] + 0.5 if keyframes else 1.0
+        else:
+            # For movement animation, use existing logic
+            duration = keyframes[-1]['time'] + 0.5 if keyframes else 1.0
+        
+        total_frames = int(duration * fps)
+        
+        print(f"Video specs: {video_width}x{video_height}, {fps}fps, {total_frames} frames, {duration:.2f}s")
+        
+        # Index the keyframes once so each frame's state is a direct lookup
+        timeline = KeyframeTimeline(keyframes, style, fps).compile(total_frames)
+        
+        if output_path is None:
+            output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'output')
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, f'talking_head_{uuid.uuid4().hex}.mp4')
+        
+        # Preferred path: a single ffmpeg process encodes the frames and muxes the audio in one pass
+        if ffmpeg_available():
+            if hls_dir is not None:
+                writer_name = 'ffmpeg_hls'
+                writer = FFmpegHLSWriter(output_path, video_width, video_height, fps, audio_path=audio_path,
+                                         preset=preset, crf=crf, hls_dir=hls_dir)
+            else:
+                writer_name = 'ffmpeg'
+                writer = FFmpegPipeWriter(output_path, video_width, video_height, fps, audio_path=audio_path,
+                                          preset=preset, crf=crf)
+            try:
+                stats = self._render_frames(writer, character_data, timeline, total_frames, workers,
+                                            progress_callback)
+                progress_callback('encode')
+                close_start = time.perf_counter()
+                writer.close()
+                stats['encode_seconds'] += time.perf_counter() - close_start
+            except Exception as e:
+                writer.abort()
+                metrics.increment('animator_encode_fallbacks_total', style=style)
+                print(f"Streaming encode failed: {e}, falling back to OpenCV writer")
+            else:
+                print(f"Video rendering complete: {output_path}")
+                self._check_output(output_path)
+                self._record_render(style, writer_name, stats, output_path)
+                return output_path
+        
+        # Fallback: write a temporary video with OpenCV, then mux the audio with a second ffmpeg pass
         temp_video = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
         print(f"Temp video file: {temp_video}")
         
-        # Configure canvas based on animation style
+        writer = OpenCVWriter(temp_video, video_width, video_height, fps)
+        stats = self._render_frames(writer, character_data, timeline, total_frames, workers, progress_callback)
+        progress_callback('encode')
+        encode_start = time.perf_counter()
+        writer.close()
+        print(f"Video rendering complete: {temp_video}")
+        print(f"Temp video size: {os.path.getsize(temp_video)} bytes")
+        
+        try:
+            self.add_audio_to_video(temp_video, audio_path, output_path)
+            self._check_output(output_path)
+        except Exception as e:
+            print(f"Audio encoding failed: {e}")
+            # If audio encoding fails, just copy the video without audio
+            import shutil
+            shutil.copy(temp_video, output_path)
+            print(f"Copied video without audio to: {output_path}")
+        
+        # Clean up
+        os.unlink(temp_video)
+        
+        stats['encode_seconds'] += time.perf_counter() - encode_start
+        self._record_render(style, 'opencv', stats, output_path)
+        return output_path
+    
+    def _record_render(self, style, writer_name, stats, output_path):
+        """Add a finished render's frame, timing and size figures to the metrics and log them"""
+        bytes_written = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        
+        metrics.increment('animator_frames_written_total', stats['frames_written'], style=style)
+        metrics.increment('animator_frames_composited_total', stats['frames_composited'], style=style)
+        metrics.increment('animator_bytes_written_total', bytes_written, style=style)
+        metrics.observe('animator_composite_seconds', stats['composite_seconds'], style=style)
+        metrics.observe('animator_encode_seconds', stats['encode_seconds'], style=style, writer=writer_name)
+        log_event('render', style=style, writer=writer_name, output=output_path, bytes=bytes_written,
+                  **{name: round(value, 3) if isinstance(value, float) else value for name, value in stats.items()})
+    
+    def configure_canvas(self, character_data, style, canvas_scale=1.0):
+        """Set the canvas size, padding and scale for style on character_data and prepare the rig"""
+        
         char_height = character_data['height']
         char_width = character_data['width']
         
@@ -54,6 +170,10 @@ class VideoRenderer:
             }
             SCALE_FACTOR = 0.7  # Scale down to make room for movement
         
+        if canvas_scale != 1.0:
+            # Keep the padding in proportion to a downscaled character
+            PADDING = {side: int(pixels * canvas_scale) for side, pixels in PADDING.items()}
+        
         # New video dimensions
         video_width = char_width + PADDING['left'] + PADDING['right']
         video_height = char_height + PADDING['top'] + PADDING['bottom']
@@ -68,199 +188,146 @@ class VideoRenderer:
         character_data['video_height'] = video_height
         character_data['style'] = style
         
-        # Set up video writer with H.264 codec for better browser compatibility
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264 codec
-        out = cv2.VideoWriter(temp_video, fourcc, fps, (video_width, video_height))
+        # Resize the character parts once instead of on every frame
+        self.image_processor.prepare_rig(character_data)
         
-        # Fallback to mp4v if avc1 doesn't work
-        if not out.isOpened():
-            print("avc1 codec failed, trying mp4v...")
-            out.release()
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(temp_video, fourcc, fps, (video_width, video_height))
-        
-        if not out.isOpened():
-            raise Exception("Failed to open video writer")
-        
-        # Calculate total duration based on animation style
-        if style == 'standard':
-            # For sprite animation, duration is based on keyframe data
-            duration = max(kf.get('start_time', 0) + kf.get('duration', 0.2) for kf in keyframes) if keyframes else 1.0
-        elif style == 'nutcracker':
-            # For nutcracker animation, use time-based keyframes
-            duration = keyframes[-1]['time'] + 0.5 if keyframes else 1.0
+        return character_data
+    
+    def _render_frames(self, writer, character_data, timeline, total_frames, workers=1, progress_callback=None):
+        """Composite each run of identical frames once and hand it to the writer in order
+        
+        Returns the frame counts and the seconds spent waiting for composited
+        frames and for the writer (which blocks while the encoder catches up)
+        """
+        
+        # Consecutive frames with the same state (held visemes, silences,
+        # discrete head positions) are pixel-identical, so each run is
+        # composited once and written with a repeat count
+        runs = timeline.runs(total_frames)
+        print(f"Rendering {total_frames} frames ({len(runs)} distinct runs)...")
+        if progress_callback:
+            progress_callback('frames', 0, total_frames)
+        if timeline.style == 'standard':
+            frames = self._iter_sprite_frames(character_data, timeline, runs, total_frames)
+        elif workers > 1:
+            print(f"Compositing frames on {workers} worker threads")
+            frames = self._iter_frames_parallel(character_data, timeline, runs, total_frames, workers)
         else:
-            # For movement animation, use existing logic
-            duration = keyframes[-1]['time'] + 0.5 if keyframes else 1.0
-        
-        total_frames = int(duration * fps)
-        
-        print(f"Video specs: {video_width}x{video_height}, {fps}fps, {total_frames} frames, {duration:.2f}s")
-        
-        # Render each frame
-        print(f"Rendering {total_frames} frames...")
-        for frame_num in range(total_frames):
-            current_time = frame_num / fps
-            
-            # Composite frame based on animation style
-            debug_frame = frame_num < 3  # Debug first 3 frames
-            
-            if style == 'standard':
-                # Sprite-based animation
-                viseme_code = self.get_current_viseme(keyframes, frame_num)
-                if frame_num % 50 == 0:
-                    print(f"Frame {frame_num}/{total_frames}: time={current_time:.2f}s, viseme={viseme_code}")
-                frame = self.render_sprite_frame(character_data, viseme_code, debug=debug_frame)
-            elif style == 'nutcracker':
-                # Nutcracker jaw animation
-                jaw_offset = self.interpolate_jaw_offset(keyframes, current_time)
-                if frame_num % 50 == 0:
-                    print(f"Frame {frame_num}/{total_frames}: time={current_time:.2f}s, jaw_offset={jaw_offset:.1f}px")
-                frame = self.image_processor.composite_frame_with_jaw_slide(character_data, jaw_offset, debug=debug_frame)
-            else:
-                # Movement-based animation (Canadian style)
-                movement = self.interpolate_movement(keyframes, current_time)
-                if frame_num % 50 == 0:
-                    print(f"Frame {frame_num}/{total_frames}: time={current_time:.2f}s, movement={movement}")
-                frame = self.image_processor.composite_frame_with_movement(character_data, movement, debug=debug_frame)
+            frames = (self._composite_frame(character_data, timeline, start, total_frames)
+                      for start, length, state in runs)
+        
+        stats = {'frames_written': 0, 'frames_composited': 0, 'composite_seconds': 0.0, 'encode_seconds': 0.0}
+        frames_done = 0
+        frames = iter(frames)
+        for start, length, state in runs:
+            composite_start = time.perf_counter()
+            frame = next(frames)
+            write_start = time.perf_counter()
             
             # Check frame content before conversion
-            if frame_num == 0:  # Log first frame details
-                print(f"First frame shape: {frame.shape}")
-                print(f"First frame dtype: {frame.dtype}")
-                print(f"First frame min/max: {frame.min()}/{frame.max()}")
-                unique_colors = len(np.unique(frame.reshape(-1, frame.shape[-1]), axis=0))
-                print(f"Unique colors in first frame: {unique_colors}")
-                
-                # Save first frame as debug image
-                debug_path = os.path.join(os.path.dirname(__file__), '..', '..', 'temp', 'debug_frame_0.png')
-                cv2.imwrite(debug_path, cv2.cvtColor(frame, cv2.COLOR_RGBA2BGRA))
-                print(f"Saved debug frame: {debug_path}")
+            if start == 0 and trace_enabled():  # Log first frame details
+                self._log_first_frame(frame)
+            
+            # Write the frame once for every frame of its run
+            writer.write(frame, repeat=length)
             
-            # Convert RGBA to BGR for OpenCV
-            frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+            stats['composite_seconds'] += write_start - composite_start
+            stats['encode_seconds'] += time.perf_counter() - write_start
+            stats['frames_composited'] += 1
+            stats['frames_written'] += length
             
-            # Write frame
-            out.write(frame_bgr)
+            # Report progress a few times per second of video rather than every run
+            previous, frames_done = frames_done, frames_done + length
+            if progress_callback and (frames_done // 12 > previous // 12 or frames_done == total_frames):
+                progress_callback('frames', frames_done, total_frames)
         
-        # Release video writer
-        out.release()
-        print(f"Video rendering complete: {temp_video}")
+        return stats
+    
+    def _iter_sprite_frames(self, character_data, timeline, runs, total_frames):
+        """Yield one sprite-based frame per run (standard South Park style)"""
         
-        # Check if temp video file was created and has content
-        if os.path.exists(temp_video):
-            temp_size = os.path.getsize(temp_video)
-            print(f"Temp video size: {temp_size} bytes")
-            if temp_size == 0:
-                raise Exception("Generated video file is empty")
-        else:
-            raise Exception("Failed to create temp video file")
+        # One persistent canvas: only the mouth rectangle is redrawn when the
+        # viseme changes. Each frame is written before the next is requested
+        compositor = SpriteCompositor(self.image_processor, character_data)
         
-        # Combine with audio using ffmpeg
-        output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'output')
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f'talking_head_{os.getpid()}.mp4')
+        for start, length, viseme_code in runs:
+            if start // 50 != (start + length - 1) // 50 or start % 50 == 0:
+                trace(f"Frame {start}/{total_frames}: time={start / timeline.fps:.2f}s, viseme={viseme_code} x{length}")
+            yield compositor.frame(viseme_code)
         
-        try:
-            self.add_audio_to_video(temp_video, audio_path, output_path)
-            
-            # Check final output
-            if os.path.exists(output_path):
-                final_size = os.path.getsize(output_path)
-                print(f"Final video size: {final_size} bytes")
-                if final_size == 0:
-                    print("WARNING: Final video file is empty!")
-            else:
-                print("WARNING: Final video file was not created!")
-                
-        except Exception as e:
-            print(f"Audio encoding failed: {e}")
-            # If audio encoding fails, just copy the video without audio
-            import shutil
-            shutil.copy(temp_video, output_path)
-            print(f"Copied video without audio to: {output_path}")
+        print(f"Redrew the mouth {len(runs)} times for {total_frames} frames "
+              f"({len(compositor.patches)} unique visemes)")
+    
+    def _iter_frames_parallel(self, character_data, timeline, runs, total_frames, workers):
+        """Yield one frame per run in order while a thread pool composites the runs ahead of them"""
         
-        # Clean up
-        os.unlink(temp_video)
+        # Bound the number of frames in flight so memory stays flat on long clips
+        max_pending = workers * 2
         
-        return output_path
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            next_run = 0
+            
+            while next_run < len(runs) or pending:
+                while next_run < len(runs) and len(pending) < max_pending:
+                    pending.append(pool.submit(self._composite_frame, character_data, timeline,
+                                               runs[next_run][0], total_frames))
+                    next_run += 1
+                
+                yield pending.popleft().result()
+    
+    def _composite_frame(self, character_data, timeline, frame_num, total_frames):
+        """Composite a single movement-based frame (canadian or nutcracker style)"""
+        current_time = frame_num / timeline.fps
+        debug_frame = frame_num < 3 and trace_enabled()  # Debug first 3 frames
+        
+        if timeline.style == 'nutcracker':
+            # Nutcracker jaw animation
+            jaw_offset = timeline.state_at(frame_num)
+            if frame_num % 50 == 0:
+                trace(f"Frame {frame_num}/{total_frames}: time={current_time:.2f}s, jaw_offset={jaw_offset:.1f}px")
+            return self.image_processor.composite_frame_with_jaw_slide(character_data, jaw_offset, debug=debug_frame)
+        
+        # Movement-based animation (Canadian style)
+        movement = timeline.state_at(frame_num)
+        if frame_num % 50 == 0:
+            trace(f"Frame {frame_num}/{total_frames}: time={current_time:.2f}s, movement={movement}")
+        return self.image_processor.composite_frame_with_movement(character_data, movement, debug=debug_frame)
+    
+    def _log_first_frame(self, frame):
+        """Print first frame statistics and save it as a debug image"""
+        print(f"First frame shape: {frame.shape}")
+        print(f"First frame dtype: {frame.dtype}")
+        print(f"First frame min/max: {frame.min()}/{frame.max()}")
+        unique_colors = len(np.unique(frame.reshape(-1, frame.shape[-1]), axis=0))
+        print(f"Unique colors in first frame: {unique_colors}")
+        
+        # Save first frame as debug image
+        debug_path = os.path.join(os.path.dirname(__file__), '..', '..', 'temp', 'debug_frame_0.png')
+        cv2.imwrite(debug_path, cv2.cvtColor(frame, cv2.COLOR_RGBA2BGRA))
+        print(f"Saved debug frame: {debug_path}")
+    
+    def _check_output(self, output_path):
+        """Report the size of the final video"""
+        if os.path.exists(output_path):
+            final_size = os.path.getsize(output_path)
+            print(f"Final video size: {final_size} bytes")
+            if final_size == 0:
+                print("WARNING: Final video file is empty!")
+        else:
+            print("WARNING: Final video file was not created!")
     
     def interpolate_movement(self, keyframes, time):
         """Get discrete movement at given time (no smooth interpolation for South Park style)"""
-        if not keyframes:
-            return {'top_y': 0, 'top_x': 0, 'bottom_y': 0}
-        
-        # Find the most recent keyframe (discrete positions, no interpolation)
-        current_movement = {'top_y': 0, 'top_x': 0, 'bottom_y': 0}
-        
-        for kf in keyframes:
-            if kf['time'] <= time:
-                current_movement = kf['movement']
-            else:
-                break
-        
-        return current_movement
+        return KeyframeTimeline(keyframes, 'canadian').movement_at(time)
     
     def interpolate_jaw_offset(self, keyframes, time):
         """Interpolate jaw vertical offset for nutcracker animation with smooth transitions"""
-        if not keyframes:
-            return 0
-        
-        # Find surrounding keyframes
-        prev_kf = None
-        next_kf = None
-        
-        for kf in keyframes:
-            if kf['time'] <= time:
-                prev_kf = kf
-            else:
-                next_kf = kf
-                break
-        
-        # If we only have previous keyframe, use its offset
-        if prev_kf and not next_kf:
-            return prev_kf['jaw_offset_y']
-        
-        # If we only have next keyframe, return closed
-        if not prev_kf and next_kf:
-            return 0
-        
-        # If time is between two keyframes, interpolate smoothly
-        if prev_kf and next_kf:
-            # Calculate interpolation factor
-            time_range = next_kf['time'] - prev_kf['time']
-            if time_range > 0:
-                t = (time - prev_kf['time']) / time_range
-                
-                # Use easing function for smooth transitions
-                # Ease-in-out cubic
-                if t < 0.5:
-                    t = 2 * t * t
-                else:
-                    t = 1 - 2 * (1 - t) * (1 - t)
-                
-                # Interpolate offset
-                offset_diff = next_kf['jaw_offset_y'] - prev_kf['jaw_offset_y']
-                return prev_kf['jaw_offset_y'] + offset_diff * t
-            else:
-                return prev_kf['jaw_offset_y']
-        
-        return 0
+        return KeyframeTimeline(keyframes, 'nutcracker').jaw_offset_at(time)
     
     def get_current_viseme(self, keyframes, frame_num):
         """Get the current viseme code for sprite-based animation"""
-        if not keyframes:
-            return 'X'  # Default to silence
-        
-        # Find the active keyframe for this frame
-        current_viseme = 'X'
-        
-        for kf in keyframes:
-            if kf['frame'] <= frame_num < kf['frame'] + kf['duration_frames']:
-                current_viseme = kf['viseme']
-                break
-        
-        return current_viseme
+        return KeyframeTimeline(keyframes, 'standard').viseme_at(frame_num)
     
     def render_sprite_frame(self, character_data, viseme_code, debug=False):
         """Render a single frame using sprite-based animation"""
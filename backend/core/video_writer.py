@@ -0,0 +1,236 @@
+"""
+Video writers for the render pipeline
+Frames are handed over as RGBA arrays; each writer takes care of encoding and
+muxing the audio track into the final output file
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import cv2
+import numpy as np
+
+
+# Name of the playlist an FFmpegHLSWriter writes into its hls_dir
+HLS_PLAYLIST = 'index.m3u8'
+
+
+def ffmpeg_available():
+    """Check whether an ffmpeg executable is on the PATH"""
+    return shutil.which('ffmpeg') is not None
+
+
+class FFmpegPipeWriter:
+    """Pipe raw RGBA frames into a single ffmpeg process that encodes once and muxes audio in the same pass"""
+
+    def __init__(self, output_path, width, height, fps, audio_path=None, preset='fast', crf=23):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.frames_written = 0
+        self._input_closed = False
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+        cmd = [
+            'ffmpeg',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',            # Raw frames over stdin
+            '-pix_fmt', 'rgba',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', '-',
+        ]
+        if audio_path is not None:
+            cmd += ['-i', audio_path]
+
+        cmd += [
+            '-map', '0:v',
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',  # libx264/yuv420p needs even dimensions
+            '-c:v', 'libx264',
+            '-preset', preset,
+            '-crf', str(crf),
+            '-pix_fmt', 'yuv420p',       # Browser compatible pixel format
+        ]
+        if audio_path is not None:
+            cmd += [
+                '-map', '1:a',
+                '-c:a', 'aac',           # AAC audio
+                '-b:a', '128k',          # Audio bitrate
+                '-shortest',             # Match shortest stream
+            ]
+        cmd += self._output_args()
+
+        print(f"Running ffmpeg: {' '.join(cmd)}")
+
+        # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=self._stderr)
+
+    def _output_args(self):
+        """ffmpeg options for the output file, after the encoder settings"""
+        return [
+            '-movflags', '+faststart',   # Enable web streaming
+            '-y',                        # Overwrite output
+            self.output_path
+        ]
+
+    def write(self, frame, repeat=1):
+        """Write one RGBA frame, repeated for repeat consecutive frames"""
+        if frame.shape[0] != self.height or frame.shape[1] != self.width or frame.shape[2] != 4:
+            raise Exception(f"Frame shape {frame.shape} does not match writer size {self.width}x{self.height}")
+
+        if self._input_closed:
+            return
+
+        data = np.ascontiguousarray(frame).data
+        for _ in range(repeat):
+            try:
+                self._process.stdin.write(data)
+            except BrokenPipeError:
+                # With -shortest ffmpeg stops reading once the audio ends; the
+                # exit code checked in close() tells whether that was a failure
+                self._input_closed = True
+                return
+
+            self.frames_written += 1
+
+    def close(self):
+        """Finish encoding and wait for ffmpeg to exit"""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        returncode = self._process.wait()
+        stderr = self._read_stderr()
+        self._stderr.close()
+
+        if returncode != 0:
+            print(f"FFmpeg error (exit code {returncode}): {stderr}")
+            raise Exception(f"FFmpeg failed: {stderr}")
+
+        print("FFmpeg completed successfully")
+
+    def abort(self):
+        """Kill ffmpeg and discard the partial output"""
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._stderr.close()
+        if os.path.exists(self.output_path):
+            os.unlink(self.output_path)
+
+    def _read_stderr(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace').strip()
+
+
+class FFmpegHLSWriter(FFmpegPipeWriter):
+    """Like FFmpegPipeWriter, but ffmpeg writes fragmented-MP4 HLS segments while the frames arrive
+
+    A player can start on the playlist in hls_dir as soon as the first
+    segment is written; close() then remuxes the finished segments into the
+    MP4 at output_path without encoding again.
+    """
+
+    def __init__(self, output_path, width, height, fps, audio_path=None, preset='fast', crf=23, hls_dir=None,
+                 segment_seconds=2):
+        if hls_dir is None:
+            raise Exception("FFmpegHLSWriter needs an hls_dir for the playlist and segments")
+        self.hls_dir = hls_dir
+        self.playlist_path = os.path.join(hls_dir, HLS_PLAYLIST)
+        self.segment_seconds = segment_seconds
+        os.makedirs(hls_dir, exist_ok=True)
+
+        super().__init__(output_path, width, height, fps, audio_path=audio_path, preset=preset, crf=crf)
+
+    def _output_args(self):
+        return [
+            # Start every segment on a keyframe so each one can be played on its own
+            '-force_key_frames', f'expr:gte(t,n_forced*{self.segment_seconds})',
+            '-f', 'hls',
+            '-hls_time', str(self.segment_seconds),
+            '-hls_segment_type', 'fmp4',
+            '-hls_playlist_type', 'event',  # Segments are only ever appended, ENDLIST marks the end
+            '-hls_flags', 'independent_segments+temp_file',  # Segments only appear once complete
+            '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', os.path.join(self.hls_dir, 'segment_%05d.m4s'),
+            '-y',
+            self.playlist_path
+        ]
+
+    def close(self):
+        """Finish the segments, then copy them into a single MP4 for download"""
+        super().close()
+
+        cmd = [
+            'ffmpeg',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-i', self.playlist_path,
+            '-c', 'copy',
+            '-movflags', '+faststart',
+            '-y',
+            self.output_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"FFmpeg remux error: {result.stderr}")
+            raise Exception(f"FFmpeg remux failed: {result.stderr}")
+
+    def abort(self):
+        """Kill ffmpeg and discard the partial output and segments"""
+        super().abort()
+        shutil.rmtree(self.hls_dir, ignore_errors=True)
+
+
+class OpenCVWriter:
+    """Fallback writer using cv2.VideoWriter (avc1, then mp4v) to a video-only file"""
+
+    def __init__(self, output_path, width, height, fps):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.frames_written = 0
+
+        # Set up video writer with H.264 codec for better browser compatibility
+        fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264 codec
+        self._writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+        # Fallback to mp4v if avc1 doesn't work
+        if not self._writer.isOpened():
+            print("avc1 codec failed, trying mp4v...")
+            self._writer.release()
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self._writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+        if not self._writer.isOpened():
+            raise Exception("Failed to open video writer")
+
+    def write(self, frame, repeat=1):
+        """Write one RGBA frame, repeated for repeat consecutive frames"""
+        # Convert RGBA to BGR for OpenCV, once for the whole run
+        bgr_frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+        for _ in range(repeat):
+            self._writer.write(bgr_frame)
+        self.frames_written += repeat
+
+    def close(self):
+        """Flush and release the video writer"""
+        self._writer.release()
+
+        # Check if video file was created and has content
+        if not os.path.exists(self.output_path):
+            raise Exception("Failed to create temp video file")
+        if os.path.getsize(self.output_path) == 0:
+            raise Exception("Generated video file is empty")
+
+    def abort(self):
+        """Release the writer and discard the partial output"""
+        self._writer.release()
+        if os.path.exists(self.output_path):
+            os.unlink(self.output_path)
@@ -0,0 +1,92 @@
+"""
+Per-Job Workspaces for Uploads and Renders
+Every job gets its own directory for its uploads, intermediate files and
+output video, so concurrent renders never overwrite each other's files.
+A reaper removes old workspaces by age and keeps the total under a disk quota
+"""
+
+import os
+import shutil
+import threading
+import time
+
+WORKSPACE_ROOT = os.path.join(os.path.dirname(__file__), '..', '..', 'temp', 'jobs')
+
+
+def directory_size(path):
+    """Total size in bytes of the files under a directory"""
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass  # Removed while we were walking
+    return total
+
+
+class WorkspaceManager:
+    """Creates job workspaces under one root directory and reaps stale ones"""
+
+    def __init__(self, root=None, max_age_seconds=24 * 60 * 60, max_total_bytes=2 * 1024 ** 3,
+                 min_age_seconds=60):
+        self.root = os.path.abspath(root or WORKSPACE_ROOT)
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        # Workspaces this new are never reaped, so an upload that is still
+        # being saved (and not yet queued as a job) can't lose its files
+        self.min_age_seconds = min_age_seconds
+        self._lock = threading.Lock()
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, job_id):
+        """Create and return the workspace directory for a job"""
+        path = self.path_for(job_id)
+        os.makedirs(path)  # Job ids are unique, an existing directory is a bug
+        return path
+
+    def path_for(self, job_id):
+        # Job ids come from uuid4().hex, but never let one escape the root
+        if not job_id or os.path.basename(job_id) != job_id or job_id.startswith('.'):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        return os.path.join(self.root, job_id)
+
+    def reap(self, in_use=()):
+        """Remove expired workspaces, then the oldest ones until the quota is met
+
+        in_use holds job ids whose workspaces must be kept (queued or running jobs).
+        Returns the job ids that were removed.
+        """
+        with self._lock:
+            now = time.time()
+            workspaces = []
+            for entry in os.scandir(self.root):
+                if not entry.is_dir() or entry.name in in_use:
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                workspaces.append((mtime, entry.name, directory_size(entry.path)))
+
+            # Oldest first, so the quota pass removes the stalest workspaces
+            workspaces.sort()
+            total = sum(size for _, _, size in workspaces)
+            total += sum(directory_size(os.path.join(self.root, job_id)) for job_id in in_use
+                         if os.path.isdir(os.path.join(self.root, job_id)))
+
+            removed = []
+            for mtime, job_id, size in workspaces:
+                age = now - mtime
+                if age < self.min_age_seconds:
+                    continue
+                if age <= self.max_age_seconds and total <= self.max_total_bytes:
+                    continue
+                shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
+                total -= size
+                removed.append(job_id)
+
+            if removed:
+                print(f"Reaped {len(removed)} job workspaces")
+            return removed
@@ -0,0 +1,49 @@
+"""
+Test Fixtures
+Synthetic characters, speech-like WAV clips and animators shared by the tests
+"""
+
+import os
+import sys
+import wave
+
+import cv2
+import numpy as np
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.animator import TalkingHeadAnimator
+
+def character_image(width=120, height=160):
+    """A plain ellipse face on a transparent background, as a BGRA array"""
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    cv2.ellipse(image, (width // 2, width // 2), (width * 3 // 8, height * 5 // 16), 0, 0, 360,
+                (120, 200, 255, 255), -1)
+    return image
+
+def write_character(path, width=120, height=160):
+    cv2.imwrite(path, character_image(width, height))
+    return path
+
+def speech_samples(seconds, framerate=16000):
+    """int16 220Hz tone pulsing three times a second, like syllables"""
+    t = np.arange(int(framerate * seconds)) / framerate
+    return (np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) * 20000).astype('<i2')
+
+def write_wav(path, samples, framerate, sample_width=2):
+    """Write an int array shaped (frames,) or (frames, channels) as a WAV file"""
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(framerate)
+        wav_file.writeframes(samples.astype('<i2' if sample_width == 2 else np.uint8).tobytes())
+    return path
+
+def write_speech(path, seconds, framerate=16000):
+    return write_wav(path, speech_samples(seconds, framerate), framerate)
+
+def make_animator(temp_dir):
+    """An animator that renders on one thread and caches inside temp_dir"""
+    return TalkingHeadAnimator(render_workers=1, cache_dir=os.path.join(temp_dir, 'cache'))
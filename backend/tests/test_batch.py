@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Unit tests for batch rendering of many audio clips for one character
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fixtures import write_character, write_speech, make_animator
+
+class TestCreateBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.animator = make_animator(self.temp_dir)
+        self.animator.video_renderer._log_first_frame = lambda frame: None  # Don't overwrite temp/debug_frame_0.png
+
+        self.image_path = write_character(os.path.join(self.temp_dir, 'character.png'))
+        self.audio_paths = [write_speech(os.path.join(self.temp_dir, f'line{i}.wav'), seconds)
+                            for i, seconds in enumerate([0.6, 0.9])]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_batch_renders_every_clip(self):
+        """Test that each clip gets its own output and failures are reported, not raised"""
+        output_dir = os.path.join(self.temp_dir, 'out')
+        broken_path = os.path.join(self.temp_dir, 'broken.wav')
+        with open(broken_path, 'wb') as f:
+            f.write(b'not audio')
+
+        report = self.animator.create_batch(self.image_path, self.audio_paths + [broken_path],
+                                            style='canadian', output_dir=output_dir, workers=2)
+
+        self.assertEqual(report['succeeded'], 2)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual([clip['audio'] for clip in report['clips']], self.audio_paths + [broken_path])
+        for clip in report['clips'][:2]:
+            self.assertEqual(clip['status'], 'done')
+            self.assertGreater(os.path.getsize(clip['output']), 0)
+        self.assertIn('error', report['clips'][2])
+
+        with open(os.path.join(output_dir, 'batch_report.json')) as f:
+            self.assertEqual(json.load(f)['succeeded'], 2)
+
+    def test_output_names_follow_audio_names(self):
+        """Test that repeated clip names get numbered outputs"""
+        paths = self.animator._batch_output_paths(['a/line.wav', 'b/line.mp3', 'take.wav'], 'out')
+        self.assertEqual(paths, [os.path.join('out', 'line.mp4'), os.path.join('out', 'line_2.mp4'),
+                                 os.path.join('out', 'take.mp4')])
+
+if __name__ == '__main__':
+    unittest.main()
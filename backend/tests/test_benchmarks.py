@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the benchmark harness
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.run_benchmarks import build_cases, measure_case, compare_results
+
+class TestBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cases_cover_every_style(self):
+        """Test that case names are unique and full renders cover all three styles"""
+        cases = build_cases(['small'], [2])
+        names = [case['name'] for case in cases]
+
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn('paste_with_alpha/canadian/small', names)
+        self.assertEqual({case['style'] for case in cases if case['kind'] == 'create_animation'},
+                         {'standard', 'canadian', 'nutcracker'})
+
+    def test_measure_case_reports_fps_and_memory(self):
+        """Test that a compositing case runs on a synthetic character and reports its throughput"""
+        case = [case for case in build_cases(['small'], [2])
+                if case['name'] == 'composite_frame_with_jaw_slide/nutcracker/small'][0]
+
+        result = measure_case(case, os.path.join(self.temp_dir, 'fixtures'), self.temp_dir)
+
+        self.assertEqual((result['width'], result['height']), (240, 360))
+        self.assertGreater(result['frames'], 0)
+        self.assertGreater(result['fps'], 0)
+        self.assertGreater(result['peak_rss_mb'], 0)
+
+    def test_compare_matches_cases_by_name(self):
+        baseline = {'cases': [{'name': 'a', 'fps': 100.0, 'peak_rss_mb': 50.0},
+                              {'name': 'b', 'fps': 10.0, 'peak_rss_mb': 50.0}]}
+        latest = {'cases': [{'name': 'a', 'fps': 150.0, 'peak_rss_mb': 40.0},
+                            {'name': 'c', 'fps': 1.0, 'peak_rss_mb': 1.0}]}
+
+        self.assertEqual(compare_results(baseline, latest), [('a', 100.0, 150.0, 50.0, 50.0, 40.0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the content-addressed audio analysis cache
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.disk_cache import AnalysisCache, RigCache
+from core.animator import TalkingHeadAnimator
+from tests.fixtures import write_character, write_speech
+
+class TestAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = AnalysisCache(os.path.join(self.temp_dir, 'cache'))
+
+        self.audio_path = os.path.join(self.temp_dir, 'line.wav')
+        with open(self.audio_path, 'wb') as f:
+            f.write(b'voice line')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        """Test that stored results are returned for the same key"""
+        cues = [{'start': 0.0, 'value': 'X', 'duration': 0.08}]
+        key = self.cache.key_for('mouth_cues', self.audio_path, {'version': 1})
+
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, cues)
+        self.assertEqual(self.cache.get(key), cues)
+
+    def test_key_follows_content_and_settings(self):
+        """Test that keys depend on file content and settings, not the file name"""
+        key = self.cache.key_for('mouth_cues', self.audio_path, {'version': 1})
+
+        copy_path = os.path.join(self.temp_dir, 'renamed.wav')
+        shutil.copy(self.audio_path, copy_path)
+        self.assertEqual(self.cache.key_for('mouth_cues', copy_path, {'version': 1}), key)
+
+        self.assertNotEqual(self.cache.key_for('mouth_cues', self.audio_path, {'version': 2}), key)
+        self.assertNotEqual(self.cache.key_for('amplitude', self.audio_path, {'version': 1}), key)
+
+        with open(copy_path, 'wb') as f:
+            f.write(b'another line')
+        self.assertNotEqual(self.cache.key_for('mouth_cues', copy_path, {'version': 1}), key)
+
+    def test_evicts_least_recently_used(self):
+        """Test that eviction keeps the cache under its size limit, dropping stale entries first"""
+        entry = ['x' * 100]
+        self.cache.max_bytes = 250
+        keys = [self.cache.make_key('entry', i) for i in range(3)]
+
+        self.cache.put(keys[0], entry)
+        self.cache.put(keys[1], entry)
+        os.utime(self.cache.path_for(keys[0]), (1, 1))
+        os.utime(self.cache.path_for(keys[1]), (2, 2))
+        self.cache.get(keys[0])  # Hit makes keys[0] the most recently used
+        self.cache.put(keys[2], entry)
+
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+class TestRigCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = RigCache(os.path.join(self.temp_dir, 'rigs'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip_keeps_types(self):
+        """Test that arrays, tuples, nested dicts and numpy scalars survive storage"""
+        character_data = {
+            'base_face': np.arange(24, dtype=np.uint8).reshape(2, 3, 4),
+            'jaw_image': np.zeros((1, 2, 4), dtype=np.uint8),
+            'jaw_rect': {'x': np.int64(3), 'y': 4, 'width': 5, 'height': 6},
+            'mouth_anchor': (np.int64(10), 20),
+            'sprite_size': (40, 30),
+            'split_y': 7,
+            'tags': ['a', ('b', 1)],
+        }
+        key = self.cache.make_key('rig', 1)
+        self.cache.put(key, character_data)
+
+        loaded = self.cache.get(key)
+
+        np.testing.assert_array_equal(loaded['base_face'], character_data['base_face'])
+        self.assertEqual(loaded['base_face'].dtype, np.uint8)
+        self.assertEqual(loaded['jaw_rect'], {'x': 3, 'y': 4, 'width': 5, 'height': 6})
+        self.assertEqual(loaded['mouth_anchor'], (10, 20))
+        self.assertIsInstance(loaded['sprite_size'], tuple)
+        self.assertEqual(loaded['tags'], ['a', ('b', 1)])
+
+    def test_prepare_character_hits_cache(self):
+        """Test that a repeat character skips image preparation"""
+        animator = TalkingHeadAnimator(cache_dir=self.temp_dir)
+        image_path = write_character(os.path.join(self.temp_dir, 'character.png'), width=160, height=200)
+
+        calls = []
+        prepare_uncached = animator.prepare_character_uncached
+        def counting_prepare(*args):
+            calls.append(args)
+            return prepare_uncached(*args)
+        animator.prepare_character_uncached = counting_prepare
+
+        first = animator.prepare_character(image_path, 'nutcracker', (80, 120))
+        second = animator.prepare_character(image_path, 'nutcracker', (80, 120))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(first.keys(), second.keys())
+        np.testing.assert_array_equal(first['jaw_image'], second['jaw_image'])
+        self.assertEqual(first['jaw_rect'], second['jaw_rect'])
+
+        animator.prepare_character(image_path, 'nutcracker', (80, 110))  # Different anchor, new key
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1], (image_path, 'nutcracker', (80, 110)))
+
+class TestCachedAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.animator = TalkingHeadAnimator(cache_dir=os.path.join(self.temp_dir, 'cache'))
+
+        self.audio_path = os.path.join(self.temp_dir, 'line.wav')
+        with open(self.audio_path, 'wb') as f:
+            f.write(b'voice line')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_analysis_runs_once(self):
+        """Test that a repeated analysis of the same audio is served from the cache"""
+        calls = []
+
+        def analyze(audio_path):
+            calls.append(audio_path)
+            return [{'start': 0.0, 'amplitude': 1.0, 'duration': 0.05}]
+
+        first = self.animator.cached_analysis('amplitude', self.audio_path, {}, analyze)
+        second = self.animator.cached_analysis('amplitude', self.audio_path, {}, analyze)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+
+    def test_rhubarb_failure_is_not_cached(self):
+        """Test that fallback cues from a failed Rhubarb run don't hide Rhubarb's cues once it works"""
+        rhubarb_cues = [{'start': 0.0, 'value': 'B'}, {'start': 0.4, 'value': 'X'}]
+        rhubarb_path = os.path.join(self.temp_dir, 'rhubarb')
+        fail_path = os.path.join(self.temp_dir, 'fail')
+        with open(rhubarb_path, 'w') as f:
+            # Called as: rhubarb -f json -o <output> <wav>
+            f.write('#!/bin/sh\n'
+                    f'[ -e "{fail_path}" ] && exit 1\n'
+                    f"echo '{{\"mouthCues\": {json.dumps(rhubarb_cues)}}}' > \"$4\"\n")
+        os.chmod(rhubarb_path, 0o755)
+        self.animator.phoneme_detector.rhubarb_path = rhubarb_path
+        audio_path = write_speech(os.path.join(self.temp_dir, 'speech.wav'), 1)
+
+        open(fail_path, 'w').close()
+        fallback = self.animator.extract_mouth_cues(audio_path)
+        os.remove(fail_path)
+        cues = self.animator.extract_mouth_cues(audio_path)
+
+        self.assertNotEqual([cue['value'] for cue in fallback], ['B', 'X'])
+        self.assertEqual([(cue['start'], cue['value']) for cue in cues], [(0.0, 'B'), (0.4, 'X')])
+        self.assertEqual(self.animator.extract_mouth_cues(audio_path), cues)  # Now served from the cache
+
+if __name__ == '__main__':
+    unittest.main()
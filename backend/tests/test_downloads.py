@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Unit tests for content-addressed, cacheable video downloads
+"""
+
+import unittest
+import os
+import sys
+import io
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.disk_cache import file_digest
+from core.downloads import DigestIndex, content_addressed_name, is_content_addressed
+from core.workspace import WorkspaceManager
+
+with redirect_stdout(io.StringIO()):
+    import app as app_module
+
+class TestDigestIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'talking_head_job.mp4')
+        with open(self.path, 'wb') as f:
+            f.write(b'frames' * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_digest_follows_content(self):
+        digests = DigestIndex()
+        first = digests.digest(self.path)
+        self.assertEqual(first, file_digest(self.path))
+
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        self.assertNotEqual(digests.digest(self.path), first)
+
+    def test_rename_to_content(self):
+        """Test that the new name carries the digest and the digest is not computed again"""
+        digests = DigestIndex()
+        digest = digests.digest(self.path)
+        new_path = digests.rename_to_content(self.path)
+
+        self.assertEqual(os.path.basename(new_path), content_addressed_name('talking_head_job.mp4', digest))
+        self.assertTrue(is_content_addressed(os.path.basename(new_path), digest))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(digests._digests[new_path][2], digest)
+
+    def test_index_is_bounded(self):
+        """Test that the least recently used digests are dropped past max_entries"""
+        digests = DigestIndex(max_entries=2)
+        paths = []
+        for name in ('a', 'b', 'c'):
+            paths.append(os.path.join(self.temp_dir, name))
+            with open(paths[-1], 'wb') as f:
+                f.write(name.encode())
+        digests.digest(paths[0])
+        digests.digest(paths[1])
+        digests.digest(paths[0])  # Now b is the least recently used
+        digests.digest(paths[2])
+
+        self.assertEqual(list(digests._digests), [paths[0], paths[2]])
+
+    def test_missing_file_is_forgotten(self):
+        digests = DigestIndex()
+        digests.digest(self.path)
+        os.remove(self.path)
+
+        with self.assertRaises(FileNotFoundError):
+            digests.digest(self.path)
+        self.assertNotIn(self.path, digests._digests)
+
+class TestDownloadRoutes(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_workspaces = app_module.workspace_manager
+        app_module.workspace_manager = WorkspaceManager(self.temp_dir)
+        self.client = app_module.app.test_client()
+
+        workspace = app_module.workspace_manager.create('job1')
+        self.content = bytes(range(256)) * 40
+        path = os.path.join(workspace, 'talking_head_job1.mp4')
+        with open(path, 'wb') as f:
+            f.write(self.content)
+        self.digest = file_digest(path)
+        self.url = '/download/job1/' + os.path.basename(app_module.video_digests.rename_to_content(path))
+
+    def tearDown(self):
+        app_module.workspace_manager = self.original_workspaces
+        shutil.rmtree(self.temp_dir)
+
+    def test_strong_etag_and_immutable_cache(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], f'"{self.digest}"')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertTrue(response.headers['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(response.data, self.content)
+        response.close()
+
+    def test_conditional_request_is_not_modified(self):
+        response = self.client.get(self.url, headers={'If-None-Match': f'"{self.digest}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        response.close()
+
+    def test_range_request(self):
+        """Test that a byte range (checked against the ETag with If-Range) returns just those bytes"""
+        response = self.client.get(self.url, headers={'Range': 'bytes=100-199', 'If-Range': f'"{self.digest}"'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response.data, self.content[100:200])
+        response.close()
+
+    def test_inline_playback_variant(self):
+        response = self.client.get(self.url + '?inline=1')
+
+        self.assertTrue(response.headers['Content-Disposition'].startswith('inline'))
+        self.assertEqual(response.headers['ETag'], f'"{self.digest}"')
+        response.close()
+
+    def test_other_names_are_revalidated(self):
+        workspace = app_module.workspace_manager.path_for('job1')
+        shutil.copy(os.path.join(workspace, os.path.basename(self.url)), os.path.join(workspace, 'renamed.mp4'))
+
+        response = self.client.get('/download/job1/renamed.mp4')
+
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        self.assertEqual(response.headers['ETag'], f'"{self.digest}"')
+        response.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for HLS output written while a render runs
+"""
+
+import unittest
+import os
+import sys
+import io
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+import cv2
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.video_writer import HLS_PLAYLIST, ffmpeg_available
+from tests.fixtures import write_character, write_speech, make_animator
+
+@unittest.skipUnless(ffmpeg_available(), 'HLS output needs ffmpeg')
+class TestHLSOutput(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.animator = make_animator(self.temp_dir)
+        self.image_path = write_character(os.path.join(self.temp_dir, 'character.png'))
+        # Eight seconds of audio: four 2s segments
+        self.audio_path = write_speech(os.path.join(self.temp_dir, 'line.wav'), 8)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_segments_appear_while_frames_render(self):
+        """Test that the playlist is out before the last frame and the MP4 is still produced"""
+        hls_dir = os.path.join(self.temp_dir, 'hls')
+        seen = []
+        def progress(stage, done=None, total=None):
+            if stage == 'frames' and done < total:
+                seen.append(os.path.exists(os.path.join(hls_dir, HLS_PLAYLIST)))
+
+        with redirect_stdout(io.StringIO()):
+            video_path = self.animator.create_animation(self.image_path, self.audio_path, style='nutcracker',
+                                                        mouth_anchor=(60, 90), progress_callback=progress,
+                                                        output_path=os.path.join(self.temp_dir, 'out.mp4'),
+                                                        hls_dir=hls_dir)
+
+        with open(os.path.join(hls_dir, HLS_PLAYLIST)) as f:
+            playlist = f.read()
+        segments = [line for line in playlist.splitlines() if line.endswith('.m4s')]
+
+        self.assertIn(True, seen)
+        self.assertIn('#EXT-X-MAP:URI="init.mp4"', playlist)
+        self.assertTrue(playlist.rstrip().endswith('#EXT-X-ENDLIST'))
+        self.assertGreaterEqual(len(segments), 4)
+        self.assertTrue(all(os.path.exists(os.path.join(hls_dir, segment)) for segment in segments))
+
+        capture = cv2.VideoCapture(video_path)
+        self.assertGreater(capture.get(cv2.CAP_PROP_FRAME_COUNT), 180)
+        capture.release()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the background render job queue
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.jobs import JobManager, QueueFullError, overall_progress, estimate_remaining
+
+def wait_until_finished(manager, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.manager = JobManager(max_workers=1, max_queued=1)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_job_reports_progress_and_result(self):
+        """Test that progress reported by the job is visible and the result is kept"""
+        seen = []
+        submitted = threading.Event()
+
+        def render(name, progress_callback=None):
+            submitted.wait(5)
+            progress_callback('audio')
+            progress_callback('frames', 5, 10)
+            seen.append(self.manager.get(job_id)['frames_done'])
+            return f'/output/{name}.mp4'
+
+        job_id = self.manager.submit(render, 'clip')
+        submitted.set()
+        job = wait_until_finished(self.manager, job_id)
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result'], '/output/clip.mp4')
+        self.assertEqual(job['progress'], 1.0)
+        self.assertEqual(job['frames_total'], 10)
+        self.assertEqual(seen, [5])
+
+    def test_failed_job_keeps_error(self):
+        """Test that exceptions mark the job failed with the error message"""
+        def render(progress_callback=None):
+            raise Exception("Failed to load image")
+
+        job = wait_until_finished(self.manager, self.manager.submit(render))
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], "Failed to load image")
+
+    def test_queue_is_bounded(self):
+        """Test that submissions beyond the running and queued limits are rejected"""
+        release = threading.Event()
+
+        def render(progress_callback=None):
+            release.wait(5)
+
+        first = self.manager.submit(render)
+        second = self.manager.submit(render)
+        with self.assertRaises(QueueFullError):
+            self.manager.submit(render)
+
+        release.set()
+        wait_until_finished(self.manager, first)
+        wait_until_finished(self.manager, second)
+        self.manager.submit(render)  # Room again once jobs finish
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.manager.get('missing'))
+        self.assertIsNone(self.manager.wait_for_change('missing', None, timeout=5))
+
+    def test_wait_for_change_wakes_on_progress(self):
+        """Test that a waiter is woken by each update and times out with the same snapshot otherwise"""
+        start, finish = threading.Event(), threading.Event()
+
+        def render(progress_callback=None):
+            start.wait(5)
+            progress_callback('frames', 5, 10)
+            finish.wait(5)
+
+        job_id = self.manager.submit(render)
+        job = self.manager.wait_for_change(job_id, None)
+        while job['status'] != 'running':
+            job = self.manager.wait_for_change(job_id, job['version'], timeout=5)
+
+        idle = self.manager.wait_for_change(job_id, job['version'], timeout=0.05)
+        self.assertEqual(idle['version'], job['version'])
+
+        start.set()
+        job = self.manager.wait_for_change(job_id, job['version'], timeout=5)
+        self.assertEqual(job['frames_done'], 5)
+        self.assertIsNotNone(job['eta_seconds'])
+
+        finish.set()
+        job = wait_until_finished(self.manager, job_id)
+        self.assertEqual(job['eta_seconds'], 0.0)
+
+class TestOverallProgress(unittest.TestCase):
+
+    def test_progress_increases_through_stages(self):
+        """Test that stage progress is monotonic and frames fill their share"""
+        steps = [('audio', None, None), ('character', None, None), ('keyframes', None, None),
+                 ('frames', 0, 100), ('frames', 50, 100), ('frames', 100, 100), ('encode', None, None)]
+        values = [overall_progress(*step) for step in steps]
+
+        self.assertEqual(values[0], 0.0)
+        self.assertEqual(values, sorted(values))
+        self.assertAlmostEqual(values[4], (values[3] + values[5]) / 2)
+        self.assertLess(values[-1], 1.0)
+
+    def test_estimate_remaining(self):
+        self.assertIsNone(estimate_remaining(0.01, 2.0))
+        self.assertAlmostEqual(estimate_remaining(0.25, 10.0), 30.0)
+        self.assertEqual(estimate_remaining(1.0, 10.0), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
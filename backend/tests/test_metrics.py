@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Unit tests for pipeline metrics and structured logging
+"""
+
+import unittest
+import os
+import sys
+import io
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.metrics import MetricsRegistry, metrics, log_event, trace, set_trace, trace_enabled
+from core.jobs import JobManager
+from tests.fixtures import write_character, write_speech, make_animator
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_counters_and_timers_by_label(self):
+        """Test that counters add up and timers keep count, sum and max per label set"""
+        registry = MetricsRegistry()
+        registry.increment('frames_total', 10, style='canadian')
+        registry.increment('frames_total', 5, style='canadian')
+        registry.increment('frames_total', 1, style='standard')
+        registry.observe('stage_seconds', 0.5, stage='audio')
+        registry.observe('stage_seconds', 1.5, stage='audio')
+
+        self.assertEqual(registry.value('frames_total', style='canadian'), 15)
+        self.assertEqual(registry.value('frames_total', style='standard'), 1)
+        timer = registry.snapshot()['timers'][0]
+        self.assertEqual((timer['count'], timer['sum'], timer['max']), (2, 2.0, 1.5))
+
+    def test_prometheus_format(self):
+        """Test that each metric family is declared once and labels are quoted"""
+        registry = MetricsRegistry()
+        registry.increment('jobs_total', status='done')
+        registry.observe('stage_seconds', 0.25, stage='audio', style='canadian')
+        registry.observe('stage_seconds', 0.5, stage='render', style='canadian')
+
+        text = registry.render_prometheus()
+
+        self.assertIn('# TYPE jobs_total counter\njobs_total{status="done"} 1\n', text)
+        self.assertEqual(text.count('# TYPE stage_seconds summary'), 1)
+        self.assertIn('stage_seconds_sum{stage="render",style="canadian"} 0.500000', text)
+        self.assertIn('stage_seconds_max{stage="audio",style="canadian"} 0.250000', text)
+
+class TestStructuredLogs(unittest.TestCase):
+
+    def tearDown(self):
+        set_trace(False)
+
+    def test_log_event_is_one_json_line(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            log_event('render', style='canadian', frames=24)
+
+        record = json.loads(output.getvalue())
+        self.assertEqual((record['event'], record['style'], record['frames']), ('render', 'canadian', 24))
+
+    def test_trace_is_off_by_default(self):
+        """Test that trace output only appears once tracing is switched on"""
+        self.assertFalse(trace_enabled())
+        output = io.StringIO()
+        with redirect_stdout(output):
+            trace('per-frame detail')
+            set_trace(True)
+            trace('now visible')
+        self.assertEqual(output.getvalue(), 'now visible\n')
+
+class TestPipelineMetrics(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.animator = make_animator(self.temp_dir)
+        self.image_path = write_character(os.path.join(self.temp_dir, 'character.png'))
+        self.audio_path = write_speech(os.path.join(self.temp_dir, 'line.wav'), 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_animation_records_stages_frames_and_cache(self):
+        """Test that a render counts its frames and bytes and logs structured events"""
+        before = {name: metrics.value(name, style='nutcracker') for name in
+                  ('animator_frames_written_total', 'animator_bytes_written_total')}
+        misses = metrics.value('animator_cache_requests_total', cache='rig', kind='nutcracker', result='miss')
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            video_path = self.animator.create_animation(self.image_path, self.audio_path, style='nutcracker',
+                                                        mouth_anchor=(60, 90),
+                                                        output_path=os.path.join(self.temp_dir, 'out.mp4'))
+
+        events = [json.loads(line) for line in output.getvalue().splitlines() if line.startswith('{"ts"')]
+        render = [event for event in events if event['event'] == 'render'][0]
+        animation = [event for event in events if event['event'] == 'animation'][0]
+
+        self.assertEqual(render['bytes'], os.path.getsize(video_path))
+        self.assertGreaterEqual(render['frames_written'], render['frames_composited'])
+        self.assertEqual(animation['status'], 'done')
+        self.assertEqual(set(animation['stages']), {'audio', 'character', 'keyframes', 'render'})
+        self.assertNotIn('Frame 0/', output.getvalue())  # Per-frame trace is off
+
+        self.assertEqual(metrics.value('animator_frames_written_total', style='nutcracker'),
+                         before['animator_frames_written_total'] + render['frames_written'])
+        self.assertEqual(metrics.value('animator_bytes_written_total', style='nutcracker'),
+                         before['animator_bytes_written_total'] + render['bytes'])
+        self.assertEqual(metrics.value('animator_cache_requests_total', cache='rig', kind='nutcracker',
+                                       result='miss'), misses + 1)
+
+    def test_jobs_are_counted(self):
+        failed = metrics.value('animator_jobs_total', status='failed')
+        manager = JobManager()
+
+        def job(progress_callback):
+            raise Exception('broken clip')
+
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            manager.submit(job)
+            manager.shutdown()
+
+        self.assertEqual(metrics.value('animator_jobs_total', status='failed'), failed + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Unit tests for ImageProcessor.paste_with_alpha
+Checks the integer fast path for opaque destinations against the float "over" operator
+"""
+
+import unittest
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.image_processor import ImageProcessor
+
+class TestPasteWithAlpha(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.image_processor = ImageProcessor()
+        self.rng = np.random.default_rng(1234)
+
+    def random_rgba(self, height, width, opaque=False):
+        image = self.rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        if opaque:
+            image[:, :, 3] = 255
+        return image
+
+    def test_opaque_destination_matches_float_within_tolerance(self):
+        """Test that the fixed-point path stays within 1 level of the float implementation"""
+        for _ in range(20):
+            canvas = self.random_rgba(64, 80, opaque=True)
+            sprite = self.random_rgba(40, 50)
+
+            fast = canvas.copy()
+            reference = canvas.copy()
+
+            self.image_processor.paste_with_alpha(fast, sprite, 20, 10)
+            self.image_processor._blend_over_float(reference[10:50, 20:70], sprite)
+
+            diff = np.abs(fast.astype(np.int16) - reference.astype(np.int16))
+            self.assertLessEqual(diff.max(), 1, "Fast path deviates from float compositing")
+            self.assertTrue((fast[:, :, 3] == 255).all(), "Opaque canvas should stay opaque")
+
+    def test_alpha_extremes_are_exact(self):
+        """Test that fully transparent and fully opaque source pixels are copied exactly"""
+        canvas = self.random_rgba(10, 10, opaque=True)
+        sprite = self.random_rgba(10, 10)
+        sprite[:5, :, 3] = 0
+        sprite[5:, :, 3] = 255
+
+        result = canvas.copy()
+        self.image_processor.paste_with_alpha(result, sprite, 0, 0)
+
+        np.testing.assert_array_equal(result[:5], canvas[:5])
+        np.testing.assert_array_equal(result[5:, :, :3], sprite[5:, :, :3])
+
+    def test_clipping_at_canvas_edges(self):
+        """Test that sprites hanging off the canvas only touch the overlapping pixels"""
+        canvas = np.full((20, 20, 4), 255, dtype=np.uint8)
+        sprite = np.zeros((10, 10, 4), dtype=np.uint8)
+        sprite[:, :, 3] = 255
+
+        self.image_processor.paste_with_alpha(canvas, sprite, -5, 15)
+
+        self.assertTrue((canvas[15:20, 0:5, :3] == 0).all())
+        self.assertTrue((canvas[:15, :, :3] == 255).all())
+        self.assertTrue((canvas[:, 5:, :3] == 255).all())
+
+    def test_transparent_destination_uses_float_path(self):
+        """Test that non-opaque destinations still get the general "over" operator"""
+        canvas = self.random_rgba(32, 32)
+        canvas[0, 0, 3] = 0  # Make sure the region is not fully opaque
+        sprite = self.random_rgba(32, 32)
+
+        result = canvas.copy()
+        reference = canvas.copy()
+
+        self.image_processor.paste_with_alpha(result, sprite, 0, 0)
+        self.image_processor._blend_over_float(reference, sprite)
+
+        np.testing.assert_array_equal(result, reference)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the stage graph used by create_animation
+"""
+
+import unittest
+import os
+import sys
+import threading
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.pipeline import Pipeline
+
+class TestPipeline(unittest.TestCase):
+
+    def test_dependencies_receive_results(self):
+        """Test that stages get their dependencies' results in order"""
+        pipeline = Pipeline()
+        pipeline.add_stage('audio', lambda: 'cues')
+        pipeline.add_stage('character', lambda: 'rig')
+        pipeline.add_stage('keyframes', lambda cues: cues + ':keyframes', depends_on=['audio'])
+        pipeline.add_stage('render', lambda rig, keyframes: (rig, keyframes),
+                           depends_on=['character', 'keyframes'])
+
+        results = pipeline.run()
+
+        self.assertEqual(results['render'], ('rig', 'cues:keyframes'))
+        self.assertEqual(set(pipeline.timings), {'audio', 'character', 'keyframes', 'render'})
+
+    def test_independent_stages_overlap(self):
+        """Test that stages without dependencies between them run at the same time"""
+        # Each stage waits for the other to start, which only works if both run concurrently
+        barrier = threading.Barrier(2, timeout=5)
+        pipeline = Pipeline()
+        pipeline.add_stage('audio', lambda: barrier.wait())
+        pipeline.add_stage('character', lambda: barrier.wait())
+
+        results = pipeline.run()
+
+        self.assertEqual(sorted(results.values()), [0, 1])
+
+    def test_failure_stops_dependents(self):
+        """Test that a failing stage raises and its dependents never run"""
+        ran = []
+        pipeline = Pipeline()
+        pipeline.add_stage('audio', lambda: 1 / 0)
+        pipeline.add_stage('keyframes', lambda cues: ran.append('keyframes'), depends_on=['audio'])
+
+        with self.assertRaises(ZeroDivisionError):
+            pipeline.run()
+        self.assertEqual(ran, [])
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(Exception):
+            Pipeline().add_stage('render', lambda rig: rig, depends_on=['character'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for low-latency preview renders
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import wave
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.animator import TalkingHeadAnimator
+from tests.fixtures import write_character, write_speech, make_animator
+
+class TestPreview(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.animator = make_animator(self.temp_dir)
+        self.image_path = write_character(os.path.join(self.temp_dir, 'character.png'), width=160, height=200)
+        # Six seconds of audio, twice the preview length
+        self.audio_path = write_speech(os.path.join(self.temp_dir, 'line.wav'), 6)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def render(self, preview):
+        frames = {}
+        def progress(stage, done=None, total=None):
+            if stage == 'frames':
+                frames['total'] = total
+
+        rendered = []
+        original_render = self.animator.video_renderer.render
+        def render(character_data, keyframes, audio_path, **options):
+            rendered.append((character_data, options))
+            return original_render(character_data, keyframes, audio_path, **options)
+        self.animator.video_renderer.render = render
+
+        name = 'preview.mp4' if preview else 'full.mp4'
+        self.animator.create_animation(self.image_path, self.audio_path, style='nutcracker', mouth_anchor=(80, 120),
+                                       progress_callback=progress, output_path=os.path.join(self.temp_dir, name),
+                                       preview=preview)
+        return frames['total'], rendered[0]
+
+    def test_preview_is_short_small_and_fast_to_encode(self):
+        """Test that a preview covers the first seconds at reduced size, fps and encoder effort"""
+        settings = TalkingHeadAnimator.PREVIEW_SETTINGS
+        full_frames, (full_data, _) = self.render(preview=False)
+        preview_frames, (preview_data, options) = self.render(preview=True)
+
+        self.assertEqual(options['fps'], settings['fps'])
+        self.assertEqual(options['preset'], 'ultrafast')
+        self.assertLessEqual(preview_frames, (settings['seconds'] + 0.5) * settings['fps'])
+        self.assertLess(preview_frames, full_frames)
+        self.assertEqual(preview_data['width'], int(160 * settings['scale']))
+        self.assertLess(preview_data['video_width'], full_data['video_width'])
+        self.assertGreater(os.path.getsize(os.path.join(self.temp_dir, 'preview.mp4')), 0)
+
+    def test_trim_audio_keeps_the_start(self):
+        trimmed_path = self.animator.phoneme_detector.trim_audio(self.audio_path, 1.5,
+                                                                 os.path.join(self.temp_dir, 'trimmed.wav'))
+
+        with wave.open(trimmed_path, 'rb') as trimmed, wave.open(self.audio_path, 'rb') as original:
+            self.assertEqual(trimmed.getframerate(), 16000)
+            self.assertEqual(trimmed.getnframes(), 24000)
+            self.assertEqual(trimmed.readframes(24000), original.readframes(24000))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the dirty-rectangle sprite compositor
+Checks its frames against the full-frame render_sprite_frame path
+"""
+
+import unittest
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.video_renderer import VideoRenderer
+from core.sprite_compositor import SpriteCompositor
+
+class TestSpriteCompositor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.renderer = VideoRenderer(workers=1)
+
+    def character_data(self, mouth_anchor):
+        # Half-transparent character so blending takes both paste paths
+        rng = np.random.default_rng(3)
+        base_image = rng.integers(0, 256, (120, 100, 4), dtype=np.uint8)
+        base_image[:60, :, 3] = 255
+        return {
+            'base_image': base_image,
+            'mouth_anchor': mouth_anchor,
+            'sprite_size': (40, 30),
+            'padding': {'top': 40, 'bottom': 40, 'left': 40, 'right': 40},
+            'video_width': 180,
+            'video_height': 200,
+        }
+
+    def assert_matches_full_render(self, character_data, visemes):
+        compositor = SpriteCompositor(self.renderer.image_processor, character_data)
+        for viseme in visemes:
+            expected = self.renderer.render_sprite_frame(character_data, viseme)
+            np.testing.assert_array_equal(compositor.frame(viseme), expected,
+                                          err_msg=f"Frame for viseme {viseme} differs")
+
+    def test_matches_full_render(self):
+        """Test that every viseme sequence gives the same pixels as a full render"""
+        visemes = ['X', 'A', 'A', 'D', 'B', 'X', 'H', 'H', 'E', 'F', 'G', 'C', 'A']
+        self.assert_matches_full_render(self.character_data((50, 55)), visemes)   # Across the alpha edge
+        self.assert_matches_full_render(self.character_data((50, 100)), visemes)  # Transparent area
+
+    def test_mouth_clipped_at_character_edge(self):
+        """Test that a mouth hanging off the character is clipped like composite_sprite_frame"""
+        self.assert_matches_full_render(self.character_data((5, 115)), ['A', 'D', 'X', 'D'])
+        self.assert_matches_full_render(self.character_data((-100, 50)), ['A', 'D'])
+
+    def test_unchanged_viseme_does_no_work(self):
+        """Test that repeating a viseme returns the canvas untouched"""
+        compositor = SpriteCompositor(self.renderer.image_processor, self.character_data((50, 55)))
+        first = compositor.frame('D').copy()
+        compositor.canvas.flags.writeable = False  # Any pixel write would raise
+        np.testing.assert_array_equal(compositor.frame('D'), first)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Unit tests for live streaming animation
+"""
+
+import unittest
+import os
+import sys
+import io
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+import cv2
+import numpy as np
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.streaming import (PCMSource, GrowingWavSource, StreamingEnvelope, StreamingAnimator, LiveSession,
+                            jpeg_frames, mjpeg_parts)
+from core.workspace import WorkspaceManager
+from tests.fixtures import character_image, speech_samples, write_character, write_wav, make_animator
+
+with redirect_stdout(io.StringIO()):
+    import app as app_module
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.animator = make_animator(self.temp_dir)
+        self.image_path = write_character(os.path.join(self.temp_dir, 'character.png'))
+
+        # Two seconds of speech-like bursts
+        self.samples = speech_samples(2)
+        self.pcm = self.samples.tobytes()
+        self.audio_path = write_wav(os.path.join(self.temp_dir, 'line.wav'), self.samples, 16000)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def streamer(self, style='nutcracker', **options):
+        with redirect_stdout(io.StringIO()):
+            return StreamingAnimator(self.animator, self.image_path, style, mouth_anchor=(60, 90), **options)
+
+    def test_envelope_is_independent_of_chunking(self):
+        """Test that chunked input gives the offline analysis windows, whatever the chunk sizes"""
+        samples = self.samples.astype(np.float32) / 32768.0
+        whole = StreamingEnvelope(16000).feed(samples)
+
+        envelope = StreamingEnvelope(16000)
+        chunked = []
+        for start in range(0, len(samples), 333):
+            chunked.extend(envelope.feed(samples[start:start + 333]))
+
+        offline = self.animator.analyze_audio_amplitude(self.audio_path)
+        self.assertEqual(chunked, whole)
+        self.assertEqual([segment['start'] for segment in chunked], [entry['start'] for entry in offline])
+        self.assertTrue(all(0.0 <= segment['amplitude'] <= 1.0 for segment in chunked))
+
+    def test_keyframers_match_whole_file_generation(self):
+        """Test that feeding segments a few at a time gives the same keyframes as one batch"""
+        segments = self.animator.analyze_audio_amplitude(self.audio_path)
+
+        for style in ('nutcracker', 'canadian'):
+            with redirect_stdout(io.StringIO()):
+                offline = self.animator.generate_keyframes(segments, style)
+            keyframer = self.animator.keyframer(style)
+            streamed = []
+            for start in range(0, len(segments), 7):
+                streamed.extend(keyframer.feed(segments[start:start + 7]))
+            self.assertEqual(streamed, offline, style)
+
+    def test_frames_cover_the_stream(self):
+        streamer = self.streamer('canadian')
+        with redirect_stdout(io.StringIO()):
+            frames = list(streamer.frames(PCMSource(io.BytesIO(self.pcm))))
+
+        times = [frame_time for frame_time, _ in frames]
+        self.assertEqual(times, [frame_num / 24 for frame_num in range(48)])
+        self.assertEqual(frames[0][1].shape[:2], (streamer.character_data['video_height'],
+                                                   streamer.character_data['video_width']))
+        self.assertLess(streamer.stats['frames_composited'], len(frames))  # Held positions are reused
+
+    def test_slow_compositing_drops_frames_instead_of_falling_behind(self):
+        """Test that the delay from audio in to frame out stays bounded when frames are slow to draw"""
+        streamer = self.streamer(latency=0.1, max_lag=0.2)
+        composite = streamer._composite
+        def slow_composite(state):
+            time.sleep(0.08)  # Half the speed of real time at 24fps
+            return composite(state)
+        streamer._composite = slow_composite
+
+        read_fd, write_fd = os.pipe()
+        def feed():
+            with os.fdopen(write_fd, 'wb', buffering=0) as pipe:
+                for start in range(0, len(self.pcm) // 2, 640):  # One second, in real time
+                    pipe.write(self.pcm[start:start + 640])
+                    time.sleep(0.02)
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+
+        with os.fdopen(read_fd, 'rb') as pipe, redirect_stdout(io.StringIO()):
+            frames = list(streamer.frames(PCMSource(pipe)))
+        feeder.join()
+
+        self.assertGreater(streamer.stats['frames_dropped'], 0)
+        self.assertEqual(len(frames) + streamer.stats['frames_dropped'], 24)
+        self.assertLess(streamer.stats['max_delay'], 0.1 + 0.2 + 0.08 + 0.1)
+
+    def test_growing_wav_is_read_as_it_is_written(self):
+        path = os.path.join(self.temp_dir, 'recording.wav')
+
+        def record():
+            # Like a recorder: the header's sizes stay 0 until the end
+            with open(path, 'wb') as f:
+                f.write(b'RIFF' + struct.pack('<I', 0) + b'WAVE')
+                f.write(b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, 16000, 32000, 2, 16))
+                f.write(b'data' + struct.pack('<I', 0))
+                f.flush()
+                for start in range(0, 16000, 3200):
+                    time.sleep(0.01)
+                    f.write(self.pcm[start:start + 3200])
+                    f.flush()
+        recorder = threading.Thread(target=record)
+        recorder.start()
+
+        source = GrowingWavSource(path, idle_timeout=0.3)
+        samples = np.concatenate(list(source))
+        recorder.join()
+
+        self.assertEqual(source.sample_rate, 16000)
+        np.testing.assert_array_equal(samples, self.samples[:8000].astype(np.float32) / 32768.0)
+
+    def test_feed_without_a_viewer_times_out(self):
+        """Test that audio posted to a session nobody watches doesn't block on the full pipe forever"""
+        session = LiveSession(self.streamer(), viewer_timeout=0.3)
+        errors = []
+        def feed():
+            try:
+                session.feed(io.BytesIO(self.pcm * 4))  # 256KB, more than the pipe holds
+            except Exception as e:
+                errors.append(e)
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        feeder.join(5)
+
+        self.assertFalse(feeder.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(session._writer.closed and session._reader.closed)  # The session is closed
+
+    def test_standard_style_cannot_stream(self):
+        with self.assertRaises(Exception):
+            self.streamer('standard')
+
+    def test_mjpeg_parts(self):
+        frame = np.full((8, 8, 4), 255, dtype=np.uint8)
+        parts = list(mjpeg_parts(jpeg_frames([(0.0, frame), (0.04, frame)])))
+
+        self.assertEqual(len(parts), 2)
+        self.assertTrue(parts[0].startswith(b'--frame\r\nContent-Type: image/jpeg\r\n'))
+        self.assertIn(b'\r\n\r\n\xff\xd8', parts[0])  # JPEG start of image after the headers
+
+class TestLiveRoutes(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_workspaces = app_module.workspace_manager
+        self.original_animator = app_module.animator
+        self.original_max_content_length = app_module.app.config['MAX_CONTENT_LENGTH']
+        self.original_live_timeout = app_module.LIVE_SESSION_TIMEOUT
+        app_module.workspace_manager = WorkspaceManager(os.path.join(self.temp_dir, 'jobs'))
+        app_module.animator = make_animator(self.temp_dir)
+        self.client = app_module.app.test_client()
+
+        self.image = cv2.imencode('.png', character_image())[1].tobytes()
+        self.pcm = speech_samples(1).tobytes()  # One second of speech-like bursts
+
+    def tearDown(self):
+        app_module.workspace_manager = self.original_workspaces
+        app_module.animator = self.original_animator
+        app_module.app.config['MAX_CONTENT_LENGTH'] = self.original_max_content_length
+        app_module.LIVE_SESSION_TIMEOUT = self.original_live_timeout
+        shutil.rmtree(self.temp_dir)
+
+    def start_session(self, **form):
+        form['image'] = (io.BytesIO(self.image), 'character.png')
+        with redirect_stdout(io.StringIO()):
+            return self.client.post('/live', data=dict(form, mouth_x='60', mouth_y='90'),
+                                    content_type='multipart/form-data')
+
+    def test_audio_stream_is_not_capped_by_max_content_length(self):
+        """Test that a chunked audio body longer than MAX_CONTENT_LENGTH is animated to the end"""
+        response = self.start_session(style='nutcracker')
+        self.assertEqual(response.status_code, 201)
+        session = response.get_json()
+        app_module.app.config['MAX_CONTENT_LENGTH'] = 1024
+
+        # As a server does for a chunked body: no Content-Length, the server ends the stream.
+        # One second of audio fits in the session's pipe, so it can be posted before the video is read
+        audio = self.client.post(session['audio_url'], input_stream=io.BytesIO(self.pcm),
+                                 environ_overrides={'wsgi.input_terminated': True})
+        self.assertEqual(audio.status_code, 200)
+
+        with redirect_stdout(io.StringIO()):
+            video = self.client.get(session['video_url'], buffered=False)
+            parts = list(video.response)
+            video.close()
+
+        self.assertEqual(video.mimetype, 'multipart/x-mixed-replace')
+        self.assertEqual(len(parts), 24)
+        self.assertNotIn(session['session_id'], app_module.live_sessions)
+
+    def test_invalid_stream_parameters_are_rejected(self):
+        """Test that sample rates, channel counts, frame rates and latencies that can't stream give a 400"""
+        sessions = set(app_module.live_sessions)
+        for form in ({'fps': '0'}, {'channels': '0'}, {'sample_rate': '-16000'}, {'sample_rate': '40'},
+                     {'latency': '0'}, {'latency': 'nan'}):
+            response = self.start_session(**form)
+            self.assertEqual(response.status_code, 400, form)
+
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'jobs')), [])
+        self.assertEqual(set(app_module.live_sessions), sessions)
+
+    def test_unwatched_session_releases_the_audio_request(self):
+        """Test that an audio POST to a session nobody opens returns after LIVE_SESSION_TIMEOUT and the session is reaped"""
+        app_module.LIVE_SESSION_TIMEOUT = 0.3
+        session = self.start_session(style='nutcracker').get_json()
+
+        responses = []
+        def feed():
+            responses.append(self.client.post(session['audio_url'], input_stream=io.BytesIO(self.pcm * 8),
+                                              environ_overrides={'wsgi.input_terminated': True}))
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        feeder.join(5)
+
+        self.assertFalse(feeder.is_alive())
+        self.assertEqual(responses[0].status_code, 409)
+        self.assertEqual(self.client.get(session['video_url']).status_code, 404)
+
+    def test_unknown_session(self):
+        self.assertEqual(self.client.post('/live/missing/audio', data=b'').status_code, 404)
+        self.assertEqual(self.client.get('/live/missing/video').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compiled keyframe timeline
+Compares indexed lookups with the linear keyframe scans they replace
+"""
+
+import unittest
+import os
+import sys
+import random
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.timeline import KeyframeTimeline
+
+def scan_movement(keyframes, time):
+    current_movement = {'top_y': 0, 'top_x': 0, 'bottom_y': 0}
+    for kf in keyframes:
+        if kf['time'] <= time:
+            current_movement = kf['movement']
+        else:
+            break
+    return current_movement
+
+def scan_jaw_surrounding(keyframes, time):
+    prev_kf = None
+    next_kf = None
+    for kf in keyframes:
+        if kf['time'] <= time:
+            prev_kf = kf
+        else:
+            next_kf = kf
+            break
+    return prev_kf, next_kf
+
+def scan_viseme(keyframes, frame_num):
+    for kf in keyframes:
+        if kf['frame'] <= frame_num < kf['frame'] + kf['duration_frames']:
+            return kf['viseme']
+    return 'X'
+
+class TestKeyframeTimeline(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.rng = random.Random(42)
+
+    def random_time_keyframes(self, count):
+        # Close keyframes are appended after their sound, so real lists are not sorted
+        keyframes = []
+        time = 0.0
+        for i in range(count):
+            time += self.rng.uniform(0.0, 0.2)
+            keyframes.append({'time': time, 'movement': {'top_y': -i, 'top_x': 0, 'bottom_y': i},
+                              'jaw_offset_y': self.rng.choice([0, 10, 20, 30, 35])})
+            if self.rng.random() < 0.5:
+                keyframes.append({'time': time + self.rng.uniform(0.0, 0.4), 'movement': {'top_y': 0, 'top_x': 0, 'bottom_y': 0},
+                                  'jaw_offset_y': 0})
+        return keyframes
+
+    def test_movement_matches_linear_scan(self):
+        """Test that movement lookups match a front-to-back scan on unsorted keyframes"""
+        keyframes = self.random_time_keyframes(200)
+        timeline = KeyframeTimeline(keyframes, 'canadian', fps=24).compile(24 * 30)
+
+        for frame_num in range(24 * 30):
+            expected = scan_movement(keyframes, frame_num / 24)
+            self.assertEqual(timeline.state_at(frame_num), expected, f"Frame {frame_num} differs")
+
+    def test_jaw_offset_matches_linear_scan(self):
+        """Test that jaw lookups interpolate between the same keyframes as a linear scan"""
+        keyframes = self.random_time_keyframes(200)
+        timeline = KeyframeTimeline(keyframes, 'nutcracker', fps=24)
+
+        for frame_num in range(24 * 30):
+            time = frame_num / 24
+            self.assertEqual(timeline._surrounding(time), scan_jaw_surrounding(keyframes, time))
+
+    def test_jaw_offset_edges(self):
+        """Test jaw offsets before, between and after keyframes"""
+        keyframes = [{'time': 1.0, 'jaw_offset_y': 0}, {'time': 2.0, 'jaw_offset_y': 30}]
+        timeline = KeyframeTimeline(keyframes, 'nutcracker', fps=24)
+
+        self.assertEqual(timeline.jaw_offset_at(0.5), 0)
+        self.assertEqual(timeline.jaw_offset_at(1.5), 15)
+        self.assertEqual(timeline.jaw_offset_at(3.0), 30)
+        self.assertEqual(KeyframeTimeline([], 'nutcracker').jaw_offset_at(1.0), 0)
+
+    def test_viseme_matches_linear_scan(self):
+        """Test that per-frame visemes match a scan, including overlapping cues"""
+        keyframes = []
+        for i in range(300):
+            keyframes.append({'frame': self.rng.randint(0, 600), 'viseme': self.rng.choice('ABCDEFGHX'),
+                              'duration_frames': self.rng.randint(1, 6)})
+        keyframes.sort(key=lambda x: x['frame'])
+
+        timeline = KeyframeTimeline(keyframes, 'standard', fps=24).compile(620)
+
+        for frame_num in range(620):
+            self.assertEqual(timeline.state_at(frame_num), scan_viseme(keyframes, frame_num))
+
+    def test_runs_cover_every_frame(self):
+        """Test that runs group equal consecutive states and expand back to the per-frame states"""
+        keyframes = self.random_time_keyframes(50)
+        for style in ('canadian', 'nutcracker'):
+            timeline = KeyframeTimeline(keyframes, style, fps=24).compile(240)
+            runs = timeline.runs(240)
+
+            expanded = [state for start, length, state in runs for _ in range(length)]
+            self.assertEqual(expanded, [timeline.state_at(frame_num) for frame_num in range(240)])
+            self.assertEqual([start for start, _, _ in runs],
+                             [sum(length for _, length, _ in runs[:i]) for i in range(len(runs))])
+            for (_, _, state), (_, _, next_state) in zip(runs, runs[1:]):
+                self.assertNotEqual(state, next_state)
+
+        silence = KeyframeTimeline([{'frame': 10, 'viseme': 'A', 'duration_frames': 5}], 'standard').compile(30)
+        self.assertEqual(silence.runs(30), [(0, 10, 'X'), (10, 5, 'A'), (15, 15, 'X')])
+
+    def test_empty_keyframes(self):
+        """Test defaults when there are no keyframes"""
+        self.assertEqual(KeyframeTimeline([], 'standard').state_at(5), 'X')
+        self.assertEqual(KeyframeTimeline([], 'canadian').state_at(5), {'top_y': 0, 'top_x': 0, 'bottom_y': 0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,11 +8,13 @@ import unittest
 import os
 import sys
 
+import cv2
+
 # Add parent directory to path to import core modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from core.phoneme_detector import PhonemeDetector
-from core.mouth_sprite_manager import MouthSpriteManager
+from core.mouth_sprite_manager import MouthSpriteManager, SpriteStore
 
 class TestVisemeMapping(unittest.TestCase):
     
@@ -68,6 +70,18 @@ class TestVisemeMapping(unittest.TestCase):
             sprite_pil = self.sprite_manager.get_sprite_pil(viseme)
             self.assertIsNotNone(sprite_pil, f"Failed to get PIL image for viseme {viseme}")
     
+    def test_sprites_shared_and_read_only(self):
+        """Test that managers share one read-only copy of each sprite"""
+        other_manager = MouthSpriteManager()
+
+        for viseme in self.sprite_manager.get_available_visemes():
+            sprite_array = self.sprite_manager.get_sprite_array(viseme)
+            self.assertIs(sprite_array, other_manager.get_sprite_array(viseme))
+            self.assertFalse(sprite_array.flags.writeable, f"Sprite {viseme} should be read-only")
+
+        # Visemes using the same sprite file share one decoded array
+        self.assertIs(self.sprite_manager.get_sprite_array('X'), self.sprite_manager.get_sprite_array('A'))
+
     def test_sprite_scaling(self):
         """Test sprite scaling functionality"""
         # Test scaling by factor
@@ -84,6 +98,23 @@ class TestVisemeMapping(unittest.TestCase):
         self.assertEqual(scaled_target.shape[1], target_size[0], "Target width scaling failed")
         self.assertEqual(scaled_target.shape[0], target_size[1], "Target height scaling failed")
     
+    def test_scaled_sprites_are_cached(self):
+        """Test that repeated resizes are served from the bounded LRU cache"""
+        first = self.sprite_manager.scale_sprite('B', target_size=(70, 50))
+        second = self.sprite_manager.scale_sprite('B', target_size=(70, 50))
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+
+        store = SpriteStore(self.sprite_manager.sprites_dir, max_resized=2)
+        oldest = store.resized('A', 10, 10, cv2.INTER_NEAREST)
+        store.resized('B', 10, 10, cv2.INTER_NEAREST)
+        self.assertIs(store.resized('A', 10, 10, cv2.INTER_NEAREST), oldest)  # Refreshes 'A'
+        store.resized('C', 10, 10, cv2.INTER_NEAREST)  # Evicts 'B'
+
+        self.assertIs(store.resized('A', 10, 10, cv2.INTER_NEAREST), oldest)
+        self.assertEqual(len(store._resized), 2)
+        self.assertNotIn(('B', 10, 10, cv2.INTER_NEAREST), store._resized)
+
     def test_viseme_mapping_consistency(self):
         """Test that phoneme detector and sprite manager mappings are consistent"""
         phoneme_mapping = self.phoneme_detector.get_rhubarb_viseme_mapping()
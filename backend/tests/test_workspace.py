@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Unit tests for per-job workspaces and the workspace reaper
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+# Add parent directory to path to import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.workspace import WorkspaceManager
+
+class TestWorkspaceManager(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = WorkspaceManager(self.temp_dir, max_age_seconds=3600,
+                                        max_total_bytes=250, min_age_seconds=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_workspace(self, job_id, size, age):
+        path = self.manager.create(job_id)
+        with open(os.path.join(path, 'output.mp4'), 'wb') as f:
+            f.write(b'\0' * size)
+        timestamp = time.time() - age
+        os.utime(path, (timestamp, timestamp))
+        return path
+
+    def test_workspaces_are_isolated(self):
+        """Test that each job gets its own directory and ids can't escape the root"""
+        first = self.manager.create('job1')
+        second = self.manager.create('job2')
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(os.path.dirname(first), os.path.abspath(self.temp_dir))
+        for job_id in ('../escape', '.', '', 'a/b'):
+            with self.assertRaises(ValueError):
+                self.manager.path_for(job_id)
+
+    def test_reaps_expired_workspaces(self):
+        """Test that workspaces older than max_age_seconds are removed"""
+        self.make_workspace('old', 10, age=7200)
+        self.make_workspace('new', 10, age=10)
+
+        self.assertEqual(self.manager.reap(), ['old'])
+        self.assertFalse(os.path.exists(self.manager.path_for('old')))
+        self.assertTrue(os.path.exists(self.manager.path_for('new')))
+
+    def test_reaps_oldest_over_quota(self):
+        """Test that the oldest workspaces go first until the total fits the quota"""
+        self.make_workspace('oldest', 100, age=300)
+        self.make_workspace('middle', 100, age=200)
+        self.make_workspace('newest', 100, age=100)
+
+        self.assertEqual(self.manager.reap(), ['oldest'])
+
+    def test_keeps_workspaces_in_use(self):
+        """Test that running jobs' workspaces survive both age and quota reaping"""
+        self.make_workspace('running', 200, age=7200)
+        self.make_workspace('done', 100, age=100)
+
+        self.assertEqual(self.manager.reap(in_use={'running'}), ['done'])
+        self.assertTrue(os.path.exists(self.manager.path_for('running')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,12 +6,14 @@ const audioInput = document.getElementById('audioInput');
 const imagePreview = document.getElementById('imagePreview');
 const audioInfo = document.getElementById('audioInfo');
 const processBtn = document.getElementById('processBtn');
+const previewBtn = document.getElementById('previewBtn');
 const testBtn = document.getElementById('testBtn');
 const progressSection = document.getElementById('progressSection');
 const progressFill = document.querySelector('.progress-fill');
 const progressText = document.querySelector('.progress-text');
 const resultSection = document.getElementById('resultSection');
 const resultVideo = document.getElementById('resultVideo');
+const resultTitle = document.getElementById('resultTitle');
 const downloadBtn = document.getElementById('downloadBtn');
 const resetBtn = document.getElementById('resetBtn');
 const styleSelect = document.getElementById('styleSelect');
@@ -39,7 +41,10 @@ const mouthPreviewCanvas = document.getElementById('mouthPreviewCanvas');
 // State
 let selectedImage = null;
 let selectedAudio = null;
-let currentVideoUrl = null;
+let currentVideoUrl = null;    // Download (attachment) URL of the finished video
+let currentPlaybackUrl = null; // Same video served inline, for the player
+let streaming = false;        // The result video is playing a render that is still running
+let streamingPlayer = null;   // Segment player for that stream (browsers without native HLS)
 
 // API URL - pointing to Flask backend on port 5000
 const API_URL = 'http://localhost:5000';
@@ -66,7 +71,10 @@ audioInput.addEventListener('change', (e) => {
 });
 
 // Process button
-processBtn.addEventListener('click', processAnimation);
+processBtn.addEventListener('click', () => processAnimation(false));
+
+// Quick preview button: low resolution render of the first seconds, for tuning
+previewBtn.addEventListener('click', () => processAnimation(true));
 
 // Test button
 testBtn.addEventListener('click', testUpload);
@@ -254,6 +262,7 @@ function setMouthPosition(event) {
 
 function checkCanProcess() {
     processBtn.disabled = !(selectedImage && selectedAudio);
+    previewBtn.disabled = !(selectedImage && selectedAudio);
     testBtn.disabled = !(selectedImage && selectedAudio);
 }
 
@@ -289,8 +298,8 @@ async function testUpload() {
     }
 }
 
-async function processAnimation() {
-    console.log('Starting animation process...');
+async function processAnimation(preview = false) {
+    console.log(`Starting ${preview ? 'preview' : 'animation'} process...`);
     console.log('Selected image:', selectedImage?.name, selectedImage?.size);
     console.log('Selected audio:', selectedAudio?.name, selectedAudio?.size);
     
@@ -300,15 +309,22 @@ async function processAnimation() {
     }
     
     // Show progress
+    stopStream();
+    currentVideoUrl = null;
+    currentPlaybackUrl = null;
     progressSection.style.display = 'block';
     resultSection.style.display = 'none';
     processBtn.disabled = true;
+    previewBtn.disabled = true;
     
     // Prepare form data
     const formData = new FormData();
     formData.append('image', selectedImage);
     formData.append('audio', selectedAudio);
     formData.append('style', document.getElementById('styleSelect').value);
+    if (preview) {
+        formData.append('preview', '1');
+    }
     
     // Add manual mouth positioning if enabled
     if (styleSelect.value === 'standard' && manualMouthPos.checked && mouthX.value && mouthY.value) {
@@ -323,21 +339,8 @@ async function processAnimation() {
         console.log(`  ${key}:`, value instanceof File ? `${value.name} (${value.size} bytes)` : value);
     }
     
-    // Simulate progress
-    let progress = 0;
-    const progressInterval = setInterval(() => {
-        progress += Math.random() * 15;
-        if (progress > 90) progress = 90;
-        progressFill.style.width = progress + '%';
-        
-        if (progress < 30) {
-            progressText.textContent = 'Uploading files...';
-        } else if (progress < 60) {
-            progressText.textContent = 'Processing character...';
-        } else {
-            progressText.textContent = 'Generating animation...';
-        }
-    }, 500);
+    progressFill.style.width = '0%';
+    progressText.textContent = 'Uploading files...';
     
     try {
         console.log(`Sending request to: ${API_URL}/upload`);
@@ -347,7 +350,6 @@ async function processAnimation() {
         });
         
         console.log('Response status:', response.status);
-        console.log('Response headers:', response.headers);
         
         let data;
         try {
@@ -355,38 +357,276 @@ async function processAnimation() {
             console.log('Response data:', data);
         } catch (e) {
             console.error('Failed to parse JSON response:', e);
-            const text = await response.text();
-            console.error('Response text:', text);
             throw new Error('Invalid response from server');
         }
         
-        if (!response.ok) {
+        if (!response.ok || !data.success) {
             throw new Error(data.error || `Server error: ${response.status}`);
         }
         
-        if (data.success) {
-            clearInterval(progressInterval);
-            progressFill.style.width = '100%';
-            progressText.textContent = 'Complete!';
-            
-            // Show result
-            setTimeout(() => {
-                currentVideoUrl = `${API_URL}${data.video_url}`;
-                resultVideo.src = currentVideoUrl;
-                progressSection.style.display = 'none';
-                resultSection.style.display = 'block';
-            }, 500);
-        } else {
-            throw new Error(data.error || 'Processing failed');
-        }
+        // The render runs in the background, follow its progress until it finishes
+        const job = await waitForJob(data.job_id);
+        
+        progressFill.style.width = '100%';
+        progressText.textContent = 'Complete!';
+        
+        // Show result
+        setTimeout(() => {
+            currentVideoUrl = `${API_URL}${job.video_url}`;
+            currentPlaybackUrl = `${API_URL}${job.playback_url || job.video_url}`;
+            if (!streaming) {
+                resultVideo.src = currentPlaybackUrl;
+            }
+            // A stream that is already playing carries on; its playlist is complete now
+            downloadBtn.disabled = false;
+            resultTitle.textContent = preview ? 'Preview (first few seconds, low resolution)' : 'Your Animation is Ready!';
+            progressSection.style.display = 'none';
+            resultSection.style.display = 'block';
+            if (preview) {
+                // Keep the files so the mouth position can be tweaked and previewed again
+                checkCanProcess();
+                resultVideo.play().catch(() => {});
+            }
+        }, preview ? 0 : 500);
     } catch (error) {
-        clearInterval(progressInterval);
         console.error('Upload error:', error);
         alert('Error: ' + error.message + '\n\nMake sure:\n1. Backend is running on port 5000\n2. ffmpeg is installed (for MP3 support)\n3. Files are not too large');
         resetForm();
     }
 }
 
+const STAGE_LABELS = {
+    audio: 'Analyzing audio...',
+    character: 'Processing character...',
+    keyframes: 'Generating keyframes...',
+    frames: 'Rendering frames',
+    encode: 'Encoding video...'
+};
+
+function waitForJob(jobId) {
+    // Progress is pushed over Server-Sent Events; browsers without
+    // EventSource, or a stream that drops, fall back to polling
+    if (!window.EventSource) {
+        return pollJob(jobId);
+    }
+    
+    return new Promise((resolve, reject) => {
+        const events = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+        
+        events.addEventListener('progress', event => {
+            updateProgress(JSON.parse(event.data));
+        });
+        events.addEventListener('heartbeat', event => {
+            console.log(`Job ${jobId} idle for ${JSON.parse(event.data).idle_seconds}s`);
+        });
+        events.addEventListener('done', event => {
+            events.close();
+            resolve(JSON.parse(event.data));
+        });
+        events.addEventListener('failed', event => {
+            events.close();
+            reject(new Error(JSON.parse(event.data).error || 'Processing failed'));
+        });
+        events.onerror = () => {
+            // EventSource would reconnect on its own; poll instead so a
+            // finished job isn't missed between reconnects
+            console.warn('Progress stream interrupted, falling back to polling');
+            events.close();
+            pollJob(jobId).then(resolve, reject);
+        };
+    });
+}
+
+async function pollJob(jobId, pollInterval = 500) {
+    while (true) {
+        const response = await fetch(`${API_URL}/jobs/${jobId}/progress`);
+        const progress = await response.json();
+        if (!response.ok) {
+            throw new Error(progress.error || `Server error: ${response.status}`);
+        }
+        
+        updateProgress(progress);
+        
+        if (progress.status === 'done' || progress.status === 'failed') {
+            // Fetch the full job record for the video URL or error message
+            const job = await (await fetch(`${API_URL}/jobs/${jobId}`)).json();
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Processing failed');
+            }
+            return job;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, pollInterval));
+    }
+}
+
+function updateProgress(progress) {
+    progressFill.style.width = Math.round(progress.progress * 100) + '%';
+    
+    let text;
+    if (progress.status === 'queued') {
+        text = 'Waiting for a free renderer...';
+    } else if (progress.stage === 'frames' && progress.frames_total) {
+        text = `${STAGE_LABELS.frames} ${progress.frames_done}/${progress.frames_total}...`;
+    } else {
+        text = STAGE_LABELS[progress.stage] || 'Processing...';
+    }
+    
+    if (progress.status === 'running' && progress.eta_seconds != null) {
+        text += ` about ${formatEta(progress.eta_seconds)} left`;
+    }
+    progressText.textContent = text;
+    
+    // Start watching as soon as the first segments of the render are out
+    if (progress.stream_url && progress.status === 'running' && !streaming) {
+        startStream(progress.stream_url);
+    }
+}
+
+function startStream(streamUrl) {
+    // Play the HLS segments of a render that is still running: natively
+    // where the browser supports HLS (Safari), through MediaSource elsewhere
+    const url = `${API_URL}${streamUrl}`;
+    if (resultVideo.canPlayType('application/vnd.apple.mpegurl')) {
+        resultVideo.src = url;
+    } else if (window.MediaSource) {
+        streamingPlayer = playSegments(url, (error) => {
+            // Fall back to the finished MP4 (or wait for it)
+            console.warn('Stream playback failed:', error);
+            stopStream();
+            if (currentPlaybackUrl) {
+                resultVideo.src = currentPlaybackUrl;
+            }
+        });
+    } else {
+        return;
+    }
+    
+    streaming = true;
+    resultTitle.textContent = 'Playing while the rest renders...';
+    resultSection.style.display = 'block';
+    downloadBtn.disabled = true;
+    resultVideo.play().catch(() => {});
+}
+
+function stopStream() {
+    if (streamingPlayer) {
+        streamingPlayer.stop();
+        streamingPlayer = null;
+    }
+    streaming = false;
+}
+
+function playSegments(playlistUrl, onError) {
+    // Just enough HLS for the backend's own streams: one fragmented-MP4
+    // rendition in an event playlist that only grows until #EXT-X-ENDLIST.
+    // The init segment and every listed segment are appended in order to a
+    // single MediaSource buffer, and the playlist is polled for new ones
+    const baseUrl = playlistUrl.substring(0, playlistUrl.lastIndexOf('/') + 1);
+    const mediaSource = new MediaSource();
+    const objectUrl = URL.createObjectURL(mediaSource);
+    const player = {
+        stopped: false,
+        stop() {
+            this.stopped = true;
+            URL.revokeObjectURL(objectUrl);
+        }
+    };
+    
+    mediaSource.addEventListener('sourceopen', async () => {
+        let sourceBuffer = null;
+        let appended = 0;
+        try {
+            while (!player.stopped) {
+                const playlist = await (await fetchOk(playlistUrl, { cache: 'no-store' })).text();
+                
+                if (!sourceBuffer) {
+                    const map = playlist.match(/#EXT-X-MAP:URI="([^"]+)"/);
+                    const init = await (await fetchOk(baseUrl + map[1])).arrayBuffer();
+                    sourceBuffer = mediaSource.addSourceBuffer(mp4MimeType(init));
+                    await appendBuffer(sourceBuffer, init);
+                }
+                
+                const segments = playlist.split('\n').map(line => line.trim()).filter(line => line && !line.startsWith('#'));
+                for (const segment of segments.slice(appended)) {
+                    const data = await (await fetchOk(baseUrl + segment)).arrayBuffer();
+                    if (player.stopped) return;
+                    await appendBuffer(sourceBuffer, data);
+                    appended++;
+                }
+                
+                if (playlist.includes('#EXT-X-ENDLIST')) {
+                    mediaSource.endOfStream();
+                    return;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+        } catch (error) {
+            if (!player.stopped) {
+                onError(error);
+            }
+        }
+    }, { once: true });
+    
+    resultVideo.src = objectUrl;
+    return player;
+}
+
+async function fetchOk(url, options) {
+    const response = await fetch(url, options);
+    if (!response.ok) {
+        throw new Error(`${url}: ${response.status}`);
+    }
+    return response;
+}
+
+function appendBuffer(sourceBuffer, data) {
+    return new Promise((resolve, reject) => {
+        const done = (event) => {
+            sourceBuffer.removeEventListener('updateend', done);
+            sourceBuffer.removeEventListener('error', done);
+            event.type === 'error' ? reject(new Error('Could not append a segment')) : resolve();
+        };
+        sourceBuffer.addEventListener('updateend', done);
+        sourceBuffer.addEventListener('error', done);
+        sourceBuffer.appendBuffer(data);
+    });
+}
+
+function mp4MimeType(initSegment) {
+    // MediaSource needs the exact codecs: H.264 profile and level from the
+    // init segment's avcC box, and AAC-LC if there is an audio track
+    const bytes = new Uint8Array(initSegment);
+    const find = (type) => {
+        for (let i = 0; i + 8 <= bytes.length; i++) {
+            if (String.fromCharCode(bytes[i], bytes[i + 1], bytes[i + 2], bytes[i + 3]) === type) {
+                return i;
+            }
+        }
+        return -1;
+    };
+    
+    const codecs = [];
+    const avcC = find('avcC');
+    if (avcC >= 0) {
+        // configurationVersion, then profile, profile compatibility and level
+        const profile = Array.from(bytes.slice(avcC + 5, avcC + 8), b => b.toString(16).padStart(2, '0'));
+        codecs.push(`avc1.${profile.join('')}`);
+    }
+    if (find('mp4a') >= 0) {
+        codecs.push('mp4a.40.2');
+    }
+    return `video/mp4; codecs="${codecs.join(', ')}"`;
+}
+
+function formatEta(seconds) {
+    seconds = Math.ceil(seconds);
+    if (seconds < 60) {
+        return `${seconds}s`;
+    }
+    return `${Math.floor(seconds / 60)}m ${seconds % 60}s`;
+}
+
 function downloadVideo() {
     if (!currentVideoUrl) return;
     
@@ -400,6 +640,9 @@ function resetForm() {
     selectedImage = null;
     selectedAudio = null;
     currentVideoUrl = null;
+    currentPlaybackUrl = null;
+    stopStream();
+    downloadBtn.disabled = false;
     
     imagePreviewContainer.style.display = 'none';
     imageUpload.querySelector('.upload-content').style.display = 'flex';